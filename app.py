@@ -1,10 +1,17 @@
 # app.py
 import streamlit as st
-from functions.auth import check_auth, mostrar_login, mostrar_formulario_registro
-from pages import reservas, agenda, calendario, reportes
+from functions.auth import check_auth, mostrar_login, mostrar_formulario_registro, es_administrador
+from functions.memoria import marcar_actividad
+from functions.data_utils import filas_pendientes
+from pages import reservas, agenda, calendario, reportes, rendimiento
 
-# Limpiar caché al iniciar
-st.cache_data.clear()
+# Limpiar caché al iniciar (una vez por proceso: este script se ejecuta en cada interacción)
+@st.cache_resource
+def _limpiar_cache_al_iniciar():
+    st.cache_data.clear()
+    return True
+
+_limpiar_cache_al_iniciar()
 
 # Configuración de la página
 st.set_page_config(
@@ -14,6 +21,9 @@ st.set_page_config(
 )
 
 def main():
+    # Última actividad de esta sesión (informe de memoria)
+    marcar_actividad()
+
     # Inicializar estados de sesión para autenticación
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
@@ -34,10 +44,14 @@ def main():
     
     # Usuario autenticado: mostrar la aplicación
     st.sidebar.title("Navegación")
-    pagina = st.sidebar.radio(
-        "Ir a:",
-        ["Reservas", "Agenda", "Calendario", "Reportes"]
-    )
+    paginas = ["Reservas", "Agenda", "Calendario", "Reportes"]
+    if es_administrador():
+        paginas.append("Rendimiento")
+    pagina = st.sidebar.radio("Ir a:", paginas)
+    # Reservas y clientes guardados en el diario local que el hilo de envío aún no ha escrito
+    pendientes = len(filas_pendientes())
+    if pendientes:
+        st.sidebar.caption(f"⏳ {pendientes} registros pendientes de sincronizar con Google Sheets")
     
     if pagina == "Reservas":
         reservas.mostrar()
@@ -47,6 +61,8 @@ def main():
         calendario.mostrar()
     elif pagina == "Reportes":
         reportes.mostrar()
+    elif pagina == "Rendimiento":
+        rendimiento.mostrar()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
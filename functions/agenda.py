@@ -1,81 +1,153 @@
 # functions/agenda.py
 
+import numpy as np
+import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
-from functions.data_utils import cargar_datos
+from functions.indice_reservas import indice_reservas
+from functions.enlace import obtener_enlace
+from functions.duraciones import COLUMNA_SEGUNDOS, cuarentena_reservas
+from functions.rendimiento import medido
 
+# Días mostrados por página de la agenda
+DIAS_POR_PAGINA = 7
+
+@medido()
+def indice_dias(datos):
+    """Agrupa las reservas por día en una sola pasada.
+
+    Los datos llegan ordenados por fecha, así que cada día es un bloque
+    contiguo: devuelve las fechas y las posiciones [inicio, fin) de cada bloque.
+    """
+    dias = datos['Fecha Actividad'].dt.normalize().to_numpy()
+    fechas, inicios, cuentas = np.unique(dias, return_index=True, return_counts=True)
+    return pd.to_datetime(fechas).date, inicios, inicios + cuentas
+
+def html_ficha(ficha):
+    """Línea con la ficha de cliente enlazada a una reserva"""
+    datos = [f"🪪 Cliente {ficha['ID']}"]
+    datos += [f"{ficha['Edad']} años"] if pd.notna(ficha['Edad']) else []
+    datos += [str(ficha[c]) for c in ['Sexo', 'Ciudad', 'Pais'] if pd.notna(ficha[c])]
+    return f"<div style='margin-top: 10px; color: #495057;'>{' · '.join(datos)}</div>"
+
+@medido()
+def html_dia(actividades_dia, ahora, fichas=None):
+    """Genera de una vez el HTML de todas las actividades de un día.
+
+    fichas: fichas de cliente enlazadas, indexadas por la fila de la reserva.
+    """
+    fichas = {} if fichas is None else fichas.to_dict('index')
+    segundos = actividades_dia[COLUMNA_SEGUNDOS].astype('float64')
+    difs = actividades_dia['Fecha Actividad'].dt.normalize() + pd.to_timedelta(segundos, unit='s') - ahora
+    # "HH:MM" desde los segundos del día; las horas no válidas muestran el texto de la hoja
+    horas = (segundos // 3600).map('{:02.0f}'.format) + ':' + (segundos % 3600 // 60).map('{:02.0f}'.format)
+    horas = horas.where(segundos.notna(), actividades_dia['Hora inicio Actividad'].astype(str))
+
+    tarjetas = []
+    for fila, actividad, dif, hora in zip(actividades_dia.index, actividades_dia.to_dict('records'), difs, horas):
+        if pd.isna(dif):
+            status_color = "#6c757d"
+            status_text = "Hora no válida"
+        else:
+            status_color = "#28a745" if dif.total_seconds() >= 0 else "#dc3545"
+            status_text = f"En {dif.days + 1} días" if dif.days >= 0 else "Pasada"
+
+        tarjetas.append(f"""
+        <div style="display: grid; grid-template-columns: 1fr 4fr; gap: 1rem; margin-bottom: 10px;">
+            <div style="text-align: center;
+                        background-color: #f0f2f6;
+                        padding: 10px;
+                        border-radius: 10px;
+                        align-self: start;">
+                <h4>{hora}</h4>
+                <small>{actividad['Duración']}</small>
+            </div>
+            <div style="border: 1px solid #dee2e6;
+                        padding: 15px;
+                        border-radius: 10px;">
+                <div style="display: flex; justify-content: space-between;">
+                    <h4 style="margin: 0;">{actividad['Actividad']}</h4>
+                    <div style="background-color: {status_color};
+                                color: white;
+                                padding: 2px 10px;
+                                border-radius: 15px;">
+                        {status_text}
+                    </div>
+                </div>
+                <hr style="margin: 10px 0;">
+                <div style="display: grid; grid-template-columns: repeat(2, 1fr); gap: 10px;">
+                    <div>👤 {actividad['Nombre']}</div>
+                    <div>👥 {actividad['Personas']} personas</div>
+                    <div>📞 {actividad['Email o Teléfono']}</div>
+                    <div>💶 {actividad['Precio']}€</div>
+                </div>
+                {f"<div style='margin-top: 10px;'>📝 {actividad['Notas']}</div>" if actividad['Notas'] else ""}
+                {html_ficha(fichas[fila]) if fila in fichas else ""}
+            </div>
+        </div>
+        """)
+    return "".join(tarjetas)
+
+@medido()
 def mostrar_agenda():
     st.header("📅 Agenda de Actividades")
-    datos = cargar_datos()
-    
-    if datos.empty:
-        st.info("No hay actividades programadas")
-        return
-    
+
     # Filtros
     st.sidebar.header("🔍 Filtros Agenda")
     fecha_desde = st.sidebar.date_input("Desde", datetime.today())
     fecha_hasta = st.sidebar.date_input("Hasta", datetime.today() + timedelta(days=30))
-    actividades = st.sidebar.multiselect("Actividades", datos['Actividad'].unique())
-    
-    # Aplicar filtros
-    mask = (datos['Fecha Actividad'].dt.date >= fecha_desde) & \
-           (datos['Fecha Actividad'].dt.date <= fecha_hasta)
+    # Las temporadas archivadas solo se leen si el rango llega a ellas
+    indice = indice_reservas(fecha_desde, fecha_hasta + timedelta(days=1))
+
+    if indice.df.empty:
+        st.info("No hay actividades programadas")
+        return
+
+    actividades = st.sidebar.multiselect("Actividades", indice.grupos)
+
+    # Aplicar filtros con búsqueda binaria sobre el índice ordenado por fecha
+    datos_filtrados = indice.rango(fecha_desde, fecha_hasta + timedelta(days=1), actividades)
+
+    if datos_filtrados.empty:
+        st.info("No hay actividades en el rango seleccionado")
+        return
+
+    # Reservas con hora o duración que no se pudieron interpretar al cargar la hoja, más
+    # las que no tienen fecha de actividad (no caen en ningún rango: se listan siempre)
+    sin_fecha = indice.df[indice.df['Fecha Actividad'].isna()]
     if actividades:
-        mask &= datos['Actividad'].isin(actividades)
-    
-    datos_filtrados = datos[mask]
-    
-    # Mostrar actividades
-    for fecha in datos_filtrados['Fecha Actividad'].dt.date.unique():
-        actividades_dia = datos_filtrados[datos_filtrados['Fecha Actividad'].dt.date == fecha]
-        
-        with st.expander(f"📅 {fecha.strftime('%A %d/%m/%Y')} ({len(actividades_dia)} actividades)"):
-            for _, actividad in actividades_dia.iterrows():
-                col1, col2 = st.columns([1,4])
-                with col1:
-                    st.markdown(f"""
-                    <div style="text-align: center; 
-                                background-color: #f0f2f6; 
-                                padding: 10px; 
-                                border-radius: 10px;">
-                        <h4>{actividad['Hora inicio Actividad'][:5]}</h4>
-                        <small>{actividad['Duración']}</small>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col2:
-                    try:
-                        hora_actividad = datetime.strptime(actividad['Hora inicio Actividad'], '%H:%M:%S').time()
-                        fecha_hora_actividad = datetime.combine(fecha, hora_actividad)
-                        dif = fecha_hora_actividad - datetime.now()
-                        status_color = "#28a745" if dif.total_seconds() >= 0 else "#dc3545"
-                        status_text = f"En {dif.days + 1} días" if dif.days >= 0 else "Pasada"
-                    except ValueError:
-                        status_color = "#6c757d"
-                        status_text = "Hora no válida"
-                    
-                    st.markdown(f"""
-                    <div style="border: 1px solid #dee2e6;
-                                padding: 15px;
-                                border-radius: 10px;
-                                margin-bottom: 10px;">
-                        <div style="display: flex; justify-content: space-between;">
-                            <h4 style="margin: 0;">{actividad['Actividad']}</h4>
-                            <div style="background-color: {status_color};
-                                        color: white;
-                                        padding: 2px 10px;
-                                        border-radius: 15px;">
-                                {status_text}
-                            </div>
-                        </div>
-                        <hr style="margin: 10px 0;">
-                        <div style="display: grid; grid-template-columns: repeat(2, 1fr); gap: 10px;">
-                            <div>👤 {actividad['Nombre']}</div>
-                            <div>👥 {actividad['Personas']} personas</div>
-                            <div>📞 {actividad['Email o Teléfono']}</div>
-                            <div>💶 {actividad['Precio']}€</div>
-                        </div>
-                        {f"<div style='margin-top: 10px;'>📝 {actividad['Notas']}</div>" if actividad['Notas'] else ""}
-                    </div>
-                    """, unsafe_allow_html=True)
\ No newline at end of file
+        sin_fecha = sin_fecha[sin_fecha['Actividad'].isin(actividades)]
+    cuarentena = cuarentena_reservas(pd.concat([datos_filtrados, sin_fecha]))
+    if not cuarentena.empty:
+        with st.expander(f"⚠️ {len(cuarentena)} reservas sin fecha o con hora o duración no válidas",
+                         key="agenda_cuarentena"):
+            # Fila de la hoja (la 1 son los encabezados); las archivadas no están en la hoja
+            filas = pd.Series(cuarentena.index + 2, index=cuarentena.index).where(cuarentena.index >= 0)
+            st.dataframe(cuarentena.assign(**{'Fecha Actividad': cuarentena['Fecha Actividad'].dt.strftime('%d/%m/%Y')})
+                         .set_axis(filas.astype('Int64').rename('Fila')))
+
+    # Índice de días calculado una sola vez sobre los datos filtrados
+    fechas, inicios, fines = indice_dias(datos_filtrados)
+
+    # Paginación: solo se construyen los expanders de la página visible
+    paginas = (len(fechas) + DIAS_POR_PAGINA - 1) // DIAS_POR_PAGINA
+    pagina = st.pagination(paginas, key=f"agenda_pagina_{paginas}") if paginas > 1 else 1
+    primera = (pagina - 1) * DIAS_POR_PAGINA
+
+    ahora = pd.Timestamp.now()
+    enlace = None
+    for fecha, inicio, fin in zip(fechas[primera:primera + DIAS_POR_PAGINA],
+                                  inicios[primera:primera + DIAS_POR_PAGINA],
+                                  fines[primera:primera + DIAS_POR_PAGINA]):
+        expander = st.expander(
+            f"📅 {fecha.strftime('%A %d/%m/%Y')} ({fin - inicio} actividades)",
+            key=f"agenda_dia_{fecha.isoformat()}",
+            on_change="rerun"
+        )
+        # El HTML del día solo se genera cuando el expander está abierto
+        if expander.open:
+            # El enlace con las fichas de cliente solo se consulta si hay algún día abierto
+            enlace = enlace or obtener_enlace()
+            dia = datos_filtrados.iloc[inicio:fin]
+            with expander:
+                st.markdown(html_dia(dia, ahora, enlace.fichas(dia.index)), unsafe_allow_html=True)
@@ -0,0 +1,140 @@
+# functions/archivo.py
+# Archivo en Parquet de las temporadas pasadas de la hoja de Reservas, con una
+# partición por año y mes de actividad (anio=AAAA/mes=MM/reservas.parquet).
+# La hoja activa conserva la temporada actual y las siguientes; la herramienta
+# archivar_temporadas mueve aquí las anteriores. Sin dependencias de la app.
+
+import json
+import os
+from datetime import date, datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+COLUMNA_FECHA = "Fecha Actividad"
+# Columnas de fecha de la hoja y su formato
+FORMATOS_FECHA = {"Fecha Actividad": "%d/%m/%Y", "Fecha Reserva": "%d/%m/%Y %H:%M"}
+# Identifica cada fila archivada: hash de sus valores en la hoja + número de
+# repetición, para que archivar dos veces la misma fila no la duplique
+COLUMNA_HUELLA = "Huella"
+NOMBRE_PARTICION = "reservas.parquet"
+MANIFIESTO = "manifiesto.json"
+# Las filas archivadas llevan índices negativos (no son filas de la hoja),
+# estables por partición: -(AAAAMM * FILAS_POR_PARTICION + posición + 1)
+FILAS_POR_PARTICION = 1_000_000
+
+def inicio_temporada(hoy=None):
+    """Primer día de la temporada en curso (la temporada es el año natural)"""
+    hoy = hoy or date.today()
+    return date(hoy.year, 1, 1)
+
+def ruta_particion(directorio, anio, mes):
+    return Path(directorio) / f"anio={anio}" / f"mes={mes:02d}" / NOMBRE_PARTICION
+
+def particiones(directorio):
+    """(año, mes, ruta) de cada partición archivada, en orden cronológico"""
+    encontradas = []
+    for ruta in Path(directorio).glob(f"anio=*/mes=*/{NOMBRE_PARTICION}"):
+        encontradas.append((int(ruta.parent.parent.name[5:]), int(ruta.parent.name[4:]), ruta))
+    return sorted(encontradas)
+
+def en_rango(anio, mes, desde=None, hasta=None):
+    """Si el mes [anio/mes] se solapa con [desde, hasta)"""
+    inicio = pd.Timestamp(anio, mes, 1)
+    fin = inicio + pd.DateOffset(months=1)
+    return (desde is None or fin > pd.Timestamp(desde)) and (hasta is None or inicio < pd.Timestamp(hasta))
+
+def leer_manifiesto(directorio):
+    ruta = Path(directorio) / MANIFIESTO
+    if not ruta.exists():
+        return {}
+    return json.loads(ruta.read_text(encoding="utf-8"))
+
+def limite_archivo(directorio):
+    """Fecha (excluida) hasta la que las reservas están archivadas, o None si no hay archivo"""
+    hasta = leer_manifiesto(directorio).get("hasta")
+    return pd.Timestamp(hasta) if hasta else None
+
+def _escribir_atomico(ruta, escribir):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    escribir(temporal)
+    os.replace(temporal, ruta)
+
+def huellas(hoja):
+    """Huella de cada fila tal como está en la hoja (texto), con su número de repetición"""
+    texto = hoja.astype(str)
+    hashes = pd.util.hash_pandas_object(texto, index=False)
+    repeticion = hashes.groupby(hashes).cumcount()
+    return hashes.map("{:016x}".format) + "-" + repeticion.astype(str)
+
+def _tipar(hoja):
+    """Fechas como datetime y columnas numéricas como números; el resto, texto"""
+    tipada = {}
+    for columna in hoja.columns:
+        if columna in FORMATOS_FECHA:
+            tipada[columna] = pd.to_datetime(hoja[columna], format=FORMATOS_FECHA[columna], errors="coerce")
+            continue
+        texto = hoja[columna].astype(str).str.strip()
+        numeros = pd.to_numeric(texto.where(texto != ""), errors="coerce")
+        # Como get_all_records: numérica solo si todos los valores no vacíos lo son
+        rellenos = int((texto != "").sum())
+        tipada[columna] = numeros if rellenos and numeros.notna().sum() == rellenos else texto
+    return pd.DataFrame(tipada, index=hoja.index)
+
+def filas_anteriores(hoja, hasta):
+    """Filas de `hoja` (valores de texto, como get_all_values) con actividad anterior a `hasta`"""
+    fechas = pd.to_datetime(hoja[COLUMNA_FECHA], format=FORMATOS_FECHA[COLUMNA_FECHA], errors="coerce")
+    return hoja[(fechas < pd.Timestamp(hasta)).to_numpy()]
+
+def archivar(directorio, hoja, hasta):
+    """Añade al archivo las filas de `hoja` (valores tal como están en la hoja) anteriores a `hasta`.
+
+    Escribe cada partición de forma atómica y se salta las filas que ya
+    estaban archivadas (misma huella). Devuelve (filas nuevas, filas ya
+    archivadas, huellas de todas las filas anteriores a `hasta`).
+    """
+    antiguas = filas_anteriores(hoja, hasta)
+    if antiguas.empty:
+        return 0, 0, pd.Series(dtype=str)
+    tipadas = _tipar(antiguas).assign(**{COLUMNA_HUELLA: huellas(antiguas)})
+    meses = tipadas[COLUMNA_FECHA]
+    nuevas = ya_archivadas = 0
+    for (anio, mes), filas in tipadas.groupby([meses.dt.year, meses.dt.month]):
+        ruta = ruta_particion(directorio, anio, mes)
+        if ruta.exists():
+            existente = pd.read_parquet(ruta)
+            repetidas = filas[COLUMNA_HUELLA].isin(existente[COLUMNA_HUELLA])
+            ya_archivadas += int(repetidas.sum())
+            filas = pd.concat([existente, filas[~repetidas]], ignore_index=True)
+        else:
+            repetidas = pd.Series(False, index=filas.index)
+        nuevas += int((~repetidas).sum())
+        filas = filas.sort_values(COLUMNA_FECHA, kind="stable", ignore_index=True)
+        _escribir_atomico(ruta, lambda destino: filas.to_parquet(destino, index=False))
+    return nuevas, ya_archivadas, tipadas[COLUMNA_HUELLA]
+
+def actualizar_manifiesto(directorio, hasta):
+    """Anota el nuevo límite del archivo (nunca lo retrasa) y las filas archivadas"""
+    anterior = limite_archivo(directorio)
+    hasta = max(pd.Timestamp(hasta), anterior) if anterior is not None else pd.Timestamp(hasta)
+    filas = sum(len(pd.read_parquet(ruta, columns=[COLUMNA_HUELLA])) for *_, ruta in particiones(directorio))
+    manifiesto = {"hasta": hasta.date().isoformat(), "filas": filas,
+                  "actualizado": datetime.now().isoformat(timespec="seconds")}
+    _escribir_atomico(Path(directorio) / MANIFIESTO,
+                      lambda destino: destino.write_text(json.dumps(manifiesto, indent=2), encoding="utf-8"))
+    return manifiesto
+
+def huellas_archivadas(directorio, meses=None):
+    """Huellas de las particiones (de los (año, mes) indicados, o de todas)"""
+    partes = [pd.read_parquet(ruta, columns=[COLUMNA_HUELLA])[COLUMNA_HUELLA]
+              for anio, mes, ruta in particiones(directorio) if meses is None or (anio, mes) in meses]
+    return pd.concat(partes) if partes else pd.Series(dtype=str)
+
+def leer_particion(ruta):
+    """Una partición con el índice negativo estable de sus filas (sin la columna de huellas)"""
+    ruta = Path(ruta)
+    anio, mes = int(ruta.parent.parent.name[5:]), int(ruta.parent.name[4:])
+    df = pd.read_parquet(ruta).drop(columns=[COLUMNA_HUELLA], errors="ignore")
+    df.index = -((anio * 100 + mes) * FILAS_POR_PARTICION + np.arange(len(df)) + 1)
+    return df
@@ -31,6 +31,12 @@ def check_auth():
     
     return False
 
+def es_administrador():
+    """Si el usuario actual figura en [administracion] usuarios de los secrets"""
+    usuario = str(st.session_state.get('current_user', '')).strip().lower()
+    administradores = st.secrets.get("administracion", {}).get("usuarios", [])
+    return bool(usuario) and usuario in {str(u).strip().lower() for u in administradores}
+
 def mostrar_login():
     """Muestra el formulario de login"""
     st.title("🔐 Acceso al Sistema - Ubuntu Aventuras")
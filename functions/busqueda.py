@@ -0,0 +1,162 @@
+# functions/busqueda.py
+
+import copy
+import re
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+from functions.data_utils import cargar_datos, reservas_en_rango
+
+# Columnas de Reservas en las que se busca
+COLUMNAS_BUSQUEDA = ['Nombre', 'Email o Teléfono', 'Notas']
+
+# Fracción mínima de trigramas de la consulta que debe tener una reserva
+SIMILITUD_MINIMA = 0.5
+MAX_RESULTADOS = 50
+
+# Si se añade más de esta fracción de filas (o cambia alguna ya indexada) se rehace el índice
+FRACCION_RECONSTRUCCION = 0.1
+
+# Separadores dentro de un número de teléfono ("600 12 34 56", "600-123-456")
+_SEPARADORES_NUMERO = re.compile(r"(?<=\d)[\s.\-/]+(?=\d)")
+_NO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+
+def normalizar_textos(serie):
+    """Minúsculas, sin acentos (ni la tilde de la ñ) y solo letras y números separados por espacios"""
+    return (serie.fillna('').astype(str)
+            .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii').str.lower()
+            .str.replace(_SEPARADORES_NUMERO, '', regex=True)
+            .str.replace(_NO_ALFANUMERICO, ' ', regex=True))
+
+def trigramas(palabra):
+    """Trigramas de una palabra con los bordes marcados ("  an", " ana", "na ")"""
+    relleno = f"  {palabra} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+def trigramas_consulta(consulta):
+    palabras = normalizar_textos(pd.Series([consulta])).iloc[0].split()
+    return set().union(*(trigramas(p) for p in palabras))
+
+def _textos(datos):
+    """Texto normalizado de cada reserva: las columnas de búsqueda unidas"""
+    columnas = [c for c in COLUMNAS_BUSQUEDA if c in datos.columns]
+    if not columnas:
+        return pd.Series('', index=datos.index)
+    textos = [datos[c].fillna('').astype(str) for c in columnas]
+    return normalizar_textos(textos[0].str.cat(textos[1:], sep=' '))
+
+def _huellas(datos):
+    columnas = [c for c in COLUMNAS_BUSQUEDA if c in datos.columns]
+    return pd.util.hash_pandas_object(datos[columnas].astype(str), index=False)
+
+class IndiceTrigramas:
+    """Índice invertido trigrama -> reservas sobre las columnas de búsqueda.
+
+    Los trigramas se calculan una vez por palabra distinta (los nombres y
+    dominios se repiten mucho) y las listas de reservas se guardan en dos
+    arrays (inicio de cada trigrama y posiciones). Una consulta suma, por
+    reserva, cuántos de sus trigramas contiene: así tolera erratas y
+    palabras incompletas. Las filas añadidas después se indexan aparte.
+
+    No cambia una vez creado: actualizar devuelve otro índice (que comparte
+    los arrays principales), así las búsquedas en curso no ven cambios a medias.
+    """
+
+    def __init__(self, datos):
+        self._construir(datos)
+
+    def __len__(self):
+        return len(self.etiquetas)
+
+    def _construir(self, datos):
+        self.etiquetas = np.asarray(datos.index)
+        self._huellas = _huellas(datos)
+        self._extra = {}
+        self._filas_extra = 0
+        n = len(datos)
+        palabras = pd.Series(_textos(datos).str.split().to_numpy()).explode().dropna()
+        palabras = palabras[palabras != '']
+        codigos_palabra, unicas = pd.factorize(palabras)
+        por_palabra = [sorted(trigramas(p)) for p in unicas]
+        longitudes = np.array([len(t) for t in por_palabra], dtype=np.int64)
+        codigos_trigrama, self._trigramas = pd.factorize(
+            pd.Series([t for lista in por_palabra for t in lista], dtype=object))
+        # Cada par (reserva, palabra) se expande a los trigramas de la palabra
+        repeticiones = longitudes[codigos_palabra]
+        primeros = np.concatenate([[0], np.cumsum(longitudes)])[codigos_palabra]
+        desplazamientos = np.arange(repeticiones.sum()) - np.repeat(np.cumsum(repeticiones) - repeticiones, repeticiones)
+        trigramas_par = codigos_trigrama[np.repeat(primeros, repeticiones) + desplazamientos].astype(np.int64)
+        reservas_par = np.repeat(palabras.index.to_numpy(dtype=np.int64), repeticiones)
+        # Un par (trigrama, reserva) por combinación, ordenado por trigrama
+        pares = np.sort(trigramas_par * max(n, 1) + reservas_par)
+        # Sin palabras (hoja vacía o no leída, columnas en blanco) el índice queda vacío
+        if pares.size:
+            pares = pares[np.concatenate([[True], pares[1:] != pares[:-1]])]
+        self._inicios = np.searchsorted(pares // max(n, 1), np.arange(len(self._trigramas) + 1))
+        self._posiciones = (pares % max(n, 1)).astype(np.int32)
+        self._codigos = {t: i for i, t in enumerate(self._trigramas)}
+
+    def _con_filas(self, datos):
+        """Copia del índice con las filas nuevas `datos` en la parte incremental"""
+        nuevo = copy.copy(self)
+        primera = len(self.etiquetas)
+        nuevo.etiquetas = np.concatenate([self.etiquetas, np.asarray(datos.index)])
+        nuevo._huellas = pd.concat([self._huellas, _huellas(datos)])
+        nuevo._filas_extra = self._filas_extra + len(datos)
+        nuevo._extra = {trigrama: list(posiciones) for trigrama, posiciones in self._extra.items()}
+        for posicion, texto in enumerate(_textos(datos), start=primera):
+            for trigrama in set().union(*(trigramas(p) for p in texto.split())):
+                nuevo._extra.setdefault(trigrama, []).append(posicion)
+        return nuevo
+
+    def actualizar(self, datos):
+        """Índice al día con `datos`: este mismo, este más las filas nuevas o uno rehecho si cambió o se borró alguna"""
+        huellas = _huellas(datos)
+        anteriores = self._huellas
+        nuevas = huellas.index.difference(anteriores.index)
+        if (not anteriores.index.isin(huellas.index).all()
+                or not huellas[anteriores.index].equals(anteriores)
+                or self._filas_extra + len(nuevas) > FRACCION_RECONSTRUCCION * len(anteriores)):
+            return IndiceTrigramas(datos)
+        if len(nuevas):
+            return self._con_filas(datos.loc[nuevas])
+        return self
+
+    def buscar(self, consulta, limite=MAX_RESULTADOS, minima=SIMILITUD_MINIMA):
+        """Etiquetas de las reservas más parecidas a la consulta y su similitud (0-1), de más a menos"""
+        buscados = trigramas_consulta(consulta)
+        partes = []
+        for trigrama in buscados:
+            codigo = self._codigos.get(trigrama)
+            if codigo is not None:
+                partes.append(self._posiciones[self._inicios[codigo]:self._inicios[codigo + 1]])
+            if trigrama in self._extra:
+                partes.append(np.asarray(self._extra[trigrama], dtype=np.int32))
+        if not partes:
+            return self.etiquetas[:0], np.array([])
+        similitud = np.bincount(np.concatenate(partes), minlength=len(self.etiquetas)) / len(buscados)
+        candidatas = np.flatnonzero(similitud >= minima)
+        # Más parecidas primero; a igualdad, las filas más recientes de la hoja
+        orden = candidatas[np.lexsort((-self.etiquetas[candidatas], -similitud[candidatas]))][:limite]
+        return self.etiquetas[orden], similitud[orden]
+
+# ------------------- ÍNDICE COMPARTIDO -------------------
+
+@st.cache_resource
+def _almacen_busqueda(historico):
+    """Índice compartido (solo lectura) entre sesiones y la versión de datos que refleja"""
+    return {"indice": None, "version": None, "lock": threading.Lock()}
+
+def obtener_indice_busqueda(historico=False):
+    """Índice de búsqueda al día con la última lectura de Reservas (con `historico`, también las temporadas archivadas)"""
+    datos = reservas_en_rango() if historico else cargar_datos()
+    version = datos.attrs.get('version')
+    almacen = _almacen_busqueda(historico)
+    with almacen["lock"]:
+        if almacen["indice"] is None:
+            almacen["indice"] = IndiceTrigramas(datos)
+        elif version is not None and version != almacen["version"]:
+            almacen["indice"] = almacen["indice"].actualizar(datos)
+        almacen["version"] = version or almacen["version"]
+        return almacen["indice"], datos
@@ -1,10 +1,13 @@
 # functions/calendario.py
 import streamlit as st
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 from streamlit_calendar import calendar
-from functions.data_utils import cargar_datos, SPREADSHEET_ID, SHEET_NAME
-from functions.gspread_client import get_gsheet_client
+from functions.data_utils import reservas_en_rango, refrescar_datos, eliminar_fila_reserva
+from functions.indice_reservas import IndiceFechas
+from functions.duraciones import calcular_intervalos, ocupacion_por_franja, FRANJA_OCUPACION, COLUMNA_SEGUNDOS
+from functions.rendimiento import medido, cache_medida
 
 # Paleta de colores para actividades
 COLORES_ACTIVIDADES = {
@@ -21,55 +24,188 @@ COLORES_ACTIVIDADES = {
     "Senderismo": "#00BBF9"
 }
 
-def mostrar_calendario_responsive():
-    st.header("🗓️ Calendario de Actividades (Responsive)")
-    
-    # Cargar datos
-    datos = cargar_datos()
-    
-    if datos.empty:
-        st.info("No hay actividades programadas")
-        return
-    
-    # Preparar eventos para el calendario
+# Vistas disponibles y su equivalente en FullCalendar
+VISTAS_CALENDARIO = {
+    "Mes": "dayGridMonth",
+    "Semana": "dayGridWeek",
+    "Día": "dayGridDay",
+    "Lista": "listMonth",
+    "Recursos": "resourceTimelineWeek"
+}
+
+# Vistas del plugin premium FullCalendar Scheduler: necesitan la clave de la
+# licencia comercial en secrets.toml ([calendario] licencia_scheduler); sin
+# ella no se ofrecen
+VISTAS_SCHEDULER = {"Recursos"}
+
+def _licencia_scheduler():
+    """Clave de licencia de FullCalendar Scheduler configurada, o None"""
+    try:
+        return st.secrets.get("calendario", {}).get("licencia_scheduler") or None
+    except FileNotFoundError:
+        return None
+
+# Margen añadido a cada lado del rango visible al pedir eventos
+MARGEN_VENTANA = timedelta(days=2)
+
+# Una entrada por versión de datos y por combinación de temporadas archivadas a la vista
+@cache_medida(st.cache_resource(max_entries=4))
+def indice_eventos(version, _datos):
+    """Construye los eventos una sola vez por versión de datos, ordenados por inicio.
+
+    Devuelve el índice de intervalos por fecha de inicio y la lista de eventos
+    en el mismo orden, de forma que un rango de fechas es un corte de la lista.
+    """
+    intervalos = IndiceFechas(calcular_intervalos(_datos), columna_fecha='Inicio')
     eventos = []
-    for index, row in datos.iterrows():
-        resourceId = index
-        fecha_actividad = row['Fecha Actividad']
-        hora_inicio = datetime.strptime(row['Hora inicio Actividad'], '%H:%M:%S').time()
-        start_datetime = datetime.combine(fecha_actividad, hora_inicio)
-        
-        # Calcular fecha de fin (asumiendo duración fija)
-        end_datetime = start_datetime + timedelta(hours=2)
-        
+    for index, inicio, fin, actividad, nombre in zip(
+        intervalos.df.index, intervalos.df['Inicio'], intervalos.df['Fin'],
+        intervalos.df['Actividad'], intervalos.df['Nombre']
+    ):
+        resourceId = int(index)
         eventos.append({
-            "title": f"{row['Actividad']} - {row['Nombre']}",
-            "start": start_datetime.isoformat(),
-            "end": end_datetime.isoformat(),
-            "color": COLORES_ACTIVIDADES.get(row['Actividad'], "#CCCCCC"),
+            "title": f"{actividad} - {nombre}",
+            "start": inicio.isoformat(),
+            "end": fin.isoformat(),
+            "color": COLORES_ACTIVIDADES.get(actividad, "#CCCCCC"),
             "id": str(resourceId),  # Usar 'id' en lugar de 'resourceId'
+            "resourceId": actividad,  # Fila de la vista de recursos
             "extendedProps": {  # Propiedades adicionales
                 "index": resourceId,
-                "actividad": row['Actividad'],
-                "nombre": row['Nombre']
+                "actividad": actividad,
+                "nombre": nombre
             }
         })
     
+    return intervalos, eventos
+
+@cache_medida(st.cache_resource(max_entries=4))
+def ocupacion_actividades(version, _datos):
+    """Ocupación por actividad y franja horaria, precalculada una vez por versión de datos"""
+    return ocupacion_por_franja(calcular_intervalos(_datos))
+
+@medido()
+def resumen_ocupacion(ocupacion, desde, hasta):
+    """Agrega la ocupación por día dentro de [desde, hasta): pico de personas y horas ocupadas"""
+    actividades, franjas, personas, reservas = ocupacion
+    izq = np.searchsorted(franjas, np.datetime64(desde, 'ns'), side='left')
+    der = np.searchsorted(franjas, np.datetime64(hasta, 'ns'), side='left')
+    franjas_por_dia = int(pd.Timedelta(days=1) / FRANJA_OCUPACION)
+    # La rejilla empieza a medianoche, así que los cortes caen en límites de día
+    izq -= izq % franjas_por_dia
+    der -= der % franjas_por_dia
+    if der <= izq:
+        return pd.DataFrame()
+    
+    dias = franjas[izq:der:franjas_por_dia]
+    forma = (len(actividades), -1, franjas_por_dia)
+    pico = personas[:, izq:der].reshape(forma).max(axis=2)
+    horas = (reservas[:, izq:der].reshape(forma) > 0).sum(axis=2) * (FRANJA_OCUPACION / pd.Timedelta(hours=1))
+    
+    columnas = pd.to_datetime(dias).strftime('%a %d/%m')
+    return pd.concat({
+        "Pico de personas": pd.DataFrame(pico, index=actividades, columns=columnas),
+        "Horas ocupadas": pd.DataFrame(horas, index=actividades, columns=columnas),
+    }, axis=1)
+
+@medido()
+def eventos_en_rango(intervalos, eventos, desde, hasta):
+    """Devuelve los eventos que empiezan en [desde, hasta) en O(log n + k)"""
+    izq, der = intervalos.posiciones(desde, hasta)
+    return eventos[izq:der]
+
+def calcular_ventana(vista, ancla):
+    """Rango de fechas [inicio, fin) que muestra FullCalendar para la vista y la fecha ancla"""
+    if vista == "Mes":
+        # La rejilla mensual empieza el domingo anterior al día 1 y ocupa 6 semanas
+        primero = ancla.replace(day=1)
+        inicio = primero - timedelta(days=(primero.weekday() + 1) % 7)
+        fin = inicio + timedelta(weeks=6)
+    elif vista == "Lista":
+        inicio = ancla.replace(day=1)
+        fin = (inicio + timedelta(days=32)).replace(day=1)
+    elif vista in ("Semana", "Recursos"):
+        inicio = ancla - timedelta(days=(ancla.weekday() + 1) % 7)
+        fin = inicio + timedelta(weeks=1)
+    else:  # Día
+        inicio = ancla
+        fin = ancla + timedelta(days=1)
+    return inicio, fin
+
+def desplazar_ancla(vista, ancla, pasos):
+    """Mueve la fecha ancla un periodo (mes, semana o día) hacia delante o hacia atrás"""
+    if vista in ("Mes", "Lista"):
+        return (pd.Timestamp(ancla) + pd.DateOffset(months=pasos)).date()
+    if vista in ("Semana", "Recursos"):
+        return ancla + timedelta(weeks=pasos)
+    return ancla + timedelta(days=pasos)
+
+@medido()
+def mostrar_calendario_responsive():
+    st.header("🗓️ Calendario de Actividades (Responsive)")
+    
     # Configuración del calendario
+    licencia = _licencia_scheduler()
+    vistas = [v for v in VISTAS_CALENDARIO if licencia or v not in VISTAS_SCHEDULER]
     modo = st.radio("Vista del calendario:", 
-                   ["Mes", "Semana", "Día", "Lista"], 
+                   vistas, 
                    horizontal=True,
                    index=0)
+    if not licencia:
+        st.caption("⚠️ La vista Recursos necesita una licencia de FullCalendar Scheduler "
+                   "([calendario] licencia_scheduler en secrets.toml)")
+    
+    # Navegación: la fecha ancla determina la ventana de eventos que se envía
+    if 'calendario_ancla' not in st.session_state:
+        st.session_state.calendario_ancla = datetime.now().date()
+    
+    col_prev, col_hoy, col_next, _ = st.columns([1, 1, 1, 5])
+    with col_prev:
+        if st.button("◀ Anterior", key="calendario_prev"):
+            st.session_state.calendario_ancla = desplazar_ancla(modo, st.session_state.calendario_ancla, -1)
+    with col_hoy:
+        if st.button("Hoy", key="calendario_hoy"):
+            st.session_state.calendario_ancla = datetime.now().date()
+    with col_next:
+        if st.button("Siguiente ▶", key="calendario_next"):
+            st.session_state.calendario_ancla = desplazar_ancla(modo, st.session_state.calendario_ancla, 1)
+    
+    ancla = st.session_state.calendario_ancla
+    inicio, fin = calcular_ventana(modo, ancla)
+    
+    # Cargar datos: la hoja activa, más las temporadas archivadas si la ventana llega a ellas
+    datos = reservas_en_rango(
+        datetime.combine(inicio, datetime.min.time()) - MARGEN_VENTANA,
+        datetime.combine(fin, datetime.min.time()) + MARGEN_VENTANA
+    )
+    
+    if datos.empty:
+        st.info("No hay actividades programadas")
+        return
+    
+    # Preparar solo los eventos de la ventana visible (más un pequeño margen)
+    intervalos, todos_eventos = indice_eventos(datos.attrs.get('version'), datos)
+    eventos = eventos_en_rango(
+        intervalos, todos_eventos,
+        datetime.combine(inicio, datetime.min.time()) - MARGEN_VENTANA,
+        datetime.combine(fin, datetime.min.time()) + MARGEN_VENTANA
+    )
+    
+    # Las reservas sin fecha u hora de inicio válida no tienen intervalo (la Agenda las lista)
+    sin_hora = int((datos[COLUMNA_SEGUNDOS].isna() | datos['Fecha Actividad'].isna()).sum())
+    if sin_hora:
+        st.caption(f"⚠️ {sin_hora} reservas sin fecha u hora de inicio válida no aparecen en el calendario")
     
     calendar_options = {
         "editable": False,
         "selectable": True,
         "headerToolbar": {
-            "left": "prev,next today",
+            "left": "",
             "center": "title",
-            "right": "dayGridMonth,dayGridWeek,dayGridDay,listMonth"
+            "right": ""
         },
-        "initialDate": datetime.now().date().isoformat(),
+        "initialDate": ancla.isoformat(),
+        "initialView": VISTAS_CALENDARIO[modo],
         "eventTimeFormat": { 
             "hour": "2-digit",
             "minute": "2-digit",
@@ -77,19 +213,20 @@ def mostrar_calendario_responsive():
         }
     }
     
-    if modo == "Mes":
-        calendar_options["initialView"] = "dayGridMonth"
-    elif modo == "Semana":
-        calendar_options["initialView"] = "dayGridWeek"
-    elif modo == "Día":
-        calendar_options["initialView"] = "dayGridDay"
-    else:  # Vista de lista
-        calendar_options["initialView"] = "listMonth"
+    if modo == "Recursos":
+        # Una fila por actividad para ver la carga de cada flota
+        actividades = sorted(set(COLORES_ACTIVIDADES) | set(datos['Actividad'].unique()))
+        calendar_options["resources"] = [{"id": a, "title": a} for a in actividades]
+        calendar_options["resourceAreaHeaderContent"] = "Actividad"
+        calendar_options["resourceAreaWidth"] = "20%"
     
-    # Mostrar el calendario
+    # Mostrar el calendario (streamlit_calendar pasa license_key como schedulerLicenseKey;
+    # las vistas sin Scheduler no la usan)
+    opciones_licencia = {"license_key": licencia} if licencia else {}
     calendario_seleccionado = calendar(
         events=eventos,
         options=calendar_options,
+        **opciones_licencia,
         custom_css="""
             .fc-event {
                 cursor: pointer;
@@ -112,9 +249,33 @@ def mostrar_calendario_responsive():
                 }
             }
         """,
-        key="calendario_actividades"
+        # La clave incluye la ventana: cada navegación monta el calendario con sus eventos
+        key=f"calendario_actividades_{modo}_{inicio.isoformat()}"
     )
     
+    # Los callbacks informan del rango activo; si no coincide con la ventana cargada, se realinea
+    if calendario_seleccionado and "view" in calendario_seleccionado.get(calendario_seleccionado.get("callback", ""), {}):
+        vista_actual = calendario_seleccionado[calendario_seleccionado["callback"]]["view"]
+        inicio_visible = pd.Timestamp(vista_actual["currentStart"]).tz_localize(None).to_pydatetime()
+        # El margen absorbe el desfase horario del ISO en UTC que envía el navegador
+        if not (datetime.combine(inicio, datetime.min.time()) - MARGEN_VENTANA
+                <= inicio_visible
+                < datetime.combine(fin, datetime.min.time()) + MARGEN_VENTANA):
+            st.session_state.calendario_ancla = (inicio_visible + MARGEN_VENTANA).date()
+            st.rerun()
+    
+    if modo == "Recursos":
+        st.subheader("Ocupación por actividad")
+        resumen = resumen_ocupacion(
+            ocupacion_actividades(datos.attrs.get('version'), datos),
+            datetime.combine(inicio, datetime.min.time()),
+            datetime.combine(fin, datetime.min.time())
+        )
+        if resumen.empty:
+            st.info("No hay actividades en esta semana")
+        else:
+            st.dataframe(resumen)
+    
     # Mostrar detalles cuando se selecciona un evento
     if calendario_seleccionado and "eventClick" in calendario_seleccionado:
         evento_clic = calendario_seleccionado["eventClick"]["event"]
@@ -151,9 +312,9 @@ def mostrar_calendario_responsive():
             return
             
         try:
-            # Convertir a entero y obtener datos
-            reserva_data = datos.iloc[int(evento_id)]
-        except (ValueError, TypeError, IndexError) as e:
+            # Convertir a entero y obtener datos (el id es la etiqueta de fila de la hoja)
+            reserva_data = datos.loc[int(evento_id)]
+        except (ValueError, TypeError, KeyError) as e:
             st.error(f"Error al obtener datos de la reserva: {str(e)}")
             st.write(f"ID del evento: {evento_id}")
             st.write(f"Número total de reservas: {len(datos)}")
@@ -171,18 +332,22 @@ def mostrar_calendario_responsive():
             if reserva_data.get('Notas', ''):
                 st.write(f"**Notas:** {reserva_data['Notas']}")
         
-        # Botones de acción
-        col_edit, col_del, _ = st.columns(3)
-        with col_edit:
-            if st.button("✏️ Editar", key=f"edit_{evento_id}"):
-                st.session_state.reserva_seleccionada = (reserva_data.to_dict(), int(evento_id))
-                st.rerun()
-        with col_del:
-            if st.button("🗑️ Eliminar", key=f"delete_{evento_id}"):
-                if eliminar_reserva(int(evento_id)):
-                    st.success("Reserva eliminada")
-                    st.cache_data.clear()
+        # Las reservas archivadas (índice negativo) ya no están en la hoja: solo lectura
+        if int(evento_id) < 0:
+            st.caption("📦 Reserva archivada (temporada pasada): no se puede editar ni eliminar")
+        else:
+            # Botones de acción
+            col_edit, col_del, _ = st.columns(3)
+            with col_edit:
+                if st.button("✏️ Editar", key=f"edit_{evento_id}"):
+                    st.session_state.reserva_seleccionada = (reserva_data.to_dict(), int(evento_id))
                     st.rerun()
+            with col_del:
+                if st.button("🗑️ Eliminar", key=f"delete_{evento_id}"):
+                    if eliminar_reserva(int(evento_id), reserva_data):
+                        st.success("Reserva eliminada")
+                        refrescar_datos()
+                        st.rerun()
     
     # Debug: Mostrar información del evento seleccionado
     if st.checkbox("Modo debug (mostrar info del evento)"):
@@ -202,13 +367,10 @@ def mostrar_calendario_responsive():
                 unsafe_allow_html=True
             )
 
-def eliminar_reserva(index):
-    """Elimina una reserva por su índice"""
+def eliminar_reserva(index, reserva):
+    """Elimina una reserva por su índice, si la fila de la hoja sigue siendo `reserva`"""
     try:
-        gc = get_gsheet_client()
-        spreadsheet = gc.open_by_key(SPREADSHEET_ID)
-        worksheet = spreadsheet.worksheet(SHEET_NAME)
-        worksheet.delete_rows(index + 2)  # +2 por encabezado y base 1
+        eliminar_fila_reserva(index, reserva)
         return True
     except Exception as e:
         st.error(f"Error al eliminar: {str(e)}")
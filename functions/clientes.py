@@ -2,14 +2,15 @@
 # functions/clientes.py
 import streamlit as st
 from datetime import datetime
-from functions.data_utils import cargar_clientes, guardar_cliente
-from functions.reservas import calcular_precio, ACTIVIDADES_MANUALES
+from functions.data_utils import cargar_clientes, guardar_cliente, importar_clientes, refrescar_datos
+from functions.importacion import leer_archivo_clientes, COLUMNAS_OBLIGATORIAS
+from functions.reservas import calcular_precio, opciones_duracion, ACTIVIDADES_MANUALES
 
 def mostrar_formulario_cliente():
     st.header("Formulario de Clientes")
 
     if st.button("🔄 Actualizar reservas", key="refresh_reservations"):
-        st.cache_data.clear()
+        refrescar_datos()
         st.rerun()    
     
     # Campos que afectan el precio - FUERA del formulario para que se actualicen automáticamente
@@ -18,7 +19,7 @@ def mostrar_formulario_cliente():
         "Ebikes","Alquiler equipos ferrata", "Grupos", "Senderismo"
     ], key="actividad_select")
     
-    duracion = st.selectbox("Duración*", ["1 hora", "2 horas", "Medio día", "Todo el día"], key="duracion_select")
+    duracion = st.selectbox("Duración*", opciones_duracion(actividad), key="duracion_select")
     
     personas = st.number_input("Número de Personas*", min_value=1, max_value=50, value=1, key="personas_input")
     
@@ -83,4 +84,44 @@ def mostrar_formulario_cliente():
                     st.success("Cliente guardado exitosamente!")
                     st.balloons()
                 else:
-                    st.error("Error al guardar el cliente")
\ No newline at end of file
+                    st.error("Error al guardar el cliente")
+
+    mostrar_importacion_clientes()
+
+def mostrar_importacion_clientes():
+    """Importación masiva de clientes desde un CSV o XLSX (p. ej. temporadas anteriores)"""
+    with st.expander("📥 Importar clientes desde CSV/XLSX"):
+        st.caption("Columnas obligatorias: " + ", ".join(COLUMNAS_OBLIGATORIAS) +
+                   ". Opcionales: Fecha Registro, Notas. Edad e Ingresos por Persona se calculan.")
+        archivo = st.file_uploader("Archivo de clientes", type=["csv", "xlsx", "xls"], key="importar_archivo")
+        if archivo is None or not st.button("📥 Importar", key="importar_clientes"):
+            return
+
+        try:
+            df = leer_archivo_clientes(archivo)
+        except Exception as e:
+            st.error(f"No se pudo leer el archivo: {str(e)}")
+            return
+
+        barra = st.progress(0.0, text="Escribiendo clientes...")
+        resultado = importar_clientes(
+            df, al_progresar=lambda escritas, total: barra.progress(
+                escritas / total, text=f"Escritos {escritas} de {total} clientes"
+            )
+        )
+        if resultado is None:
+            return
+        escritas, duplicados, rechazados = resultado
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Importados", escritas)
+        col2.metric("Duplicados (omitidos)", len(duplicados))
+        col3.metric("Rechazados", len(rechazados))
+        if escritas:
+            st.success(f"{escritas} clientes importados")
+        if len(duplicados):
+            st.write("Duplicados")
+            st.dataframe(duplicados.head(200))
+        if len(rechazados):
+            st.write("Rechazados")
+            st.dataframe(rechazados.head(200))
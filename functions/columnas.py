@@ -0,0 +1,13 @@
+# functions/columnas.py
+# Columnas de las hojas de Google Sheets (sin dependencias, para poder usarlas fuera de la app)
+
+ENCABEZADOS_CLIENTES = [
+    "ID", "Sexo", "Fecha Nacimiento", "Ciudad", "Pais", 
+    "Actividad", "Fecha Actividad", "Hora Inicio", "Duracion", "Personas", "Precio",
+    "Fecha Registro", "Edad", "Ingresos por Persona", "Notas"
+]
+
+ENCABEZADOS_RESERVAS = [
+    "Nombre", "Actividad", "Fecha Actividad", "Hora inicio Actividad", "Duración", "Personas",
+    "Contacto", "Email o Teléfono", "Precio", "Notas", "Fecha Reserva", "Precio Unitario"
+]
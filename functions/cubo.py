@@ -0,0 +1,324 @@
+# functions/cubo.py
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+from functions.data_utils import DIRECTORIO_DATOS
+from functions.rendimiento import cache_medida
+
+# Dimensiones por las que se agregan los reportes
+DIMENSIONES_CUBO = [
+    'Año', 'Mes', 'Día del Mes', 'Día de la Semana', 'Hora Inicio',
+    'Ciudad', 'Actividad', 'Grupo Edad', 'Sexo'
+]
+
+# Medidas aditivas de cada celda:
+#   Filas      -> número de registros (equivale a .size())
+#   Reservas   -> registros con ID (equivale a 'ID': 'count')
+#   Ingresos   -> suma de Precio
+#   N Precio   -> registros con Precio (para medias)
+#   Personas   -> suma de Personas
+#   Suma Edad  -> suma de Edad (para medias)
+MEDIDAS_CUBO = ['Filas', 'Reservas', 'Ingresos', 'N Precio', 'Personas', 'Suma Edad']
+
+# Cubo persistido en disco; cambiar ESQUEMA_CUBO si cambian dimensiones o medidas
+ESQUEMA_CUBO = 1
+RUTA_CUBO = DIRECTORIO_DATOS / "cubo_clientes.pkl"
+# Diario de cambios posteriores a la última foto del cubo (uno por cliente guardado)
+RUTA_CAMBIOS_CUBO = DIRECTORIO_DATOS / "cubo_clientes.cambios"
+
+# Cada cuánto se recalcula el cubo desde cero como control de consistencia
+# (las edades avanzan y la hoja puede editarse a mano)
+INTERVALO_RECALCULO = 24 * 3600
+
+def medidas_clientes(df):
+    """Dimensiones y medidas por fila de un dataframe de clientes procesado"""
+    celdas = df[DIMENSIONES_CUBO].copy()
+    celdas['Filas'] = 1
+    celdas['Reservas'] = df['ID'].notna().astype(int)
+    celdas['Ingresos'] = df['Precio'].fillna(0)
+    celdas['N Precio'] = df['Precio'].notna().astype(int)
+    celdas['Personas'] = df['Personas'].fillna(0)
+    celdas['Suma Edad'] = df['Edad'].fillna(0)
+    return celdas
+
+def _agrupar_celdas(df):
+    return (
+        medidas_clientes(df)
+          .groupby(DIMENSIONES_CUBO, observed=True, dropna=False, sort=False)[MEDIDAS_CUBO]
+          .sum()
+          .reset_index()
+    )
+
+def _claves(celdas):
+    """Tuplas de dimensiones de cada celda, con None en lugar de NaN para que sirvan de clave"""
+    dimensiones = celdas[DIMENSIONES_CUBO].astype(object)
+    return list(dimensiones.where(dimensiones.notna(), None).itertuples(index=False, name=None))
+
+# Columnas que identifican una fila de la hoja Clientes (sin las calculadas,
+# cuyo formato puede cambiar al volver de Google Sheets)
+COLUMNAS_HUELLA = [
+    'ID', 'Sexo', 'Fecha Nacimiento', 'Ciudad', 'Actividad',
+    'Fecha Actividad', 'Hora Inicio', 'Personas', 'Precio', 'Fecha Registro'
+]
+
+def huella_fila(fila):
+    """Huella estable de una fila de Clientes (dict o Series), igual para el registro guardado y el leído"""
+    textos = []
+    for columna in COLUMNAS_HUELLA:
+        valor = fila.get(columna, '')
+        if isinstance(valor, (int, float, np.integer, np.floating)) and not isinstance(valor, bool):
+            valor = float(valor)
+            valor = str(int(valor)) if valor.is_integer() else repr(valor)
+        textos.append(str(valor))
+    return hashlib.sha1("\x1f".join(textos).encode("utf-8")).hexdigest()
+
+class CuboClientes:
+    """Agregados de clientes (conteos, ingresos, personas) por todas las dimensiones.
+
+    Se construye con un único groupby sobre el dataframe procesado; después
+    cada gráfico y tabla se obtiene agregando las celdas del cubo, cuyo tamaño
+    depende del número de combinaciones distintas y no de las filas originales.
+
+    Las celdas se guardan en un dict clave -> medidas, así que incorporar un
+    cliente nuevo es O(1); el dataframe de celdas se rehace solo al consultarlo.
+    `filas_origen` y `huella` identifican las filas de la hoja ya agregadas.
+    """
+
+    def __init__(self, celdas, filas_origen=0, huella=None, calculado=None):
+        self._tipos = celdas.dtypes.to_dict()
+        self._celdas = dict(zip(_claves(celdas), celdas[MEDIDAS_CUBO].to_numpy(dtype=float)))
+        self._df = celdas
+        self._lock = threading.RLock()
+        self.filas_origen = filas_origen
+        self.huella = huella
+        self.calculado = time.time() if calculado is None else calculado
+
+    @classmethod
+    def desde_clientes(cls, df, filas_origen=0, huella=None):
+        return cls(_agrupar_celdas(df), filas_origen, huella)
+
+    def __getstate__(self):
+        with self._lock:
+            return {
+                "celdas": dict(self._celdas), "tipos": self._tipos,
+                "filas_origen": self.filas_origen, "huella": self.huella,
+                "calculado": self.calculado,
+            }
+
+    def __setstate__(self, estado):
+        self._celdas = estado["celdas"]
+        self._tipos = estado["tipos"]
+        self._df = None
+        self._lock = threading.RLock()
+        self.filas_origen = estado["filas_origen"]
+        self.huella = estado["huella"]
+        self.calculado = estado["calculado"]
+
+    @property
+    def celdas(self):
+        with self._lock:
+            if self._df is None:
+                self._df = self._materializar()
+            return self._df
+
+    def _materializar(self):
+        celdas = pd.DataFrame.from_records(list(self._celdas), columns=DIMENSIONES_CUBO)
+        medidas = np.array(list(self._celdas.values())).reshape(-1, len(MEDIDAS_CUBO))
+        for i, medida in enumerate(MEDIDAS_CUBO):
+            celdas[medida] = medidas[:, i]
+        for columna, tipo in self._tipos.items():
+            try:
+                celdas[columna] = celdas[columna].astype(tipo)
+            except (TypeError, ValueError):
+                # p. ej. una dimensión entera que ahora tiene huecos
+                pass
+        return celdas
+
+    def incorporar(self, df, filas_origen=0, huella=None):
+        """Suma al cubo los clientes procesados de `df` (normalmente uno recién guardado).
+
+        `filas_origen` son las filas de la hoja que representan, aunque el
+        procesado haya descartado alguna (edades imposibles). Devuelve los
+        cambios aplicados (clave, medidas) para poder registrarlos.
+        """
+        cambios = []
+        if not df.empty:
+            medidas = np.column_stack([
+                np.ones(len(df)),
+                df['ID'].notna().to_numpy(dtype=float),
+                df['Precio'].fillna(0).to_numpy(dtype=float),
+                df['Precio'].notna().to_numpy(dtype=float),
+                df['Personas'].fillna(0).to_numpy(dtype=float),
+                df['Edad'].fillna(0).to_numpy(dtype=float),
+            ])
+            cambios = list(zip(_claves(df), medidas))
+        self.aplicar(cambios, filas_origen, huella)
+        return cambios
+
+    def aplicar(self, cambios, filas_origen=0, huella=None):
+        """Suma a cada celda sus medidas; O(1) por cambio"""
+        with self._lock:
+            # mismo orden de columnas que MEDIDAS_CUBO
+            for clave, medidas in cambios:
+                actual = self._celdas.get(clave)
+                self._celdas[clave] = medidas if actual is None else actual + medidas
+            if cambios:
+                self._df = None
+            self.filas_origen += filas_origen
+            if huella is not None:
+                self.huella = huella
+
+    @property
+    def vacio(self):
+        return self.celdas.empty
+
+    def agregar(self, dimensiones, medidas=MEDIDAS_CUBO, ordenar=True):
+        """Suma las medidas por las dimensiones indicadas (como un groupby sobre los datos).
+
+        Con ordenar=False los grupos salen en orden de primera aparición en los
+        datos originales, porque las celdas se crean en ese orden.
+        """
+        return self.celdas.groupby(dimensiones, observed=True, sort=ordenar)[list(medidas)].sum()
+
+    def conteo(self, dimension, medida='Filas'):
+        """Equivalente a value_counts(): medida por valor, de mayor a menor (empates por aparición)"""
+        return (
+            self.agregar([dimension], [medida], ordenar=False)[medida]
+                .sort_values(ascending=False, kind='stable')
+        )
+
+    def tabla(self, filas, columnas, medida='Filas'):
+        """Tabla cruzada filas x columnas de una medida, con ceros donde no hay datos"""
+        return self.agregar([filas, columnas], [medida])[medida].unstack(fill_value=0)
+
+    def valores(self, dimension):
+        """Valores distintos de una dimensión, en orden de aparición"""
+        return pd.unique(self.celdas[dimension].dropna())
+
+# ------------------- PERSISTENCIA -------------------
+
+def cargar_cubo_guardado():
+    """Lee la foto del cubo y le aplica el diario de cambios.
+
+    Devuelve None si no hay foto, es de otro esquema o está dañada. Un diario
+    cortado a medias solo pierde sus últimos cambios: el cubo queda cubriendo
+    menos filas y las que faltan se agregan al volver a leer la hoja.
+    """
+    try:
+        with open(RUTA_CUBO, "rb") as f:
+            guardado = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if guardado.get("esquema") != ESQUEMA_CUBO:
+        return None
+    cubo = guardado["cubo"]
+
+    try:
+        with open(RUTA_CAMBIOS_CUBO, "rb") as f:
+            while True:
+                entrada = pickle.load(f)
+                # Las entradas ya incluidas en la foto se saltan
+                if entrada["hasta"] > cubo.filas_origen:
+                    cubo.aplicar(entrada["cambios"], entrada["hasta"] - cubo.filas_origen, entrada["huella"])
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError):
+        pass
+    return cubo
+
+def guardar_cubo(cubo):
+    """Guarda una foto del cubo (escritura atómica) y vacía el diario.
+
+    Si el disco no lo permite se sigue solo en memoria.
+    """
+    try:
+        RUTA_CUBO.parent.mkdir(parents=True, exist_ok=True)
+        temporal = RUTA_CUBO.with_suffix(".tmp")
+        with open(temporal, "wb") as f:
+            pickle.dump({"esquema": ESQUEMA_CUBO, "cubo": cubo}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, RUTA_CUBO)
+        RUTA_CAMBIOS_CUBO.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+def registrar_cambios(cambios, hasta, huella):
+    """Añade al diario los cambios de un cliente guardado (coste independiente del tamaño del cubo)"""
+    try:
+        RUTA_CAMBIOS_CUBO.parent.mkdir(parents=True, exist_ok=True)
+        with open(RUTA_CAMBIOS_CUBO, "ab") as f:
+            pickle.dump({"cambios": cambios, "hasta": hasta, "huella": huella}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+
+# ------------------- CUBO COMPARTIDO -------------------
+
+@st.cache_resource
+def _almacen_cubo():
+    """Cubo incremental de la hoja Clientes, compartido entre sesiones"""
+    return {"cubo": cargar_cubo_guardado(), "lock": threading.Lock()}
+
+def validar_origen(clientes_raw):
+    """Descarta el cubo si la hoja ya no empieza por las filas que tiene agregadas.
+
+    La hoja Clientes solo crece por el final: si la fila en la posición
+    filas_origen - 1 sigue siendo la misma, el cubo cubre un prefijo válido.
+    """
+    almacen = _almacen_cubo()
+    with almacen["lock"]:
+        cubo = almacen["cubo"]
+        if cubo is None or cubo.filas_origen == 0:
+            return
+        if (cubo.filas_origen > len(clientes_raw)
+                or huella_fila(clientes_raw.iloc[cubo.filas_origen - 1]) != cubo.huella):
+            almacen["cubo"] = None
+
+def incorporar_clientes(df, filas_origen, huella):
+    """Añade al cubo compartido los clientes recién guardados en la hoja"""
+    almacen = _almacen_cubo()
+    with almacen["lock"]:
+        cubo = almacen["cubo"]
+        if cubo is None:
+            return
+        cambios = cubo.incorporar(df, filas_origen, huella)
+        registrar_cambios(cambios, cubo.filas_origen, huella)
+
+# Una entrada por versión y combinación de filtros de Reportes en uso (los cubos son pequeños)
+@cache_medida(st.cache_resource(max_entries=8))
+def _cubo_por_version(version, _df):
+    return CuboClientes.desde_clientes(_df)
+
+def obtener_cubo(df):
+    """Cubo de los clientes procesados, compartido entre sesiones.
+
+    Si `df` es el procesado completo de la hoja (lleva attrs 'filas_origen' y
+    'huella'), se usa el cubo incremental: solo se agregan las filas nuevas
+    y se recalcula desde cero cada INTERVALO_RECALCULO. Para otros dataframes
+    se construye un cubo por versión de datos.
+    """
+    filas_origen = df.attrs.get('filas_origen')
+    if filas_origen is None:
+        version = df.attrs.get('version')
+        if version is None:
+            return CuboClientes.desde_clientes(df)
+        return _cubo_por_version(version, df)
+
+    almacen = _almacen_cubo()
+    with almacen["lock"]:
+        cubo = almacen["cubo"]
+        if (cubo is None or cubo.filas_origen > filas_origen
+                or time.time() - cubo.calculado > INTERVALO_RECALCULO):
+            cubo = CuboClientes.desde_clientes(df, filas_origen, df.attrs.get('huella'))
+        elif cubo.filas_origen < filas_origen:
+            # El índice del procesado es la posición de la fila en la hoja
+            nuevas = df.loc[df.index >= cubo.filas_origen]
+            cubo.incorporar(nuevas, filas_origen - cubo.filas_origen, df.attrs.get('huella'))
+        else:
+            return cubo
+        almacen["cubo"] = cubo
+        guardar_cubo(cubo)
+        return cubo
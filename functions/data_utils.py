@@ -1,66 +1,227 @@
 # functions/data_utils.py
 
 import hashlib
+import logging
+from pathlib import Path
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from gspread.utils import numericise
 from functions.gspread_client import get_gsheet_client
+from functions.columnas import ENCABEZADOS_CLIENTES
+from functions.importacion import normalizar_ids, preparar_importacion, escribir_por_lotes
+from functions.diario import abrir_diario, COLUMNA_CLAVE
+from functions.duraciones import normalizar_reservas
+from functions.archivo import particiones, en_rango, limite_archivo, leer_particion
+from functions.rendimiento import tramo, cache_medida
 
 # Configuración desde secrets
 SPREADSHEET_ID = st.secrets["google_sheets"]["spreadsheet_id"]
 SHEET_NAME = st.secrets["google_sheets"]["sheet_name"]
+# Directorio local para datos derivados que sobreviven a los reinicios (agregados...)
+DIRECTORIO_DATOS = Path(st.secrets.get("almacenamiento", {}).get("directorio", ".datos"))
 ACTIVIDADES_MANUALES = ["Grupos", "Senderismo"]
+# Diario local de las filas guardadas que aún no están en Sheets
+RUTA_DIARIO = DIRECTORIO_DATOS / "diario_sheets.sqlite3"
+# Archivo en Parquet de las temporadas pasadas (herramientas/archivar_temporadas.py)
+DIRECTORIO_ARCHIVO = DIRECTORIO_DATOS / "archivo_reservas"
 
-@st.cache_data(ttl=300)
+_LOGGER = logging.getLogger(__name__)
+
+# Funciones avisadas con cada cliente guardado (mantienen al día las cachés derivadas)
+_SUSCRIPTORES_CLIENTES = []
+
+def suscribir_cliente_guardado(funcion):
+    """Registra una función que recibe cada cliente guardado como dict columna -> valor"""
+    if funcion not in _SUSCRIPTORES_CLIENTES:
+        _SUSCRIPTORES_CLIENTES.append(funcion)
+    return funcion
+
+def version_contenido(df):
+    """Huella del contenido de una hoja leída: releerla sin cambios da la misma versión
+    (y las cachés derivadas se conservan al caducar la lectura)"""
+    huella = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    huella.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    return huella.hexdigest()[:16]
+
+# Las hojas se cachean como recurso: todas las sesiones reciben el mismo
+# DataFrame (st.cache_data entregaría una copia deserializada en cada llamada).
+# Son de solo lectura: quien necesite cambiarlas trabaja sobre una copia.
+
+@cache_medida(st.cache_resource(ttl=300))
 def cargar_datos():
+    """Carga las reservas desde Google Sheets (DataFrame compartido, no modificar in situ)"""
     try:
-        gc = get_gsheet_client()
-        spreadsheet = gc.open_by_key(SPREADSHEET_ID)
-        worksheet = spreadsheet.worksheet(SHEET_NAME)
-        records = worksheet.get_all_records()
+        with tramo("sheets.cargar_datos"):
+            gc = get_gsheet_client()
+            spreadsheet = gc.open_by_key(SPREADSHEET_ID)
+            worksheet = spreadsheet.worksheet(SHEET_NAME)
+            records = worksheet.get_all_records()
 
-        df = pd.DataFrame(records)
+        df = pd.DataFrame(records).drop(columns=[COLUMNA_CLAVE], errors='ignore')
         df['Fecha Actividad'] = pd.to_datetime(df['Fecha Actividad'], dayfirst=True)
         df['Fecha Reserva'] = pd.to_datetime(df['Fecha Reserva'], dayfirst=True)
-        return df.sort_values('Fecha Actividad', ascending=True)
+        # Hora de inicio y duración tipadas, una vez por lectura
+        df = normalizar_reservas(df)
+        df = df.sort_values('Fecha Actividad', ascending=True)
+        # Versión de los datos: huella del contenido, para que los índices derivados
+        # (calendario, agenda...) se reconstruyan solo si la hoja ha cambiado
+        df.attrs['version'] = version_contenido(df)
+        return df
         
     except Exception as e:
         st.error(f"Error al cargar datos: {str(e)}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=300)
+@cache_medida(st.cache_resource(ttl=300))
 def cargar_clientes():
-    """Carga los clientes desde Google Sheets"""
+    """Carga los clientes desde Google Sheets (DataFrame compartido, no modificar in situ)"""
     try:
-        gc = get_gsheet_client()
-        spreadsheet = gc.open_by_key(SPREADSHEET_ID)
-        
-        try:
-            worksheet = spreadsheet.worksheet("Clientes")
-        except:
-            # Crear la hoja si no existe
-            worksheet = spreadsheet.add_worksheet(title="Clientes", rows=100, cols=14)
-            # Crear encabezados
-            encabezados = [
-                "ID", "Sexo", "Fecha Nacimiento", "Ciudad", "Pais", 
-                "Actividad", "Fecha Actividad", "Hora Inicio", "Duracion", "Personas", "Precio",
-                "Fecha Registro", "Edad", "Ingresos por Persona", "Notas"
-            ]
-            worksheet.append_row(encabezados)
-        
-        records = worksheet.get_all_records()
-        return pd.DataFrame(records)
+        with tramo("sheets.cargar_clientes"):
+            gc = get_gsheet_client()
+            spreadsheet = gc.open_by_key(SPREADSHEET_ID)
+
+            try:
+                worksheet = spreadsheet.worksheet("Clientes")
+            except:
+                # Crear la hoja si no existe
+                worksheet = spreadsheet.add_worksheet(title="Clientes", rows=100, cols=14)
+                # Crear encabezados
+                worksheet.append_row(ENCABEZADOS_CLIENTES)
+
+            records = worksheet.get_all_records()
+        df = pd.DataFrame(records).drop(columns=[COLUMNA_CLAVE], errors='ignore')
+        df.attrs['version'] = version_contenido(df)
+        return df
     except Exception as e:
         st.error(f"Error al cargar clientes: {str(e)}")
         return pd.DataFrame()
 
+def _abrir_hoja(nombre):
+    gc = get_gsheet_client()
+    return gc.open_by_key(SPREADSHEET_ID).worksheet(nombre)
+
+def _al_enviar(hoja, filas):
+    # Las reservas nuevas aparecen en la siguiente carga; los clientes ya
+    # están en las cachés derivadas (se avisan al anotarlos)
+    if hoja == SHEET_NAME:
+        cargar_datos.clear()
+
+def obtener_diario():
+    """Diario de filas pendientes de enviar a Sheets, con su hilo de envío en marcha"""
+    diario = abrir_diario(RUTA_DIARIO)
+    diario.iniciar(_abrir_hoja, al_enviar=_al_enviar)
+    return diario
+
+def filas_pendientes(hoja=None):
+    """Filas guardadas que aún no están en Sheets ('pendientes de sincronizar')"""
+    return obtener_diario().pendientes(hoja)
+
+def refrescar_datos():
+    """Descarta las hojas cacheadas: la siguiente carga vuelve a leerlas (tras escribir en ellas)"""
+    cargar_datos.clear()
+    cargar_clientes.clear()
+
+# Columnas que se comparan para confirmar que una fila de la hoja es la reserva esperada
+COLUMNAS_CONFIRMACION = ['Nombre', 'Actividad', 'Hora inicio Actividad', 'Email o Teléfono']
+
+def _misma_reserva(reserva, fila):
+    """Si la fila leída de la hoja (dict columna -> texto) es `reserva` (valores de cargar_datos)"""
+    # get_all_records convierte a número los textos numéricos (teléfonos): se hace lo mismo
+    return all(str(numericise(str(fila.get(c, '')))).strip() == str(reserva.get(c, '')).strip()
+               for c in COLUMNAS_CONFIRMACION)
+
+def eliminar_fila_reserva(index, reserva):
+    """Borra de la hoja la reserva con índice `index` en cargar_datos, si sigue en esa fila.
+
+    El índice es la posición de la fila cuando se leyó la hoja; si desde
+    entonces se han borrado filas (otra sesión, el archivado de temporadas),
+    en esa posición hay otra reserva. Se lee la fila antes de borrarla y, si
+    no coincide, no se borra nada, se descartan los datos cacheados y se
+    lanza ValueError.
+    """
+    if index < 0:
+        raise ValueError("La reserva está archivada y ya no está en la hoja")
+    with tramo("sheets.eliminar_reserva"):
+        worksheet = _abrir_hoja(SHEET_NAME)
+        fila = dict(zip(worksheet.row_values(1), worksheet.row_values(index + 2)))
+        if not _misma_reserva(reserva, fila):
+            refrescar_datos()
+            raise ValueError("La hoja ha cambiado desde la última lectura y esa fila ya no es esta reserva; "
+                             "se han recargado los datos, vuelve a intentarlo")
+        worksheet.delete_rows(index + 2)  # +2 por encabezado y base 1
+
+# ------------------- TEMPORADAS ARCHIVADAS -------------------
+
+@cache_medida(st.cache_resource(max_entries=24))
+def _leer_particion(ruta, marca):
+    """Una partición del archivo; `marca` (fecha de modificación) la invalida si se reescribe"""
+    with tramo("archivo.leer_particion"):
+        return normalizar_reservas(leer_particion(ruta).drop(columns=[COLUMNA_CLAVE], errors='ignore'))
+
+@cache_medida(st.cache_resource(max_entries=4))
+def _unir_con_archivo(version, rutas, limite, _datos):
+    """Reservas activas más las particiones archivadas `rutas` ((ruta, marca) por mes).
+
+    Las filas de la hoja anteriores a `limite` ya están en el archivo (el
+    manifiesto se escribe antes de borrarlas de la hoja): se omiten para no
+    mostrarlas dos veces mientras la hoja cacheada aún las tenga.
+    """
+    partes = [_leer_particion(ruta, marca) for ruta, marca in rutas]
+    activas = _datos[~(_datos['Fecha Actividad'] < limite)] if not _datos.empty else _datos
+    df = pd.concat(partes + [activas]).sort_values('Fecha Actividad', kind='stable')
+    df.attrs['version'] = (version, rutas, limite)
+    return df
+
+def reservas_en_rango(desde=None, hasta=None):
+    """Reservas con actividad en [desde, hasta), incluidas las archivadas si el rango llega a ellas.
+
+    Si el rango es de la temporada activa devuelve cargar_datos() tal cual
+    (sin leer el archivo). Si no, une a la hoja activa las particiones de los
+    meses del rango (desde=None: todo el archivo). Las filas archivadas
+    llevan índices negativos: no son filas de la hoja y no se editan ni
+    borran. Puede devolver reservas fuera del rango: es para acotar qué se
+    lee, no un filtro.
+    """
+    datos = cargar_datos()
+    limite = limite_archivo(DIRECTORIO_ARCHIVO)
+    if limite is None or (desde is not None and pd.Timestamp(desde) >= limite):
+        return datos
+    rutas = tuple((str(ruta), ruta.stat().st_mtime_ns) for anio, mes, ruta in particiones(DIRECTORIO_ARCHIVO)
+                  if en_rango(anio, mes, desde, hasta))
+    if not rutas:
+        return datos
+    return _unir_con_archivo(datos.attrs.get('version'), rutas, limite, datos)
+
+@cache_medida(st.cache_resource(max_entries=2))
+def _ids_por_version(version, _clientes):
+    """IDs normalizados de la hoja Clientes; se amplía con cada cliente guardado o importado"""
+    ids = set()
+    if not _clientes.empty and 'ID' in _clientes.columns:
+        ids.update(normalizar_ids(_clientes['ID']))
+    # Los guardados que aún no han llegado a la hoja también cuentan
+    pendientes = [f["fila"][0] for f in filas_pendientes("Clientes")]
+    if pendientes:
+        ids.update(normalizar_ids(pd.Series(pendientes)))
+    return ids
+
+def indice_ids_clientes():
+    """Índice en memoria de los IDs de clientes, o None si no se pudo leer la hoja"""
+    clientes = cargar_clientes()
+    version = clientes.attrs.get('version')
+    if version is None:
+        return None
+    return _ids_por_version(version, clientes)
+
 def guardar_cliente(cliente_data):
-    """Guarda un nuevo cliente en Google Sheets"""
+    """Guarda un nuevo cliente: se anota en el diario local y el hilo de envío lo pasa a Google Sheets"""
+    ids = indice_ids_clientes()
+    id_cliente = normalizar_ids(pd.Series([cliente_data['id']]))[0]
+    if ids is not None and id_cliente in ids:
+        st.error(f"Ya existe un cliente con ID {id_cliente}")
+        return False
+
     try:
-        gc = get_gsheet_client()
-        spreadsheet = gc.open_by_key(SPREADSHEET_ID)
-        worksheet = spreadsheet.worksheet("Clientes")
-        
         # Calcular edad
         fecha_nac = datetime.strptime(cliente_data['fecha_nacimiento'], '%d/%m/%Y')
         edad = (datetime.now() - fecha_nac).days // 365
@@ -87,28 +248,77 @@ def guardar_cliente(cliente_data):
             cliente_data.get('notas', '')
         ]
         
-        worksheet.append_row(nueva_fila)
-        return True
+        # Se confirma al anotarlo en el diario local; el hilo de envío lo escribe en la hoja
+        with tramo("diario.guardar_cliente"):
+            obtener_diario().anotar("Clientes", nueva_fila)
     except Exception as e:
         st.error(f"Error al guardar cliente: {str(e)}")
         return False
+    
+    if ids is not None:
+        ids.add(id_cliente)
+    registro = dict(zip(ENCABEZADOS_CLIENTES, nueva_fila))
+    # El cliente ya está guardado: si falla una caché derivada no se le muestra
+    # un error al usuario (volver a enviarlo se rechazaría por ID repetido)
+    for funcion in _SUSCRIPTORES_CLIENTES:
+        try:
+            funcion(registro)
+        except Exception:
+            _LOGGER.exception("Error al avisar del cliente %s a %s", id_cliente, getattr(funcion, "__name__", funcion))
+    return True
+
+def importar_clientes(df, al_progresar=None):
+    """Importa en bloque un archivo de clientes a la hoja Clientes.
+
+    Descarta los IDs que ya existen (índice en memoria) o se repiten en el
+    archivo y escribe el resto con append_rows por lotes. Devuelve
+    (filas escritas, duplicados, rechazados) o None si no se pudo importar.
+    Las cachés derivadas no se avisan fila a fila: se vacía la de clientes
+    y el procesado y el cubo se ponen al día en la siguiente carga.
+    """
+    ids = indice_ids_clientes()
+    if ids is None:
+        st.error("No se pudo leer la hoja Clientes para comprobar los IDs")
+        return None
+    try:
+        filas, ids_nuevos, duplicados, rechazados = preparar_importacion(df, ids)
+    except ValueError as e:
+        st.error(str(e))
+        return None
+
+    escritas = 0
+    try:
+        if filas:
+            with tramo("sheets.importar_clientes"):
+                gc = get_gsheet_client()
+                spreadsheet = gc.open_by_key(SPREADSHEET_ID)
+                worksheet = spreadsheet.worksheet("Clientes")
+                escritas = escribir_por_lotes(worksheet, filas, al_progresar=al_progresar)
+    except Exception as e:
+        escritas = getattr(e, 'filas_escritas', 0)
+        st.error(f"Error al importar clientes ({escritas} de {len(filas)} escritos): {str(e)}")
+    if escritas:
+        ids.update(ids_nuevos[:escritas])
+        cargar_clientes.clear()
+    return escritas, duplicados, rechazados
 
 def cargar_usuarios():
     """Carga los usuarios desde Google Sheets"""
     try:
-        gc = get_gsheet_client()
-        spreadsheet = gc.open_by_key(SPREADSHEET_ID)
-        
-        # Intentar acceder a la hoja de usuarios
-        try:
-            worksheet = spreadsheet.worksheet("Usuarios")
-        except:
-            # Crear la hoja si no existe
-            worksheet = spreadsheet.add_worksheet(title="Usuarios", rows=100, cols=6)
-            # Crear encabezados
-            worksheet.append_row(["nombre", "apellidos", "email", "usuario", "password", "fecha_registro"])
-        
-        records = worksheet.get_all_records()
+        with tramo("sheets.cargar_usuarios"):
+            gc = get_gsheet_client()
+            spreadsheet = gc.open_by_key(SPREADSHEET_ID)
+
+            # Intentar acceder a la hoja de usuarios
+            try:
+                worksheet = spreadsheet.worksheet("Usuarios")
+            except:
+                # Crear la hoja si no existe
+                worksheet = spreadsheet.add_worksheet(title="Usuarios", rows=100, cols=6)
+                # Crear encabezados
+                worksheet.append_row(["nombre", "apellidos", "email", "usuario", "password", "fecha_registro"])
+
+            records = worksheet.get_all_records()
         return pd.DataFrame(records)
     except Exception as e:
         st.error(f"Error al cargar usuarios: {str(e)}")
@@ -128,12 +338,12 @@ def registrar_usuario(nombre, apellidos, email, usuario, password):
         # Fecha de registro
         fecha_registro = datetime.now().strftime("%d/%m/%Y %H:%M")
         
-        gc = get_gsheet_client()
-        spreadsheet = gc.open_by_key(SPREADSHEET_ID)
-        worksheet = spreadsheet.worksheet("Usuarios")
-        
         nueva_fila = [nombre, apellidos, email, usuario, password_hash, fecha_registro]
-        worksheet.append_row(nueva_fila)
+        with tramo("sheets.registrar_usuario"):
+            gc = get_gsheet_client()
+            spreadsheet = gc.open_by_key(SPREADSHEET_ID)
+            worksheet = spreadsheet.worksheet("Usuarios")
+            worksheet.append_row(nueva_fila)
         return True, "Usuario registrado con éxito"
     except Exception as e:
         return False, f"Error al registrar: {str(e)}"
\ No newline at end of file
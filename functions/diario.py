@@ -0,0 +1,252 @@
+# functions/diario.py
+# Diario local (SQLite en modo WAL) de las filas pendientes de escribir en
+# Google Sheets. Guardar una reserva o un cliente solo escribe aquí, que es
+# rápido y sobrevive a un reinicio, y un hilo en segundo plano las envía por
+# lotes. Sin dependencias de la app: data_utils lo conecta con las hojas.
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from functions.importacion import FILAS_POR_LOTE, LIMITE_ESCRITURAS
+
+# Columna de la hoja con la clave de cada fila enviada: si un envío falla sin
+# saber si llegó, antes de reintentarlo se mira qué claves ya están en la hoja
+COLUMNA_CLAVE = "Clave"
+
+# Segundos entre rondas del hilo de envío (anotar una fila lo despierta antes)
+SEGUNDOS_ENTRE_ENVIOS = 5
+# Espera tras un envío fallido: 5 s, 10 s, 20 s... hasta este máximo
+ESPERA_MAXIMA = 300
+# Un envío sin terminar (proceso caído) se puede retomar pasado este tiempo.
+# La reclamación se renueva tras esperar la cuota, así que basta con que cubra
+# las dos llamadas que vienen después (claves y append_rows, 60 s cada una
+# como máximo con el timeout de gspread_client) con margen
+SEGUNDOS_RECLAMO = 300
+# Las filas ya enviadas se conservan unos días (consulta y depuración)
+DIAS_RETENCION = 7
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS filas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clave TEXT NOT NULL UNIQUE,
+    hoja TEXT NOT NULL,
+    fila TEXT NOT NULL,
+    creada REAL NOT NULL,
+    envios INTEGER NOT NULL DEFAULT 0,
+    reintentar REAL NOT NULL DEFAULT 0,
+    reclamada REAL,
+    enviada REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS filas_pendientes ON filas (hoja, id) WHERE enviada IS NULL;
+"""
+
+_LOGGER = logging.getLogger(__name__)
+
+def nueva_clave():
+    return uuid.uuid4().hex
+
+class Diario:
+    """Filas pendientes de enviar a Sheets, con su clave de idempotencia.
+
+    Cada fila se anota con una clave única: anotar dos veces la misma clave
+    (doble clic, reintento del usuario) no la duplica. El envío marca las
+    filas como reclamadas antes de escribir, así que dos procesos con el mismo
+    archivo no envían la misma fila a la vez.
+    """
+
+    def __init__(self, ruta, limite=LIMITE_ESCRITURAS, reloj=time.time):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._limite = limite
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        # FULL: una fila confirmada al usuario sigue ahí aunque se vaya la luz
+        self._conexion.execute("PRAGMA synchronous=FULL")
+        self._conexion.executescript(_ESQUEMA)
+        self._columnas_clave = {}
+        self._aviso = threading.Event()
+        self._hilo = None
+
+    def _ejecutar(self, sql, parametros=()):
+        with self._lock:
+            return self._conexion.execute(sql, parametros).fetchall()
+
+    def anotar(self, hoja, fila, clave=None):
+        """Guarda la fila para enviarla a `hoja` y devuelve su clave (si ya estaba, no hace nada)"""
+        clave = clave or nueva_clave()
+        self._ejecutar("INSERT OR IGNORE INTO filas (clave, hoja, fila, creada) VALUES (?, ?, ?, ?)",
+                       (clave, hoja, json.dumps(fila, ensure_ascii=False, default=str), self._reloj()))
+        self._aviso.set()
+        return clave
+
+    def pendientes(self, hoja=None):
+        """Filas sin enviar (las más antiguas primero) como dicts con fila, creada, envios y error"""
+        sql = "SELECT clave, hoja, fila, creada, envios, error FROM filas WHERE enviada IS NULL"
+        parametros = ()
+        if hoja is not None:
+            sql += " AND hoja = ?"
+            parametros = (hoja,)
+        return [{"clave": clave, "hoja": h, "fila": json.loads(fila), "creada": creada, "envios": envios,
+                 "error": error}
+                for clave, h, fila, creada, envios, error in self._ejecutar(sql + " ORDER BY id", parametros)]
+
+    def contar_pendientes(self):
+        return self._ejecutar("SELECT COUNT(*) FROM filas WHERE enviada IS NULL")[0][0]
+
+    # ------------------- ENVÍO -------------------
+
+    def _reclamar(self, hoja, limite):
+        """Marca como reclamadas hasta `limite` filas listas para enviar; devuelve (marca, filas)"""
+        ahora = self._reloj()
+        with self._lock:
+            self._conexion.execute("BEGIN IMMEDIATE")
+            try:
+                filas = self._conexion.execute(
+                    "SELECT id, clave, fila, envios FROM filas WHERE hoja = ? AND enviada IS NULL "
+                    "AND reintentar <= ? AND (reclamada IS NULL OR reclamada < ?) ORDER BY id LIMIT ?",
+                    (hoja, ahora, ahora - SEGUNDOS_RECLAMO, limite)).fetchall()
+                self._conexion.executemany("UPDATE filas SET reclamada = ?, envios = envios + 1 WHERE id = ?",
+                                           [(ahora, f[0]) for f in filas])
+                self._conexion.execute("COMMIT")
+            except BaseException:
+                self._conexion.execute("ROLLBACK")
+                raise
+        return ahora, filas
+
+    def _renovar(self, filas, reclamada):
+        """Renueva la reclamación de `filas`; devuelve (marca nueva, filas que seguían siendo nuestras)"""
+        ahora = self._reloj()
+        with self._lock:
+            self._conexion.execute("BEGIN IMMEDIATE")
+            try:
+                renovadas = [f for f in filas if self._conexion.execute(
+                    "UPDATE filas SET reclamada = ? WHERE id = ? AND reclamada = ? AND enviada IS NULL",
+                    (ahora, f[0], reclamada)).rowcount]
+                self._conexion.execute("COMMIT")
+            except BaseException:
+                self._conexion.execute("ROLLBACK")
+                raise
+        return ahora, renovadas
+
+    def _marcar_enviadas(self, ids):
+        with self._lock:
+            self._conexion.executemany(
+                "UPDATE filas SET enviada = ?, reclamada = NULL, error = NULL WHERE id = ?",
+                [(self._reloj(), i) for i in ids])
+
+    def _marcar_fallidas(self, filas, error, reclamada):
+        # Solo las que siguen reclamadas por este envío: las que ha retomado
+        # otro proceso son suyas
+        ahora = self._reloj()
+        with self._lock:
+            self._conexion.executemany(
+                "UPDATE filas SET reclamada = NULL, error = ?, reintentar = ? WHERE id = ? AND reclamada = ?",
+                [(str(error)[:500], ahora + min(5 * 2 ** envios, ESPERA_MAXIMA), i, reclamada)
+                 for i, _, _, envios in filas])
+
+    def _columna_clave(self, hoja, worksheet, ancho):
+        """Posición (desde 1) de la columna de claves; la crea tras las de datos si no existe"""
+        if hoja not in self._columnas_clave:
+            encabezados = worksheet.row_values(1)
+            if COLUMNA_CLAVE in encabezados:
+                posicion = encabezados.index(COLUMNA_CLAVE) + 1
+            else:
+                posicion = max(len(encabezados), ancho) + 1
+                if posicion > worksheet.col_count:
+                    worksheet.add_cols(posicion - worksheet.col_count)
+                worksheet.update_cell(1, posicion, COLUMNA_CLAVE)
+            self._columnas_clave[hoja] = posicion
+        return self._columnas_clave[hoja]
+
+    def _enviar_lote(self, hoja, abrir_hoja, filas):
+        worksheet = abrir_hoja(hoja)
+        datos = [(i, clave, json.loads(fila), envios) for i, clave, fila, envios in filas]
+        posicion = self._columna_clave(hoja, worksheet, max(len(f) for _, _, f, _ in datos))
+        # Alguna de estas filas ya se reclamó antes (envío fallido o proceso
+        # caído) y puede estar en la hoja: se comprueban las claves antes de enviarla
+        if any(envios for *_, envios in datos):
+            en_hoja = set(worksheet.col_values(posicion))
+            llegaron = [i for i, clave, _, _ in datos if clave in en_hoja]
+            self._marcar_enviadas(llegaron)
+            datos = [d for d in datos if d[1] not in en_hoja]
+        if datos:
+            worksheet.append_rows([fila + [""] * (posicion - 1 - len(fila)) + [clave]
+                                   for _, clave, fila, _ in datos])
+            self._marcar_enviadas([i for i, *_ in datos])
+        return len(filas)
+
+    def sincronizar(self, abrir_hoja, filas_por_lote=FILAS_POR_LOTE):
+        """Envía las filas pendientes, un append_rows por hoja y lote.
+
+        `abrir_hoja(nombre)` devuelve la worksheet de gspread. Un lote que
+        falla se reintenta más tarde con espera exponencial. Devuelve
+        {hoja: filas enviadas} (solo las hojas con envíos).
+        """
+        enviadas = {}
+        hojas = [h for (h,) in self._ejecutar("SELECT DISTINCT hoja FROM filas WHERE enviada IS NULL")]
+        for hoja in hojas:
+            while True:
+                reclamada, filas = self._reclamar(hoja, filas_por_lote)
+                if not filas:
+                    break
+                try:
+                    # La espera por cuota puede durar un minuto: después se
+                    # renueva la reclamación y se dejan las filas que otro
+                    # proceso haya retomado mientras tanto
+                    self._limite.reservar()
+                    reclamada, filas = self._renovar(filas, reclamada)
+                    if filas:
+                        enviadas[hoja] = enviadas.get(hoja, 0) + self._enviar_lote(hoja, abrir_hoja, filas)
+                except Exception as e:
+                    _LOGGER.warning("No se pudieron enviar %d filas a %s: %s", len(filas), hoja, e)
+                    self._columnas_clave.pop(hoja, None)
+                    self._marcar_fallidas(filas, e, reclamada)
+                    break
+        self._ejecutar("DELETE FROM filas WHERE enviada < ?", (self._reloj() - DIAS_RETENCION * 86400,))
+        return enviadas
+
+    def iniciar(self, abrir_hoja, al_enviar=None, intervalo=SEGUNDOS_ENTRE_ENVIOS):
+        """Arranca (una sola vez) el hilo que envía las pendientes; `al_enviar(hoja, n)` tras cada envío"""
+        if self._hilo is not None:
+            return self._hilo
+
+        def bucle():
+            while True:
+                self._aviso.wait(intervalo)
+                self._aviso.clear()
+                try:
+                    for hoja, n in self.sincronizar(abrir_hoja).items():
+                        if al_enviar:
+                            al_enviar(hoja, n)
+                except Exception:
+                    _LOGGER.exception("Error en el envío de filas pendientes")
+
+        self._hilo = threading.Thread(target=bucle, name="diario-sheets", daemon=True)
+        self._hilo.start()
+        return self._hilo
+
+    def esperar_vacio(self, timeout):
+        """Espera a que no quede nada pendiente; devuelve cuántas filas quedan"""
+        limite = time.monotonic() + timeout
+        while (pendientes := self.contar_pendientes()) and time.monotonic() < limite:
+            self._aviso.set()
+            time.sleep(0.1)
+        return pendientes
+
+_DIARIOS = {}
+_DIARIOS_LOCK = threading.Lock()
+
+def abrir_diario(ruta):
+    """Diario del archivo `ruta`, uno por proceso (sobrevive a que se vacíen las cachés de Streamlit)"""
+    ruta = Path(ruta).resolve()
+    with _DIARIOS_LOCK:
+        if ruta not in _DIARIOS:
+            _DIARIOS[ruta] = Diario(ruta)
+        return _DIARIOS[ruta]
@@ -0,0 +1,169 @@
+# functions/duraciones.py
+
+import math
+import re
+import numpy as np
+import pandas as pd
+
+# Duraciones con nombre propio (el resto se interpretan como "N horas" / "N días")
+DURACIONES_FIJAS = {
+    "medio día": pd.Timedelta(hours=4),
+    "todo el día": pd.Timedelta(hours=8),
+}
+
+# Duración usada cuando el texto no se puede interpretar
+DURACION_POR_DEFECTO = pd.Timedelta(hours=2)
+
+# Tamaño de la franja para los agregados de ocupación
+FRANJA_OCUPACION = pd.Timedelta(hours=1)
+
+_PATRON_DURACION = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*(minutos?|min|horas?|h|d[ií]as?)\s*$", re.IGNORECASE)
+# Hora del día: "HH:MM:SS" (como escribe la app) o "HH:MM" (editada a mano en la hoja)
+_PATRON_HORA = r"^\s*(\d{1,2}):(\d{2})(?::(\d{2}))?\s*$"
+
+# Columnas tipadas que añade normalizar_reservas a las de la hoja
+COLUMNA_SEGUNDOS = "Inicio (s)"
+COLUMNA_MINUTOS = "Duración (min)"
+
+def resolver_duracion(texto):
+    """Convierte un texto de duración ("1 hora", "Medio día", "3 días"...) en un Timedelta.
+
+    Devuelve NaT si el texto no se reconoce.
+    """
+    if not isinstance(texto, str):
+        return pd.NaT
+    fija = DURACIONES_FIJAS.get(texto.strip().lower())
+    if fija is not None:
+        return fija
+    coincidencia = _PATRON_DURACION.match(texto)
+    if not coincidencia:
+        return pd.NaT
+    cantidad = float(coincidencia.group(1).replace(",", "."))
+    unidad = coincidencia.group(2).lower()
+    if unidad.startswith("m"):
+        return pd.Timedelta(minutes=cantidad)
+    if unidad.startswith("h"):
+        return pd.Timedelta(hours=cantidad)
+    return pd.Timedelta(days=cantidad)
+
+def dias_iniciados(texto):
+    """Días que se cobran por una duración: cada día empezado cuenta entero (mínimo 1, también si no se reconoce)"""
+    duracion = resolver_duracion(texto)
+    if pd.isna(duracion):
+        return 1
+    return max(1, math.ceil(duracion / pd.Timedelta(days=1)))
+
+def resolver_duraciones(serie):
+    """Resuelve una columna de duraciones interpretando cada texto distinto una sola vez"""
+    tabla = {texto: resolver_duracion(texto) for texto in pd.unique(serie)}
+    return pd.to_timedelta(serie.map(tabla))
+
+def segundos_del_dia(serie):
+    """Segundos desde medianoche de cada hora ("HH:MM:SS" o "HH:MM"); NA si no es una hora válida.
+
+    Cada texto distinto se interpreta una sola vez, con una expresión regular vectorizada.
+    """
+    codigos, textos = pd.factorize(serie.astype(str))
+    partes = pd.Series(textos, dtype=object).str.extract(_PATRON_HORA).astype(float)
+    horas, minutos, segundos = partes[0], partes[1], partes[2].fillna(0)
+    validas = (horas < 24) & (minutos < 60) & (segundos < 60)
+    por_texto = (horas * 3600 + minutos * 60 + segundos).where(validas).to_numpy()
+    return pd.Series(por_texto[codigos], index=serie.index, dtype=float).astype('Int64')
+
+def minutos_duracion(serie):
+    """Minutos de cada texto de duración; NA si no se reconoce"""
+    minutos = resolver_duraciones(serie) / pd.Timedelta(minutes=1)
+    return minutos.round().astype('Int64')
+
+def normalizar_reservas(datos):
+    """Añade a las reservas la hora de inicio (segundos del día) y la duración (minutos) tipadas.
+
+    Se hace una vez por lectura de la hoja: las vistas usan estas columnas y
+    no vuelven a interpretar los textos. Las filas con alguno de los dos
+    valores no válido quedan con NA (ver cuarentena_reservas).
+    """
+    return datos.assign(**{
+        COLUMNA_SEGUNDOS: segundos_del_dia(datos['Hora inicio Actividad']),
+        COLUMNA_MINUTOS: minutos_duracion(datos['Duración']),
+    })
+
+def cuarentena_reservas(datos):
+    """Reservas normalizadas sin fecha de actividad o cuya hora de inicio o duración no se pudo interpretar, con el motivo"""
+    problemas = {
+        "Sin fecha de actividad": datos['Fecha Actividad'].isna(),
+        "Hora no válida": datos[COLUMNA_SEGUNDOS].isna(),
+        "Duración no reconocida": datos[COLUMNA_MINUTOS].isna(),
+    }
+    alguno = np.logical_or.reduce([m.to_numpy() for m in problemas.values()])
+    malas = datos[alguno]
+    etiquetas = [np.where(mascara.to_numpy()[alguno], motivo, '') for motivo, mascara in problemas.items()]
+    motivos = ['; '.join(e for e in partes if e) for partes in zip(*etiquetas)]
+    return pd.DataFrame({
+        'Motivo': motivos,
+        'Nombre': malas['Nombre'],
+        'Actividad': malas['Actividad'],
+        'Fecha Actividad': malas['Fecha Actividad'],
+        'Hora inicio Actividad': malas['Hora inicio Actividad'],
+        'Duración': malas['Duración'],
+    }, index=malas.index)
+
+def calcular_intervalos(datos):
+    """Intervalos tipados [Inicio, Fin) de cada reserva (normalizada), ordenados por inicio.
+
+    Conserva la etiqueta de fila original (posición en la hoja) como índice.
+    Las reservas sin fecha de actividad o sin hora de inicio válida no tienen
+    intervalo (ver cuarentena_reservas); las de duración no reconocida usan
+    DURACION_POR_DEFECTO.
+    """
+    datos = datos[datos[COLUMNA_SEGUNDOS].notna() & datos['Fecha Actividad'].notna()]
+    inicio = datos['Fecha Actividad'].dt.normalize() + pd.to_timedelta(
+        datos[COLUMNA_SEGUNDOS].astype('float64'), unit='s')
+    duracion = pd.to_timedelta(datos[COLUMNA_MINUTOS].astype('float64'), unit='min').fillna(DURACION_POR_DEFECTO)
+
+    intervalos = pd.DataFrame({
+        'Inicio': inicio,
+        'Fin': inicio + duracion,
+        'Actividad': datos['Actividad'],
+        'Nombre': datos['Nombre'],
+        'Personas': pd.to_numeric(datos['Personas'], errors='coerce').fillna(0),
+    }, index=datos.index)
+    return intervalos.sort_values('Inicio', kind='stable')
+
+def ocupacion_por_franja(intervalos, franja=FRANJA_OCUPACION):
+    """Calcula la ocupación de cada actividad por franja con un barrido vectorizado.
+
+    Cada reserva suma sus personas en la franja de inicio y las resta en la de
+    fin; la suma acumulada da las personas simultáneas por franja. La rejilla
+    empieza a medianoche para poder agrupar las franjas por día.
+
+    Devuelve (actividades, inicio de cada franja, matriz personas, matriz reservas),
+    con las matrices de forma (actividades × franjas).
+    """
+    if intervalos.empty:
+        vacio = np.zeros((0, 0))
+        return [], np.array([], dtype='datetime64[ns]'), vacio, vacio
+
+    codigos, actividades = pd.factorize(intervalos['Actividad'], sort=True)
+    origen = intervalos['Inicio'].min().normalize()
+    fin_rejilla = intervalos['Fin'].max().normalize() + pd.Timedelta(days=1)
+    n_franjas = int((fin_rejilla - origen) / franja)
+
+    desde = ((intervalos['Inicio'] - origen) // franja).to_numpy(dtype=np.int64)
+    # Una reserva que termina a mitad de franja ocupa esa franja completa
+    hasta = -((origen - intervalos['Fin']) // franja).to_numpy(dtype=np.int64)
+    hasta = np.maximum(hasta, desde + 1)
+
+    personas = np.zeros((len(actividades), n_franjas + 1))
+    reservas = np.zeros((len(actividades), n_franjas + 1))
+    np.add.at(personas, (codigos, desde), intervalos['Personas'].to_numpy())
+    np.add.at(personas, (codigos, hasta), -intervalos['Personas'].to_numpy())
+    np.add.at(reservas, (codigos, desde), 1)
+    np.add.at(reservas, (codigos, hasta), -1)
+
+    franjas = pd.date_range(origen, periods=n_franjas, freq=franja).to_numpy()
+    return (
+        list(actividades),
+        franjas,
+        np.cumsum(personas, axis=1)[:, :-1],
+        np.cumsum(reservas, axis=1)[:, :-1],
+    )
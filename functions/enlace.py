@@ -0,0 +1,317 @@
+# functions/enlace.py
+
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+from functions.data_utils import reservas_en_rango, cargar_clientes, suscribir_cliente_guardado
+from functions.duraciones import segundos_del_dia, COLUMNA_SEGUNDOS, COLUMNA_MINUTOS
+
+# Las reservas y las fichas de cliente se enlazan por actividad, día y hora de inicio
+CLAVES_ENLACE = ['Actividad', 'Fecha', 'Minuto']
+
+# Si cambia más de esta fracción de filas de una hoja (p. ej. al borrar una
+# reserva se desplazan todas las siguientes) se recalcula el enlace entero
+FRACCION_RECALCULO = 0.25
+
+ORIGENES = ['Enlazada', 'Solo reserva', 'Solo cliente']
+
+# Columnas de cada hoja que usa el enlace
+COLUMNAS_RESERVAS = ['Actividad', 'Fecha Actividad', COLUMNA_SEGUNDOS, COLUMNA_MINUTOS, 'Personas', 'Precio',
+                     'Nombre', 'Email o Teléfono', 'Fecha Reserva']
+COLUMNAS_CLIENTES = ['Actividad', 'Fecha Actividad', 'Hora Inicio', 'Personas', 'Precio', 'ID', 'Sexo', 'Edad',
+                     'Ciudad', 'Pais', 'Fecha Registro']
+
+# Datos de la ficha que se muestran junto a cada reserva
+COLUMNAS_FICHA = ['ID', 'Sexo', 'Edad', 'Ciudad', 'Pais']
+
+def _minutos(segundos):
+    """Minuto del día a partir de los segundos del día (NA se conserva)"""
+    return segundos // 60
+
+def _texto(serie):
+    return serie.astype(str).str.strip().replace({'': pd.NA, 'nan': pd.NA}).astype('string')
+
+def _con_columnas(df, columnas):
+    """Añade vacías las columnas que falten (hoja sin filas o sin alguna columna opcional)"""
+    return df if set(columnas).issubset(df.columns) else df.reindex(columns=columnas)
+
+def reservas_tipadas(datos):
+    """Reservas (cargar_datos, ya normalizadas) con tipos analíticos; conserva la fila de la hoja como índice"""
+    datos = _con_columnas(datos, COLUMNAS_RESERVAS)
+    return pd.DataFrame({
+        'Actividad': _texto(datos['Actividad']),
+        'Fecha': pd.to_datetime(datos['Fecha Actividad'], errors='coerce').dt.normalize(),
+        'Minuto': _minutos(datos[COLUMNA_SEGUNDOS].astype('Int64')),
+        'Duración': pd.to_timedelta(datos[COLUMNA_MINUTOS].astype('float64'), unit='min'),
+        'Personas': pd.to_numeric(datos['Personas'], errors='coerce').astype('Int64'),
+        'Precio': pd.to_numeric(datos['Precio'], errors='coerce'),
+        'Nombre': _texto(datos['Nombre']),
+        'Contacto': _texto(datos['Email o Teléfono']),
+        'Fecha Reserva': pd.to_datetime(datos['Fecha Reserva'], dayfirst=True, errors='coerce'),
+    }, index=datos.index)
+
+def clientes_tipados(clientes):
+    """Fichas de cliente (cargar_clientes, sin procesar) con tipos analíticos; índice = fila de la hoja"""
+    clientes = _con_columnas(clientes, COLUMNAS_CLIENTES)
+    return pd.DataFrame({
+        'Actividad': _texto(clientes['Actividad']),
+        'Fecha': pd.to_datetime(clientes['Fecha Actividad'], format='%d/%m/%Y', errors='coerce'),
+        'Minuto': _minutos(segundos_del_dia(clientes['Hora Inicio'])),
+        'Personas': pd.to_numeric(clientes['Personas'], errors='coerce').astype('Int64'),
+        'Precio': pd.to_numeric(clientes['Precio'], errors='coerce'),
+        'ID': _texto(clientes['ID']),
+        'Sexo': _texto(clientes['Sexo']),
+        'Edad': pd.to_numeric(clientes['Edad'], errors='coerce').astype('Int64'),
+        'Ciudad': _texto(clientes['Ciudad']),
+        'Pais': _texto(clientes['Pais']),
+        'Fecha Registro': pd.to_datetime(clientes['Fecha Registro'], format='%d/%m/%Y %H:%M', errors='coerce'),
+    }, index=clientes.index)
+
+def _huellas(df):
+    """Hash de cada fila de la hoja (solo valores) para detectar filas nuevas, cambiadas o borradas.
+
+    Sin convertir antes a texto: pandas ya hashea cada valor distinto una sola
+    vez y solo pasa a texto las columnas que mezclan tipos.
+    """
+    if df.empty:
+        return pd.Series(dtype='uint64')
+    return pd.util.hash_pandas_object(df, index=False)
+
+def enlazar(reservas, clientes):
+    """Pares (fila de reserva, fila de cliente) con un merge por clave, sin recorridos anidados.
+
+    Dentro de una misma clave (actividad, día, hora) se enlazan primero las
+    que además coinciden en personas y después el resto, en orden de hoja.
+    Devuelve una Serie fila de reserva -> fila de cliente.
+    """
+    r = reservas[CLAVES_ENLACE + ['Personas']].dropna(subset=CLAVES_ENLACE).rename_axis('Fila Reserva').reset_index()
+    c = clientes[CLAVES_ENLACE + ['Personas']].dropna(subset=CLAVES_ENLACE).rename_axis('Fila Cliente').reset_index()
+    pares = []
+    for claves in (CLAVES_ENLACE + ['Personas'], CLAVES_ENLACE):
+        r = r.sort_values('Fila Reserva', kind='stable')
+        c = c.sort_values('Fila Cliente', kind='stable')
+        r['n'] = r.groupby(claves, dropna=False, sort=False).cumcount()
+        c['n'] = c.groupby(claves, dropna=False, sort=False).cumcount()
+        enlazados = r.merge(c, on=claves + ['n'], how='inner')[['Fila Reserva', 'Fila Cliente']]
+        pares.append(enlazados)
+        r = r[~r['Fila Reserva'].isin(enlazados['Fila Reserva'])]
+        c = c[~c['Fila Cliente'].isin(enlazados['Fila Cliente'])]
+    pares = pd.concat(pares)
+    return pd.Series(pares['Fila Cliente'].to_numpy(), index=pares['Fila Reserva'].to_numpy(), dtype='int64')
+
+def _claves(df):
+    return pd.MultiIndex.from_frame(df[CLAVES_ENLACE])
+
+class EnlaceReservasClientes:
+    """Reservas y fichas de cliente tipadas y enlazadas, actualizadas de forma incremental.
+
+    Cada actualización compara las huellas de las filas con las anteriores:
+    solo se tipan las filas nuevas o cambiadas y solo se vuelven a enlazar
+    las claves (actividad, día, hora) afectadas. El dataset analítico se
+    construye bajo demanda, una vez por cambio.
+    """
+
+    def __init__(self):
+        self.reservas = reservas_tipadas(pd.DataFrame(columns=COLUMNAS_RESERVAS))
+        self.clientes = clientes_tipados(pd.DataFrame(columns=COLUMNAS_CLIENTES))
+        self._huellas = {'reservas': pd.Series(dtype='uint64'), 'clientes': pd.Series(dtype='uint64')}
+        self.pares = pd.Series(dtype='int64')
+        self.version = 0
+        self._dataset = None
+
+    def _aplicar(self, lado, fuente, tipar):
+        """Incorpora los cambios de una hoja; devuelve las claves afectadas o None si se rehízo entera"""
+        anteriores = self._huellas[lado]
+        huellas = _huellas(fuente).set_axis(fuente.index)
+        comunes = huellas.index.intersection(anteriores.index)
+        cambiadas = comunes[huellas[comunes].to_numpy() != anteriores[comunes].to_numpy()]
+        nuevas = huellas.index.difference(anteriores.index)
+        borradas = anteriores.index.difference(huellas.index)
+        self._huellas[lado] = huellas
+        tipadas = getattr(self, lado)
+
+        cambios = len(cambiadas) + len(nuevas) + len(borradas)
+        if cambios > FRACCION_RECALCULO * max(len(huellas), 1):
+            setattr(self, lado, tipar(fuente))
+            return None
+        if not cambios:
+            return pd.MultiIndex.from_tuples([], names=CLAVES_ENLACE)
+
+        quitadas = cambiadas.union(borradas)
+        filas = tipar(fuente.loc[cambiadas.union(nuevas)])
+        afectadas = _claves(tipadas.loc[quitadas]).append(_claves(filas))
+        setattr(self, lado, pd.concat([tipadas.drop(quitadas), filas]).sort_index())
+        return afectadas
+
+    def actualizar(self, reservas=None, clientes=None):
+        """Pone al día el enlace con las hojas que hayan cambiado (None = sin cambios)"""
+        afectadas = []
+        completo = False
+        for lado, fuente, tipar in (('reservas', reservas, reservas_tipadas), ('clientes', clientes, clientes_tipados)):
+            if fuente is None:
+                continue
+            claves = self._aplicar(lado, fuente, tipar)
+            if claves is None:
+                completo = True
+            elif len(claves):
+                afectadas.append(claves)
+
+        if completo:
+            self.pares = enlazar(self.reservas, self.clientes)
+        elif afectadas:
+            afectadas = afectadas[0].append(afectadas[1:]).unique() if len(afectadas) > 1 else afectadas[0].unique()
+            en_r = _claves(self.reservas).isin(afectadas)
+            en_c = _claves(self.clientes).isin(afectadas)
+            # Se mantienen los pares de claves no afectadas que siguen existiendo
+            conservados = self.pares[~self.pares.index.isin(self.reservas.index[en_r])
+                                     & self.pares.index.isin(self.reservas.index)
+                                     & self.pares.isin(self.clientes.index[~en_c])]
+            nuevos = enlazar(self.reservas[en_r], self.clientes[en_c])
+            self.pares = pd.concat([conservados, nuevos]).sort_index()
+        else:
+            return
+        self.version += 1
+        self._dataset = None
+
+    def anadir_clientes(self, nuevos):
+        """Añade fichas recién guardadas (índice = su fila en la hoja) sin releer la hoja"""
+        huellas = self._huellas['clientes']
+        filas = clientes_tipados(nuevos)
+        self._huellas['clientes'] = pd.concat([huellas, _huellas(nuevos).set_axis(nuevos.index)])
+        self.clientes = pd.concat([self.clientes.drop(nuevos.index, errors='ignore'), filas]).sort_index()
+        afectadas = _claves(filas).unique()
+        en_r = _claves(self.reservas).isin(afectadas)
+        en_c = _claves(self.clientes).isin(afectadas)
+        conservados = self.pares[~self.pares.index.isin(self.reservas.index[en_r])]
+        self.pares = pd.concat([conservados, enlazar(self.reservas[en_r], self.clientes[en_c])]).sort_index()
+        self.version += 1
+        self._dataset = None
+
+    def fichas(self, filas_reserva):
+        """Ficha de cliente enlazada a cada reserva de `filas_reserva` (las que no tienen no aparecen)"""
+        pares = self.pares
+        pares = pares[pares.index.isin(filas_reserva)]
+        fichas = self.clientes.reindex(pares.to_numpy())[COLUMNAS_FICHA]
+        fichas.index = pares.index
+        return fichas.dropna(subset=['ID'])
+
+    @property
+    def dataset(self):
+        """Una fila por reserva y por ficha de cliente sin reserva, con Origen y columnas de ambas hojas"""
+        if self._dataset is None:
+            self._dataset = dataset_enlazado(self.reservas, self.clientes, self.pares)
+            self._dataset.attrs['version'] = ('enlace', id(self), self.version)
+        return self._dataset
+
+def dataset_enlazado(reservas, clientes, pares):
+    """Dataset analítico tipado a partir de las dos hojas tipadas y sus pares"""
+    fila_cliente = pd.Series(pares, dtype='int64').reindex(reservas.index)
+    enlazada = fila_cliente.notna().to_numpy()
+    datos_cliente = clientes.reindex(fila_cliente.to_numpy())
+    datos_cliente.index = reservas.index
+
+    desde_reservas = pd.DataFrame({
+        'Origen': np.where(enlazada, 'Enlazada', 'Solo reserva'),
+        'Fila Reserva': pd.array(reservas.index, dtype='Int64'),
+        'Fila Cliente': pd.array(fila_cliente.to_numpy(), dtype='Int64'),
+        'Actividad': reservas['Actividad'],
+        'Inicio': reservas['Fecha'] + pd.to_timedelta(reservas['Minuto'].astype('float'), unit='min'),
+        'Duración': reservas['Duración'],
+        'Personas': reservas['Personas'].fillna(datos_cliente['Personas']),
+        'Precio': reservas['Precio'].fillna(datos_cliente['Precio']),
+        'Nombre': reservas['Nombre'],
+        'Contacto': reservas['Contacto'],
+        'Fecha Reserva': reservas['Fecha Reserva'],
+        'Discrepancia': enlazada & (
+            (reservas['Personas'] != datos_cliente['Personas']).fillna(False).to_numpy(dtype=bool)
+            | ~np.isclose(reservas['Precio'].to_numpy(dtype=float), datos_cliente['Precio'].to_numpy(dtype=float),
+                          equal_nan=True)
+        ),
+    }, index=reservas.index)
+    for columna in ['ID', 'Sexo', 'Edad', 'Ciudad', 'Pais', 'Fecha Registro']:
+        desde_reservas[columna] = datos_cliente[columna]
+
+    solo_clientes = clientes[~clientes.index.isin(np.asarray(pares))]
+    desde_clientes = pd.DataFrame({
+        'Origen': 'Solo cliente',
+        'Fila Reserva': pd.array([pd.NA] * len(solo_clientes), dtype='Int64'),
+        'Fila Cliente': pd.array(solo_clientes.index, dtype='Int64'),
+        'Actividad': solo_clientes['Actividad'],
+        'Inicio': solo_clientes['Fecha'] + pd.to_timedelta(solo_clientes['Minuto'].astype('float'), unit='min'),
+        'Duración': pd.Series(pd.NaT, index=solo_clientes.index, dtype='timedelta64[ns]'),
+        'Personas': solo_clientes['Personas'],
+        'Precio': solo_clientes['Precio'],
+        'Discrepancia': False,
+    }, index=solo_clientes.index)
+    for columna in ['ID', 'Sexo', 'Edad', 'Ciudad', 'Pais', 'Fecha Registro']:
+        desde_clientes[columna] = solo_clientes[columna]
+
+    dataset = pd.concat([desde_reservas, desde_clientes], ignore_index=True)
+    dataset['Origen'] = pd.Categorical(dataset['Origen'], categories=ORIGENES)
+    for columna in ['Actividad', 'Sexo', 'Ciudad']:
+        dataset[columna] = dataset[columna].astype('category')
+    return dataset
+
+# ------------------- ENLACE COMPARTIDO -------------------
+
+@st.cache_resource
+def _almacen_enlace():
+    """Enlace compartido (solo lectura) entre sesiones y las versiones de hoja que refleja"""
+    return {"enlace": EnlaceReservasClientes(), "versiones": (None, None), "lock": threading.Lock()}
+
+def obtener_enlace():
+    """Enlace reservas ↔ clientes al día con las últimas lecturas de ambas hojas.
+
+    Las reservas incluyen las temporadas archivadas: las fichas de cliente
+    cubren todo el histórico.
+    """
+    reservas = reservas_en_rango()
+    clientes = cargar_clientes()
+    version_reservas = reservas.attrs.get('version')
+    version_clientes = clientes.attrs.get('version')
+    almacen = _almacen_enlace()
+    with almacen["lock"]:
+        anterior_reservas, anterior_clientes = almacen["versiones"]
+        # Una hoja que no se pudo leer (sin versión) conserva lo último enlazado
+        almacen["enlace"].actualizar(
+            reservas if version_reservas not in (None, anterior_reservas) else None,
+            clientes if version_clientes not in (None, anterior_clientes) else None,
+        )
+        almacen["versiones"] = (version_reservas or anterior_reservas, version_clientes or anterior_clientes)
+        return almacen["enlace"]
+
+def obtener_dataset_enlazado():
+    """Dataset analítico compartido; no debe modificarse in situ"""
+    return obtener_enlace().dataset
+
+def acotar_a_clientes(dataset, clientes):
+    """Parte del dataset que corresponde a los clientes procesados de Reportes.
+
+    Sin filtros (el procesado compartido, que lleva 'filas_origen') es el
+    dataset entero. Filtrados, son sus fichas (enlazadas o no) y las reservas
+    sin ficha de las mismas actividades dentro del mismo rango de fechas.
+    """
+    if clientes.attrs.get('filas_origen') is not None:
+        return dataset
+    fechas = clientes['Fecha Actividad'].dropna()
+    solo_reserva = (
+        (dataset['Origen'] == 'Solo reserva').to_numpy()
+        & dataset['Actividad'].isin(clientes['Actividad'].unique()).to_numpy()
+        & dataset['Inicio'].between(fechas.min().normalize(), fechas.max().normalize() + pd.Timedelta(days=1),
+                                    inclusive='left').to_numpy()
+    ) if len(fechas) else False
+    acotado = dataset[dataset['Fila Cliente'].isin(clientes.index).fillna(False).to_numpy() | solo_reserva]
+    acotado.attrs = {'version': (dataset.attrs.get('version'), clientes.attrs.get('version'))}
+    return acotado
+
+@suscribir_cliente_guardado
+def anadir_cliente_enlace(registro):
+    """Enlaza la ficha recién guardada sin esperar a que caduque la caché de la hoja"""
+    almacen = _almacen_enlace()
+    with almacen["lock"]:
+        enlace = almacen["enlace"]
+        if almacen["versiones"][1] is None:
+            return
+        fila = len(enlace._huellas['clientes'])
+        enlace.anadir_clientes(pd.DataFrame([registro], index=[fila]))
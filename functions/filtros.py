@@ -0,0 +1,110 @@
+# functions/filtros.py
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from datetime import timedelta
+from functions.indice_reservas import IndiceFechas
+from functions.rendimiento import cache_medida
+
+# Filtros por valor de la barra de Reportes: columna -> etiqueta
+COLUMNAS_FILTRO = {"Actividad": "Actividades", "Ciudad": "Ciudades", "Sexo": "Sexo"}
+
+class IndiceClientes:
+    """Clientes procesados indexados por fecha de actividad y por actividad.
+
+    El rango de fechas y las actividades se resuelven por búsqueda binaria
+    (IndiceFechas); ciudad y sexo se filtran solo sobre ese corte, así que el
+    coste de una consulta estrecha es proporcional a las filas que devuelve.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._indice = IndiceFechas(df, 'Fecha Actividad', 'Actividad')
+        self.opciones = {
+            columna: sorted(df[columna].dropna().unique()) if columna in df.columns else []
+            for columna in COLUMNAS_FILTRO
+        }
+        fechas = df['Fecha Actividad'].dropna() if 'Fecha Actividad' in df.columns else pd.Series([])
+        self.primera = fechas.min().date() if len(fechas) else None
+        self.ultima = fechas.max().date() if len(fechas) else None
+
+    def filtrar(self, filtros):
+        """Clientes que cumplen `filtros`: 'desde' y 'hasta' (fechas incluidas) y una
+        lista de valores por columna de COLUMNAS_FILTRO. Devuelve las filas en el orden de la hoja.
+        """
+        hasta = filtros.get('hasta')
+        datos = self._indice.rango(filtros.get('desde'), hasta + timedelta(days=1) if hasta else None,
+                                   filtros.get('Actividad'))
+        coinciden = np.ones(len(datos), dtype=bool)
+        for columna in COLUMNAS_FILTRO:
+            if columna != 'Actividad' and filtros.get(columna):
+                coinciden &= datos[columna].isin(filtros[columna]).to_numpy()
+        if not coinciden.all():
+            datos = datos[coinciden]
+        return datos.sort_index()
+
+@cache_medida(st.cache_resource(max_entries=2))
+def _indice_por_version(version, _df):
+    return IndiceClientes(_df)
+
+def obtener_indice_clientes(df):
+    """Índice compartido entre sesiones mientras no cambie la versión de los datos"""
+    version = df.attrs.get('version')
+    if version is None:
+        return IndiceClientes(df)
+    return _indice_por_version(version, df)
+
+def filtrar_clientes(df, filtros):
+    """Clientes procesados que cumplen `filtros` (dict de barra_filtros).
+
+    Sin filtros devuelve `df` tal cual (y con él el cubo incremental y las
+    cachés del histórico completo). El resultado filtrado tiene su propia
+    versión, derivada de la de `df` y de los filtros, para que cubo,
+    predicciones, secciones y gráficos se cacheen por separado.
+    """
+    if not filtros:
+        return df
+    filtrado = obtener_indice_clientes(df).filtrar(filtros)
+    filtrado.attrs = {}
+    if df.attrs.get('version') is not None:
+        # Solo tipos JSON: st.dataframe copia attrs a los metadatos de Arrow
+        filtrado.attrs['version'] = (df.attrs['version'], tuple(
+            (clave, tuple(valor) if isinstance(valor, list) else valor.isoformat())
+            for clave, valor in filtros.items()
+        ))
+    return filtrado
+
+def _quitar_filtros(clave):
+    for sufijo in ["fechas", *COLUMNAS_FILTRO]:
+        st.session_state.pop(f"{clave}_{sufijo}", None)
+
+def barra_filtros(df, clave="reportes_filtro"):
+    """Barra de filtros global: rango de fechas de actividad, actividades, ciudades y sexo.
+
+    Devuelve un dict con solo los filtros activos (vacío si se analiza todo).
+    """
+    indice = obtener_indice_clientes(df)
+    filtros = {}
+    col_fechas, *col_valores, col_quitar = st.columns([3, 3, 3, 2, 1], vertical_alignment="bottom")
+
+    if indice.primera is not None:
+        rango = col_fechas.date_input("📅 Fechas de actividad", value=(indice.primera, indice.ultima),
+                                      format="DD/MM/YYYY", key=f"{clave}_fechas")
+        # Mientras se elige el rango, date_input devuelve solo la fecha inicial
+        desde = rango[0] if len(rango) > 0 else None
+        hasta = rango[1] if len(rango) > 1 else None
+        if desde is not None and desde > indice.primera:
+            filtros['desde'] = desde
+        if hasta is not None and hasta < indice.ultima:
+            filtros['hasta'] = hasta
+
+    for col, (columna, etiqueta) in zip(col_valores, COLUMNAS_FILTRO.items()):
+        seleccion = col.multiselect(etiqueta, indice.opciones[columna], key=f"{clave}_{columna}",
+                                    placeholder="Todas" if columna != "Sexo" else "Todos")
+        if seleccion:
+            filtros[columna] = seleccion
+
+    col_quitar.button("✖", key=f"{clave}_quitar", help="Quitar filtros", disabled=not filtros,
+                      on_click=_quitar_filtros, args=(clave,))
+    return filtros
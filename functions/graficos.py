@@ -0,0 +1,269 @@
+# functions/graficos.py
+
+import contextlib
+import io
+import json
+import threading
+from collections import OrderedDict
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import streamlit as st
+from functions.rendimiento import tramo, anotar_cache
+
+# Mismas opciones que usa st.pyplot al rasterizar
+OPCIONES_GUARDADO = {"dpi": 200, "bbox_inches": "tight"}
+
+# Número máximo de gráficos renderizados que se guardan (LRU)
+MAX_GRAFICOS = 128
+
+# En la app los gráficos se dibujan en el navegador con Vega-Lite a partir de
+# los datos agregados; matplotlib solo se usa en las exportaciones estáticas
+# (informe pre-renderizado) o cuando un gráfico no tiene especificación Vega-Lite.
+# El modo es por hilo: cada sesión ejecuta su script en el suyo, así que una
+# exportación no cambia los gráficos de las demás sesiones.
+_estado = threading.local()
+
+@contextlib.contextmanager
+def exportacion_estatica():
+    """Mientras dura, mostrar_grafico rasteriza con matplotlib aunque haya especificación Vega-Lite"""
+    anterior = getattr(_estado, "estatico", False)
+    _estado.estatico = True
+    try:
+        yield
+    finally:
+        _estado.estatico = anterior
+
+def figura_a_bytes(fig, formato="png"):
+    """Renderiza la figura a bytes (PNG o SVG) y la cierra.
+
+    Cerrarla la saca del registro global de pyplot; si no, las figuras se
+    acumulan durante toda la vida del proceso.
+    """
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=formato, **OPCIONES_GUARDADO)
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+@st.cache_resource
+def _cache_graficos():
+    """Gráficos ya renderizados, compartidos entre sesiones"""
+    return {"imagenes": OrderedDict(), "lock": threading.Lock()}
+
+def obtener_grafico(id_grafico, version, dibujar, parametros=(), formato="png"):
+    """Devuelve los bytes del gráfico, dibujándolo solo si no está en caché.
+
+    La clave es (id del gráfico, versión de datos, parámetros, formato).
+    `dibujar` es una función sin argumentos que crea y devuelve la figura.
+    Sin versión de datos no se cachea.
+    """
+    if version is None:
+        with tramo(f"graficos.{id_grafico}"):
+            return figura_a_bytes(dibujar(), formato)
+
+    clave = (id_grafico, version, tuple(parametros), formato)
+    cache = _cache_graficos()
+    with cache["lock"]:
+        imagen = cache["imagenes"].get(clave)
+        if imagen is not None:
+            cache["imagenes"].move_to_end(clave)
+    anotar_cache("graficos.obtener_grafico", imagen is not None)
+    if imagen is not None:
+        return imagen
+
+    with tramo(f"graficos.{id_grafico}"):
+        imagen = figura_a_bytes(dibujar(), formato)
+    with cache["lock"]:
+        cache["imagenes"][clave] = imagen
+        while len(cache["imagenes"]) > MAX_GRAFICOS:
+            cache["imagenes"].popitem(last=False)
+    return imagen
+
+def mostrar_grafico(id_grafico, df, dibujar, parametros=(), formato="png", vega=None):
+    """Muestra un gráfico: con Vega-Lite si se da `vega` (especificación con los
+    datos incluidos), si no la imagen de matplotlib cacheada por la versión de datos de `df`.
+    """
+    if vega is not None and not getattr(_estado, "estatico", False):
+        compuesto = any(clave in vega for clave in ("facet", "concat", "hconcat", "vconcat"))
+        st.vega_lite_chart(spec=vega, width="content" if compuesto else "stretch")
+        return
+    imagen = obtener_grafico(id_grafico, df.attrs.get('version'), dibujar, parametros, formato)
+    if formato == "svg":
+        imagen = imagen.decode("utf-8")
+    st.image(imagen, width="stretch")
+
+# ===========================================================
+#  ESPECIFICACIONES VEGA-LITE
+# ===========================================================
+# Cada función recibe datos ya agregados (pocas filas) y devuelve la
+# especificación con los datos incluidos, lista para st.vega_lite_chart.
+
+def _datos(datos):
+    """Filas del dataframe como valores JSON (fechas en ISO)"""
+    datos = pd.DataFrame(datos)
+    for columna in datos.columns:
+        if isinstance(datos[columna].dtype, pd.CategoricalDtype):
+            datos[columna] = datos[columna].astype(str)
+    return {"values": json.loads(datos.to_json(orient="records", date_format="iso", force_ascii=False))}
+
+def _valor(valor):
+    """Escalar de numpy/pandas (p. ej. el año de idxmax) como valor de Python serializable"""
+    return valor.item() if hasattr(valor, "item") else valor
+
+def _con_titulo(spec, titulo):
+    if titulo:
+        spec["title"] = titulo
+    return spec
+
+def barras(datos, x, y, titulo=None, eje_x=None, eje_y=None, orden=None, color_fijo=None,
+           destacar=None, color_destacado=None, color=None, agrupar=False, facetas=None, columnas=3):
+    """Barras de `y` por `x`.
+
+    orden: lista con el orden de las categorías (por defecto, el de los datos).
+    destacar: valor de `x` cuya barra se pinta con color_destacado.
+    color: campo para colorear; con agrupar=True las barras van lado a lado.
+    facetas: campo por el que se hace un gráfico pequeño por valor.
+    """
+    codificacion = {
+        "x": {"field": x, "type": "ordinal", "sort": orden, "title": eje_x or x,
+              "axis": {"labelAngle": -45}},
+        "y": {"field": y, "type": "quantitative", "title": eje_y or y},
+        "tooltip": [{"field": x}, {"field": y, "type": "quantitative", "format": ",.2f"}],
+    }
+    marca = {"type": "bar"}
+    if color:
+        codificacion["color"] = {"field": color, "type": "nominal", "title": color}
+        codificacion["tooltip"].append({"field": color})
+        if agrupar:
+            codificacion["xOffset"] = {"field": color}
+    elif destacar is not None:
+        codificacion["color"] = {
+            "condition": {"test": f"datum[{json.dumps(x)}] === {json.dumps(_valor(destacar))}",
+                          "value": color_destacado},
+            "value": color_fijo,
+        }
+    elif color_fijo:
+        marca["color"] = color_fijo
+
+    if facetas:
+        codificacion["x"]["sort"] = "-y"
+        return _con_titulo({
+            "data": _datos(datos),
+            "facet": {"field": facetas, "type": "nominal", "title": None, "sort": None},
+            "columns": columnas,
+            "spec": {"mark": marca, "encoding": codificacion, "width": 220, "height": 180},
+            "resolve": {"scale": {"x": "independent"}},
+        }, titulo)
+    return _con_titulo({"data": _datos(datos), "mark": marca, "encoding": codificacion}, titulo)
+
+def lineas(datos, x, y, titulo=None, eje_x=None, eje_y=None, color=None, tipo_x="temporal", puntos=True):
+    """Líneas de `y` frente a `x` (una por valor de `color`)"""
+    codificacion = {
+        "x": {"field": x, "type": tipo_x, "title": eje_x or x},
+        "y": {"field": y, "type": "quantitative", "title": eje_y or y},
+        "tooltip": [{"field": x, "type": tipo_x}, {"field": y, "type": "quantitative", "format": ",.2f"}],
+    }
+    if color:
+        codificacion["color"] = {"field": color, "type": "nominal", "title": color, "sort": None}
+        codificacion["tooltip"].append({"field": color})
+    return _con_titulo({
+        "data": _datos(datos),
+        "mark": {"type": "line", "point": puntos},
+        "encoding": codificacion,
+    }, titulo)
+
+def mapa_calor(tabla, titulo=None, eje_x=None, eje_y=None, esquema="blues", anotar=True):
+    """Mapa de calor de una tabla cruzada (filas x columnas), con el valor en cada celda"""
+    fila = tabla.index.name or "Fila"
+    columna = tabla.columns.name or "Columna"
+    largo = tabla.rename_axis(index=fila, columns=columna).stack().rename("Valor").reset_index()
+    orden_x = [str(c) for c in tabla.columns]
+    orden_y = [str(i) for i in tabla.index]
+    largo[[fila, columna]] = largo[[fila, columna]].astype(str)
+    codificacion = {
+        "x": {"field": columna, "type": "nominal", "sort": orden_x, "title": eje_x or columna,
+              "axis": {"labelAngle": -45}},
+        "y": {"field": fila, "type": "nominal", "sort": orden_y, "title": eje_y or fila},
+    }
+    capas = [{
+        "mark": "rect",
+        "encoding": {"color": {"field": "Valor", "type": "quantitative", "scale": {"scheme": esquema},
+                               "title": None},
+                     "tooltip": [{"field": fila}, {"field": columna}, {"field": "Valor"}]},
+    }]
+    if anotar:
+        capas.append({"mark": {"type": "text", "fontSize": 11},
+                      "encoding": {"text": {"field": "Valor", "type": "quantitative"}}})
+    return _con_titulo({"data": _datos(largo), "encoding": codificacion, "layer": capas}, titulo)
+
+def circular(serie, titulo=None, colores=None):
+    """Gráfico de tarta de una serie (índice = categoría), con porcentajes"""
+    categoria = serie.index.name or "Categoría"
+    datos = serie.rename("Valor").rename_axis(categoria).reset_index()
+    color = {"field": categoria, "type": "nominal", "sort": None, "title": categoria}
+    if colores:
+        color["scale"] = {"range": list(colores)}
+    return _con_titulo({
+        "data": _datos(datos),
+        "transform": [
+            {"joinaggregate": [{"op": "sum", "field": "Valor", "as": "Total"}]},
+            {"calculate": "datum.Valor / datum.Total", "as": "Porcentaje"},
+        ],
+        "encoding": {
+            "theta": {"field": "Valor", "type": "quantitative", "stack": True},
+            "color": color,
+            "tooltip": [{"field": categoria}, {"field": "Valor"},
+                        {"field": "Porcentaje", "type": "quantitative", "format": ".1%"}],
+        },
+        "layer": [
+            {"mark": {"type": "arc", "outerRadius": 110}},
+            {"mark": {"type": "text", "radius": 135},
+             "encoding": {"text": {"field": "Porcentaje", "type": "quantitative", "format": ".1%"}}},
+        ],
+    }, titulo)
+
+def estadisticos_cajas(df, x, y, color=None):
+    """Cuartiles y bigotes (1,5 x rango intercuartílico, como seaborn) por grupo"""
+    grupos = [x] + ([color] if color else [])
+    filas = []
+    for claves, valores in df.groupby(grupos, observed=True)[y]:
+        valores = valores.dropna()
+        if valores.empty:
+            continue
+        q1, mediana, q3 = valores.quantile([0.25, 0.5, 0.75])
+        rango = q3 - q1
+        dentro = valores[valores.between(q1 - 1.5 * rango, q3 + 1.5 * rango)]
+        claves = claves if isinstance(claves, tuple) else (claves,)
+        filas.append(dict(zip(grupos, map(str, claves)), Q1=q1, Mediana=mediana, Q3=q3,
+                          Minimo=dentro.min(), Maximo=dentro.max()))
+    return pd.DataFrame(filas, columns=grupos + ["Q1", "Mediana", "Q3", "Minimo", "Maximo"])
+
+def cajas(estadisticos, x, titulo=None, eje_x=None, eje_y=None, color=None, orden=None):
+    """Diagrama de cajas a partir de estadisticos_cajas (el navegador no recibe las filas)"""
+    codificacion = {"x": {"field": x, "type": "nominal", "sort": orden, "title": eje_x or x}}
+    if color:
+        codificacion["xOffset"] = {"field": color}
+        codificacion["color"] = {"field": color, "type": "nominal", "title": color}
+    eje = {"type": "quantitative", "title": eje_y}
+    return _con_titulo({
+        "data": _datos(estadisticos),
+        "encoding": codificacion,
+        "layer": [
+            {"mark": "rule", "encoding": {"y": {"field": "Minimo", **eje}, "y2": {"field": "Maximo"}}},
+            {"mark": {"type": "bar", "size": 14},
+             "encoding": {"y": {"field": "Q1", **eje}, "y2": {"field": "Q3"},
+                          "tooltip": [{"field": c} for c in ["Minimo", "Q1", "Mediana", "Q3", "Maximo"]]}},
+            {"mark": {"type": "tick", "size": 14},
+             "encoding": {"y": {"field": "Mediana", **eje}, "color": {"value": "white"}}},
+        ],
+    }, titulo)
+
+def combinar(*specs, columnas=None):
+    """Varios gráficos en una misma figura (como los subplots de matplotlib)"""
+    spec = {"concat": list(specs)}
+    if columnas:
+        spec["columns"] = columnas
+    return spec
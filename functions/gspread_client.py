@@ -2,10 +2,16 @@ import gspread
 from google.oauth2.service_account import Credentials
 import streamlit as st
 
+# Segundos máximos por llamada a la API; el diario cuenta con este tope para
+# que sus filas reclamadas no caduquen a mitad de un envío
+SEGUNDOS_API = 60
+
 def get_gsheet_client():
     scopes = ['https://www.googleapis.com/auth/spreadsheets']
     credentials = Credentials.from_service_account_info(
         st.secrets["gcp_service_account"],  # Usa tus secrets de Streamlit
         scopes=scopes
     )
-    return gspread.authorize(credentials)
+    cliente = gspread.authorize(credentials)
+    cliente.set_timeout(SEGUNDOS_API)
+    return cliente
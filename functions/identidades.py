@@ -0,0 +1,267 @@
+# functions/identidades.py
+
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+from functions.data_utils import reservas_en_rango, filas_pendientes, SHEET_NAME
+from functions.columnas import ENCABEZADOS_RESERVAS
+from functions.busqueda import normalizar_textos
+
+# Un contacto compartido por más nombres distintos (teléfono de la oficina,
+# valor de relleno...) no identifica a nadie y no se usa para enlazar
+MAX_NOMBRES_POR_CONTACTO = 5
+# Dígitos de un teléfono español sin prefijo internacional
+DIGITOS_TELEFONO = 9
+
+# Columnas de Reservas que intervienen (si no cambian, la reserva no se vuelve a preparar)
+COLUMNAS_IDENTIDAD = ['Nombre', 'Email o Teléfono', 'Fecha Reserva', 'Fecha Actividad', 'Precio']
+COLUMNAS_CLIENTES = ['Nombre', 'Contacto', 'Reservas', 'Gasto', 'Primera visita', 'Última visita']
+
+# ------------------- NORMALIZACIÓN -------------------
+
+def normalizar_contactos(serie):
+    """Email en minúsculas o teléfono como sus últimos 9 dígitos (sin +34 ni separadores); NA si no es ninguno"""
+    texto = serie.fillna('').astype(str).str.strip().str.lower()
+    es_email = texto.str.contains('@', regex=False) & texto.str.contains(r'^[^@\s]+@[^@\s]+\.[a-z]+$', regex=True)
+    digitos = texto.str.replace(r'\D', '', regex=True)
+    es_telefono = ~es_email & (digitos.str.len() >= DIGITOS_TELEFONO)
+    contacto = pd.Series(pd.NA, index=serie.index, dtype='string')
+    contacto[es_email] = texto[es_email]
+    contacto[es_telefono] = digitos[es_telefono].str[-DIGITOS_TELEFONO:]
+    tipo = pd.Series(np.where(es_email, 'email', np.where(es_telefono, 'telefono', '')), index=serie.index)
+    return contacto, tipo
+
+def preparar(datos):
+    """Claves de cada reserva para la resolución: nombre normalizado, bloque de nombre y contacto"""
+    # Sin leer la hoja (error al cargar) no hay columnas: ningún cliente
+    datos = datos.reindex(columns=COLUMNAS_IDENTIDAD)
+    nombres = normalizar_textos(datos['Nombre']).str.split()
+    contacto, tipo = normalizar_contactos(datos['Email o Teléfono'])
+    # Bloque de nombre: nombre y primer apellido (con uno solo no basta para enlazar)
+    bloque = nombres.str[:2].str.join(' ').where(nombres.str.len() >= 2)
+    return pd.DataFrame({
+        'Nombre normalizado': nombres.str.join(' '),
+        'Bloque nombre': bloque,
+        'Contacto': contacto,
+        'Tipo contacto': tipo,
+        'Fecha Reserva': pd.to_datetime(datos['Fecha Reserva'], dayfirst=True, errors='coerce'),
+        'Fecha Actividad': pd.to_datetime(datos['Fecha Actividad'], dayfirst=True, errors='coerce'),
+        'Precio': pd.to_numeric(datos['Precio'], errors='coerce'),
+        'Nombre': datos['Nombre'].astype(str),
+        'Email o Teléfono': datos['Email o Teléfono'].astype(str),
+    }, index=datos.index)
+
+# ------------------- RESOLUCIÓN -------------------
+
+def _codigos(preparadas):
+    """Código de contacto y de bloque de nombre de cada reserva (-1 = sin él) y los valores de cada código"""
+    contacto, contactos = pd.factorize(preparadas['Contacto'], use_na_sentinel=True)
+    nombre, nombres = pd.factorize(preparadas['Bloque nombre'], use_na_sentinel=True)
+    return (contacto, nombre), (pd.Index(contactos), pd.Index(nombres))
+
+def _bloques(preparadas, codigos=None):
+    """Código de bloque de cada reserva (-1 = sin bloque) por contacto y por nombre.
+
+    Dentro de un bloque de contacto todas son el mismo cliente. Un bloque de
+    nombre solo enlaza si no tiene dos teléfonos o dos emails distintos (dos
+    "María García" con teléfonos diferentes son dos personas).
+    """
+    contacto, nombre = codigos if codigos is not None else _codigos(preparadas)[0]
+    nombres_por_contacto = preparadas.groupby(contacto)['Bloque nombre'].transform('nunique').to_numpy()
+    contacto = np.where(nombres_por_contacto > MAX_NOMBRES_POR_CONTACTO, -1, contacto)
+
+    por_tipo = preparadas['Contacto'].where(preparadas['Tipo contacto'] == 'telefono'), \
+        preparadas['Contacto'].where(preparadas['Tipo contacto'] == 'email')
+    ambiguo = np.zeros(len(preparadas), dtype=bool)
+    for valores in por_tipo:
+        ambiguo |= (valores.groupby(nombre).transform('nunique') > 1).to_numpy()
+    nombre = np.where(ambiguo, -1, nombre)
+    return contacto, nombre
+
+def componentes(bloques):
+    """Grupo de cada reserva (la menor posición del grupo), uniendo los bloques por propagación de mínimos"""
+    grupo = np.arange(len(bloques[0]))
+    while True:
+        anterior = grupo.copy()
+        for codigos in bloques:
+            con_bloque = codigos >= 0
+            if con_bloque.any():
+                minimos = pd.Series(grupo[con_bloque]).groupby(codigos[con_bloque]).transform('min').to_numpy()
+                grupo[con_bloque] = np.minimum(grupo[con_bloque], minimos)
+        # Salto de punteros: cada reserva apunta al grupo de su grupo
+        grupo = grupo[grupo]
+        if np.array_equal(grupo, anterior):
+            return grupo
+
+def _claves_estables(primeras):
+    """Clave de cada cliente a partir de su primera reserva: no cambia al añadir reservas ni al releer la hoja"""
+    partes = [primeras['Nombre normalizado'], primeras['Contacto'].fillna('').astype(str),
+              primeras['Fecha Reserva'].astype(str), primeras['Fecha Actividad'].astype(str)]
+    textos = partes[0].str.cat(partes[1:], sep='|')
+    return pd.Series(["C" + hashlib.sha1(t.encode('utf-8')).hexdigest()[:10] for t in textos], index=primeras.index)
+
+def claves_clientes(preparadas, bloques=None):
+    """Clave de cliente de cada reserva (Serie con el índice de `preparadas`).
+
+    `bloques`: códigos de bloque ya calculados sobre todo el histórico (para
+    resolver solo una parte con los mismos bloques válidos); por defecto, los de `preparadas`.
+    """
+    if preparadas.empty:
+        return pd.Series(dtype=object, index=preparadas.index)
+    grupo = componentes(bloques if bloques is not None else _bloques(preparadas))
+    # La primera reserva (por fecha de reserva) de cada grupo da nombre al cliente
+    orden = preparadas.assign(Grupo=grupo, Posicion=np.arange(len(preparadas))).sort_values(
+        ['Fecha Reserva', 'Fecha Actividad', 'Posicion'], na_position='last', kind='stable')
+    primeras = orden.drop_duplicates('Grupo')
+    claves = _claves_estables(primeras)
+    # Dos clientes con la misma primera reserva (filas idénticas sin contacto): sufijo por orden
+    repetidas = claves.groupby(claves).cumcount()
+    claves = claves.where(repetidas == 0, claves + '-' + repetidas.astype(str))
+    por_grupo = pd.Series(claves.to_numpy(), index=primeras['Grupo'].to_numpy())
+    return pd.Series(por_grupo.reindex(grupo).to_numpy(), index=preparadas.index)
+
+def resumen_clientes(preparadas, claves):
+    """Una fila por cliente: nombre y contacto más recientes, reservas, gasto y primera/última visita"""
+    datos = preparadas.assign(Clave=claves).sort_values('Fecha Reserva', kind='stable', na_position='first')
+    grupos = datos.groupby('Clave', sort=False)
+    return pd.DataFrame({
+        'Nombre': grupos['Nombre'].last(),
+        'Contacto': grupos['Email o Teléfono'].last(),
+        'Reservas': grupos.size(),
+        'Gasto': grupos['Precio'].sum(),
+        'Primera visita': grupos['Fecha Actividad'].min(),
+        'Última visita': grupos['Fecha Actividad'].max(),
+    })[COLUMNAS_CLIENTES]
+
+def _huellas(datos):
+    return pd.util.hash_pandas_object(datos.reindex(columns=COLUMNAS_IDENTIDAD), index=False)
+
+class IdentidadesClientes:
+    """Clave de cliente de cada reserva y resumen por cliente, al día de forma incremental.
+
+    Al actualizar solo se vuelve a resolver la parte afectada: las reservas
+    nuevas o cambiadas y los clientes que comparten algún bloque (contacto o
+    nombre) con ellas. Como los enlaces solo se dan dentro de un bloque, el
+    resultado es el mismo que resolver todo el histórico de nuevo.
+    """
+
+    def __init__(self, datos):
+        self.preparadas = preparar(datos)
+        self.claves = claves_clientes(self.preparadas)
+        self.clientes = resumen_clientes(self.preparadas, self.claves)
+        self._huellas = _huellas(datos)
+
+    def actualizar(self, datos):
+        """Índice al día con `datos` (este mismo si no cambió nada relevante)"""
+        huellas = _huellas(datos)
+        comunes = huellas.index.intersection(self._huellas.index)
+        cambiadas = comunes[huellas[comunes].to_numpy() != self._huellas[comunes].to_numpy()]
+        nuevas = huellas.index.difference(self._huellas.index)
+        borradas = self._huellas.index.difference(huellas.index)
+        if not (len(cambiadas) or len(nuevas) or len(borradas)):
+            return self
+
+        # Solo se preparan de nuevo las reservas tocadas
+        tocadas = cambiadas.union(nuevas)
+        preparadas = pd.concat([self.preparadas.loc[comunes.difference(cambiadas)],
+                                preparar(datos.loc[tocadas])]).reindex(datos.index)
+        codigos, valores = _codigos(preparadas)
+
+        # Bloques afectados: los de las reservas tocadas, antes y después del cambio
+        anteriores = self.preparadas.loc[cambiadas.union(borradas)]
+        posiciones = datos.index.get_indexer(tocadas)
+        en_bloque = np.zeros(len(preparadas), dtype=bool)
+        for actuales, columna, todos in zip(codigos, ['Contacto', 'Bloque nombre'], valores):
+            afectados = np.concatenate([actuales[posiciones], todos.get_indexer(anteriores[columna].dropna())])
+            en_bloque |= np.isin(actuales, afectados[afectados >= 0])
+        en_bloque[posiciones] = True
+
+        # Reservas afectadas: las de esos bloques y todas las de sus clientes
+        claves_previas = self.claves.reindex(preparadas.index)
+        clientes_afectados = set(claves_previas[en_bloque].dropna()) | set(self.claves[anteriores.index])
+        afectadas = en_bloque | claves_previas.isin(clientes_afectados).to_numpy()
+
+        nuevo = object.__new__(IdentidadesClientes)
+        nuevo.preparadas = preparadas
+        nuevo._huellas = huellas
+        # Qué bloques enlazan depende de todo el histórico; con ellos, resolver la
+        # parte afectada da lo mismo que resolverlo todo
+        contacto, nombre = _bloques(preparadas, codigos)
+        resueltas = claves_clientes(preparadas[afectadas], (contacto[afectadas], nombre[afectadas]))
+        nuevo.claves = pd.concat([claves_previas[~afectadas], resueltas]).reindex(preparadas.index)
+        recalcular = set(resueltas) | clientes_afectados
+        nuevo.clientes = pd.concat([
+            self.clientes.drop(index=list(recalcular), errors='ignore'),
+            resumen_clientes(preparadas[afectadas], resueltas),
+        ])
+        return nuevo
+
+    def buscar(self, nombre, contacto):
+        """Clave del cliente al que corresponde una reserva nueva con este nombre y contacto, o None"""
+        preparada = preparar(pd.DataFrame({'Nombre': [nombre], 'Email o Teléfono': [contacto],
+                                           'Fecha Reserva': [pd.NaT], 'Fecha Actividad': [pd.NaT],
+                                           'Precio': [0]})).iloc[0]
+        if pd.notna(preparada['Contacto']):
+            mismo = self.preparadas['Contacto'] == preparada['Contacto']
+            if mismo.any():
+                nombres = self.preparadas.loc[mismo.fillna(False), 'Bloque nombre'].nunique()
+                if nombres <= MAX_NOMBRES_POR_CONTACTO:
+                    return self.claves[mismo.fillna(False)].iloc[-1]
+        if pd.notna(preparada['Bloque nombre']):
+            bloque = self.preparadas[self.preparadas['Bloque nombre'] == preparada['Bloque nombre']]
+            if len(bloque):
+                for tipo in ('telefono', 'email'):
+                    contactos = set(bloque.loc[bloque['Tipo contacto'] == tipo, 'Contacto'])
+                    if preparada['Tipo contacto'] == tipo:
+                        contactos.add(preparada['Contacto'])
+                    if len(contactos) > 1:
+                        return None
+                return self.claves[bloque.index].iloc[-1]
+        return None
+
+    @property
+    def tasa_repeticion(self):
+        """Fracción de clientes con más de una reserva"""
+        return float((self.clientes['Reservas'] > 1).mean()) if len(self.clientes) else 0.0
+
+# ------------------- ÍNDICE COMPARTIDO -------------------
+
+@st.cache_resource
+def _almacen_identidades():
+    """Identidades compartidas (solo lectura) entre sesiones y la versión de datos que reflejan"""
+    return {"identidades": None, "version": None, "lock": threading.Lock()}
+
+def obtener_identidades():
+    """Identidades al día con la última lectura de Reservas, temporadas archivadas incluidas"""
+    datos = reservas_en_rango()
+    version = datos.attrs.get('version')
+    almacen = _almacen_identidades()
+    with almacen["lock"]:
+        if almacen["identidades"] is None:
+            almacen["identidades"] = IdentidadesClientes(datos)
+        elif version is not None and version != almacen["version"]:
+            almacen["identidades"] = almacen["identidades"].actualizar(datos)
+        almacen["version"] = version or almacen["version"]
+        return almacen["identidades"]
+
+def ficha_cliente(nombre, contacto):
+    """Reservas, gasto y última visita del cliente con este nombre y contacto (None si es nuevo).
+
+    Cuenta también las reservas guardadas que aún no han llegado a la hoja.
+    """
+    identidades = obtener_identidades()
+    clave = identidades.buscar(nombre, contacto)
+    if clave is None:
+        return None
+    ficha = identidades.clientes.loc[clave].to_dict()
+    pendientes = [dict(zip(ENCABEZADOS_RESERVAS, f["fila"])) for f in filas_pendientes(SHEET_NAME)]
+    if pendientes:
+        pendientes = preparar(pd.DataFrame(pendientes))
+        suyas = [identidades.buscar(f['Nombre'], f['Email o Teléfono']) == clave for _, f in pendientes.iterrows()]
+        suyas = pendientes[suyas]
+        ficha['Reservas'] += len(suyas)
+        ficha['Gasto'] += suyas['Precio'].sum()
+        ficha['Última visita'] = pd.Series([ficha['Última visita'], *suyas['Fecha Actividad']]).max()
+    return ficha
@@ -0,0 +1,222 @@
+# functions/importacion.py
+# Importación masiva de clientes (CSV/XLSX) a la hoja Clientes.
+# Sin dependencias de la app: la usan data_utils y las herramientas de benchmark.
+
+import collections
+import threading
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from gspread.exceptions import APIError
+from functions.columnas import ENCABEZADOS_CLIENTES
+
+# Filas por llamada a append_rows (15 columnas: ~30.000 celdas, muy por debajo
+# del tamaño máximo de petición de la API de Sheets)
+FILAS_POR_LOTE = 2000
+
+# Cuota de escritura de la API de Sheets por usuario (cuenta de servicio)
+ESCRITURAS_POR_MINUTO = 60
+REINTENTOS_CUOTA = 6
+MARGEN_CUOTA = 0.5
+
+# Columnas que debe traer el archivo; Edad, Ingresos por Persona y (si falta)
+# Fecha Registro se calculan al importar, como hace guardar_cliente
+COLUMNAS_OBLIGATORIAS = [
+    "ID", "Sexo", "Fecha Nacimiento", "Ciudad", "Pais", "Actividad",
+    "Fecha Actividad", "Hora Inicio", "Duracion", "Personas", "Precio",
+]
+
+def leer_archivo_clientes(archivo, nombre=None):
+    """Lee un CSV, XLSX o XLS de clientes (ruta o archivo subido) con todo como texto salvo fechas de Excel"""
+    nombre = (nombre or getattr(archivo, "name", None) or str(archivo)).lower()
+    if nombre.endswith((".xlsx", ".xls")):
+        return pd.read_excel(archivo)
+    return pd.read_csv(archivo, dtype=str, keep_default_na=False, sep=None, engine="python")
+
+def normalizar_ids(serie):
+    """IDs como texto comparable: sin espacios y sin el '.0' que añaden Excel y pandas a los enteros"""
+    ids = serie.astype(str).str.strip()
+    return ids.str.replace(r"^(\d+)\.0+$", r"\1", regex=True)
+
+def _normalizar_columnas(df):
+    """Renombra las columnas a los encabezados de la hoja sin distinguir mayúsculas ni espacios"""
+    canonicas = {c.lower().strip(): c for c in ENCABEZADOS_CLIENTES}
+    canonicas.update({"país": "Pais", "duración": "Duracion"})
+    return df.rename(columns=lambda c: canonicas.get(str(c).lower().strip(), c))
+
+# Formatos de fecha que se prueban en orden: los de la hoja, ISO y, por último, cualquiera con el día primero
+FORMATOS_FECHA = [("%d/%m/%Y", {}), ("%d/%m/%Y %H:%M", {}), ("ISO8601", {}), ("mixed", {"dayfirst": True})]
+
+def _fechas(serie):
+    """Convierte fechas analizando cada valor distinto una sola vez (las de Excel ya llegan como fechas)"""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    codigos, distintas = pd.factorize(serie.astype(str).str.strip())
+    distintas = pd.Series(distintas)
+    fechas = pd.Series(pd.NaT, index=distintas.index, dtype="datetime64[ns]")
+    for formato, opciones in FORMATOS_FECHA:
+        otras = fechas.isna()
+        if not otras.any():
+            break
+        fechas[otras] = pd.to_datetime(distintas[otras], format=formato, errors="coerce", **opciones)
+    resultado = fechas.to_numpy()[codigos]
+    resultado[codigos < 0] = np.datetime64("NaT")
+    return pd.Series(resultado, index=serie.index)
+
+def _formatear(fechas, formato):
+    """strftime de cada valor distinto una sola vez (vacío para NaT)"""
+    codigos, distintas = pd.factorize(fechas)
+    textos = np.append(pd.DatetimeIndex(distintas).strftime(formato).to_numpy(dtype=object), np.nan)
+    return pd.Series(textos[codigos], index=fechas.index)
+
+def _horas(serie):
+    texto = serie.astype(str).str.strip()
+    horas = pd.to_datetime(texto, format="%H:%M", errors="coerce")
+    # Excel (datetime.time -> 'HH:MM:SS') y horas escritas con segundos
+    otras = horas.isna()
+    horas[otras] = pd.to_datetime(texto[otras], format="%H:%M:%S", errors="coerce")
+    return horas
+
+def preparar_importacion(df, ids_existentes, ahora=None):
+    """Valida y convierte un archivo de clientes a filas de la hoja, en bloque.
+
+    Devuelve (filas, ids, duplicados, rechazados):
+      filas: lista de listas en el orden de ENCABEZADOS_CLIENTES, lista para append_rows
+      ids: IDs normalizados de esas filas
+      duplicados: filas cuyo ID ya está en la hoja o se repite en el archivo
+      rechazados: filas con datos obligatorios vacíos o no válidos (con el motivo)
+    """
+    ahora = ahora or datetime.now()
+    df = _normalizar_columnas(df)
+    faltan = [c for c in COLUMNAS_OBLIGATORIAS if c not in df.columns]
+    if faltan:
+        raise ValueError(f"Faltan columnas en el archivo: {', '.join(faltan)}")
+
+    df = df.reset_index(drop=True)
+    texto = {c: df[c].where(df[c].notna(), "").astype(str).str.strip()
+             for c in ["ID", "Sexo", "Ciudad", "Pais", "Actividad", "Duracion"]}
+    ids = normalizar_ids(texto["ID"])
+    fecha_nacimiento = _fechas(df["Fecha Nacimiento"])
+    fecha_actividad = _fechas(df["Fecha Actividad"])
+    hora_inicio = _horas(df["Hora Inicio"])
+    personas = pd.to_numeric(df["Personas"], errors="coerce")
+    precio = pd.to_numeric(df["Precio"].astype(str).str.replace(",", ".", regex=False), errors="coerce")
+    if "Fecha Registro" in df.columns:
+        fecha_registro = _formatear(_fechas(df["Fecha Registro"]), "%d/%m/%Y %H:%M")
+    else:
+        fecha_registro = pd.Series(np.nan, index=df.index, dtype=object)
+    fecha_registro = fecha_registro.fillna(ahora.strftime("%d/%m/%Y %H:%M"))
+
+    # Motivo de rechazo por fila (el primero que aplique)
+    motivo = pd.Series("", index=df.index, dtype=object)
+    comprobaciones = [(texto[c] == "", f"{c} vacío") for c in texto] + [
+        (fecha_nacimiento.isna(), "Fecha Nacimiento no válida"),
+        (fecha_actividad.isna(), "Fecha Actividad no válida"),
+        (hora_inicio.isna(), "Hora Inicio no válida"),
+        (personas.isna() | (personas < 1) | (personas % 1 != 0), "Personas no válido"),
+        (precio.isna() | (precio < 0), "Precio no válido"),
+    ]
+    for falla, descripcion in comprobaciones:
+        motivo[(motivo == "") & falla] = descripcion
+    validas = (motivo == "").to_numpy()
+
+    # Duplicados: contra la hoja y dentro del archivo (se queda el primero)
+    en_hoja = validas & ids.isin(ids_existentes).to_numpy()
+    candidatas = validas & ~en_hoja
+    repetidos = candidatas & ids.where(candidatas).duplicated().to_numpy()
+    nuevas = candidatas & ~repetidos
+
+    duplicada = en_hoja | repetidos
+    duplicados = df[duplicada].assign(
+        Motivo=np.where(en_hoja[duplicada], "ID ya existe en la hoja", "ID repetido en el archivo")
+    )
+    rechazados = df[~validas].assign(Motivo=motivo[~validas])
+
+    # Columnas calculadas, igual que guardar_cliente
+    edad = (pd.Timestamp(ahora) - fecha_nacimiento).dt.days // 365
+    ingresos_pp = precio / personas
+    notas = (df["Notas"].where(df["Notas"].notna(), "").astype(str)
+             if "Notas" in df.columns else pd.Series("", index=df.index))
+
+    hoja = pd.DataFrame({
+        "ID": ids,
+        "Sexo": texto["Sexo"],
+        "Fecha Nacimiento": _formatear(fecha_nacimiento, "%d/%m/%Y"),
+        "Ciudad": texto["Ciudad"],
+        "Pais": texto["Pais"],
+        "Actividad": texto["Actividad"],
+        "Fecha Actividad": _formatear(fecha_actividad, "%d/%m/%Y"),
+        "Hora Inicio": _formatear(hora_inicio, "%H:%M"),
+        "Duracion": texto["Duracion"],
+        "Personas": personas,
+        "Precio": precio,
+        "Fecha Registro": fecha_registro,
+        "Edad": edad,
+        "Ingresos por Persona": ingresos_pp,
+        "Notas": notas,
+    })[ENCABEZADOS_CLIENTES][nuevas]
+    # Tipos de Python (no de numpy) para que gspread los serialice
+    hoja = hoja.astype({"Personas": int, "Edad": int}).astype(object)
+    return hoja.values.tolist(), ids[nuevas].tolist(), duplicados, rechazados
+
+class LimiteEscrituras:
+    """Ventana deslizante de un minuto con las escrituras hechas en este proceso.
+
+    La cuota de Sheets es por usuario, y todas las sesiones usan la misma
+    cuenta de servicio, así que el límite se comparte entre sesiones.
+    """
+
+    def __init__(self, por_minuto=ESCRITURAS_POR_MINUTO, reloj=time.monotonic, esperar=time.sleep):
+        self.por_minuto = por_minuto
+        self._reloj = reloj
+        self._esperar = esperar
+        self._escrituras = collections.deque()
+        self._lock = threading.Lock()
+
+    def reservar(self):
+        """Espera, si hace falta, hasta que quede cuota para una escritura y la anota"""
+        while True:
+            # La espera se calcula con el lock pero se duerme sin él, para no
+            # bloquear a las demás sesiones mientras tanto
+            with self._lock:
+                ahora = self._reloj()
+                while self._escrituras and ahora - self._escrituras[0] >= 60:
+                    self._escrituras.popleft()
+                if len(self._escrituras) < self.por_minuto:
+                    self._escrituras.append(ahora)
+                    return
+                # Margen por la diferencia entre nuestro reloj y el de la API
+                espera = 60 - (ahora - self._escrituras[0]) + MARGEN_CUOTA
+            self._esperar(espera)
+
+LIMITE_ESCRITURAS = LimiteEscrituras()
+
+def _es_error_cuota(error):
+    return getattr(error, "code", None) == 429
+
+def escribir_por_lotes(hoja, filas, filas_por_lote=FILAS_POR_LOTE, limite=LIMITE_ESCRITURAS,
+                       al_progresar=None, esperar=time.sleep):
+    """Añade `filas` a la hoja con una llamada a append_rows por lote.
+
+    Respeta la cuota de escrituras y, si aun así la API responde 429, reintenta
+    el lote con espera exponencial. Devuelve el número de filas escritas; si un
+    lote falla del todo, la excepción lleva las escritas en `filas_escritas`.
+    """
+    escritas = 0
+    for inicio in range(0, len(filas), filas_por_lote):
+        lote = filas[inicio:inicio + filas_por_lote]
+        for intento in range(REINTENTOS_CUOTA):
+            limite.reservar()
+            try:
+                hoja.append_rows(lote)
+                break
+            except APIError as e:
+                if not _es_error_cuota(e) or intento == REINTENTOS_CUOTA - 1:
+                    e.filas_escritas = escritas
+                    raise
+                esperar(min(2 ** intento, 32))
+        escritas += len(lote)
+        if al_progresar:
+            al_progresar(escritas, len(filas))
+    return escritas
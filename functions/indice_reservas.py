@@ -0,0 +1,99 @@
+# functions/indice_reservas.py
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from functions.data_utils import cargar_datos, reservas_en_rango
+from functions.rendimiento import cache_medida
+
+class IndiceFechas:
+    """Acceso a un dataframe ordenado por fecha con consultas de rango por búsqueda binaria.
+
+    Mantiene además un índice secundario por actividad (posiciones ordenadas de
+    cada actividad) para filtrar por actividad sin recorrer todo el dataframe.
+    Los rangos son semiabiertos: [desde, hasta). Las filas sin fecha (NaT,
+    al final del orden) solo se devuelven si no se filtra por fecha.
+    """
+
+    def __init__(self, df, columna_fecha='Fecha Actividad', columna_grupo='Actividad'):
+        if df.empty or columna_fecha not in df.columns:
+            self.df = df
+            self._fechas = np.array([], dtype='datetime64[ns]')
+            self._validas = 0
+            self._grupos = {}
+            return
+
+        if not df[columna_fecha].is_monotonic_increasing:
+            df = df.sort_values(columna_fecha, kind='stable')
+        self.df = df
+        self._fechas = df[columna_fecha].to_numpy()
+        self._validas = int(df[columna_fecha].notna().sum())
+
+        # Índice secundario: posiciones (y sus fechas, también ordenadas, y
+        # cuántas no son NaT) por grupo
+        self._grupos = {}
+        if columna_grupo in df.columns:
+            codigos, grupos = pd.factorize(df[columna_grupo], sort=True)
+            orden = np.argsort(codigos, kind='stable')
+            cortes = np.searchsorted(codigos[orden], np.arange(len(grupos) + 1))
+            for i, grupo in enumerate(grupos):
+                posiciones = orden[cortes[i]:cortes[i + 1]]
+                fechas = self._fechas[posiciones]
+                self._grupos[grupo] = (posiciones, fechas, int(pd.notna(fechas).sum()))
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def grupos(self):
+        """Valores distintos de la columna de grupo (actividades), ordenados"""
+        return list(self._grupos)
+
+    def _limite(self, fechas, valor, defecto):
+        if valor is None:
+            return defecto
+        return np.searchsorted(fechas, np.datetime64(pd.Timestamp(valor)), side='left')
+
+    def _corte(self, fechas, validas, desde, hasta):
+        # Con solo `desde`, el corte acaba en el primer NaT y no al final
+        fin = len(fechas) if desde is None else validas
+        return self._limite(fechas, desde, 0), self._limite(fechas, hasta, fin)
+
+    def posiciones(self, desde=None, hasta=None):
+        """Posiciones [izq, der) de las filas con fecha en [desde, hasta)"""
+        return self._corte(self._fechas, self._validas, desde, hasta)
+
+    def rango(self, desde=None, hasta=None, grupos=None):
+        """Filas con fecha en [desde, hasta), opcionalmente solo de los grupos indicados.
+
+        Sin filtro de grupo devuelve un corte del dataframe (sin copia).
+        """
+        if not grupos:
+            izq, der = self.posiciones(desde, hasta)
+            return self.df.iloc[izq:der]
+
+        partes = []
+        for grupo in grupos:
+            if grupo not in self._grupos:
+                continue
+            posiciones, fechas, validas = self._grupos[grupo]
+            izq, der = self._corte(fechas, validas, desde, hasta)
+            partes.append(posiciones[izq:der])
+        if not partes:
+            return self.df.iloc[0:0]
+        # Ordenar las posiciones conserva el orden por fecha
+        return self.df.iloc[np.sort(np.concatenate(partes))]
+
+# Una entrada por versión de datos y por combinación de temporadas archivadas consultada
+@cache_medida(st.cache_resource(max_entries=4))
+def _indice_por_version(version, _datos):
+    return IndiceFechas(_datos)
+
+def indice_reservas(desde=None, hasta=None):
+    """Índice compartido (entre sesiones) de las reservas para la versión de datos actual.
+
+    Con `desde` incluye las temporadas archivadas del rango [desde, hasta)
+    si llega a ellas; sin él, solo la hoja activa.
+    """
+    datos = cargar_datos() if desde is None else reservas_en_rango(desde, hasta)
+    return _indice_por_version(datos.attrs.get('version'), datos)
@@ -0,0 +1,337 @@
+# functions/informe_estatico.py
+
+import contextlib
+import hashlib
+import html
+import os
+import pickle
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from functions.data_utils import DIRECTORIO_DATOS
+from functions.rendimiento import cache_medida
+from functions.tabla_paginada import mostrar_tabla_paginada
+
+# Directorio de los informes pre-renderizados; `ultimo` apunta al más reciente
+DIRECTORIO_INFORMES = DIRECTORIO_DATOS / "informes"
+INFORMES_CONSERVADOS = 3
+
+# Filas de la tabla de clientes que se incluyen en el HTML estático
+FILAS_TABLA_HTML = 200
+
+# ------------------- LIENZO (st SIN WIDGETS) -------------------
+
+class _Columna:
+    """Columna de un Lienzo: como contexto o llamando a sus métodos, igual que st.columns"""
+
+    def __init__(self, lienzo, elementos):
+        self._lienzo = lienzo
+        self._elementos = elementos
+
+    def __enter__(self):
+        self._lienzo._pila.append(self._elementos)
+        return self
+
+    def __exit__(self, *exc):
+        self._lienzo._pila.pop()
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self._lienzo, nombre)
+        def en_columna(*args, **kwargs):
+            with self:
+                return metodo(*args, **kwargs)
+        return en_columna
+
+class Lienzo:
+    """Sustituye a `st` en las secciones de reportes y guarda los elementos en vez de dibujarlos.
+
+    Cada elemento es (tipo, datos). Los selectbox devuelven la opción indicada
+    en `selecciones` (o la primera) y se anotan en `selectores` junto con el
+    número de elementos dibujados antes de ellos.
+    """
+
+    def __init__(self, selecciones=None):
+        self.elementos = []
+        self._pila = [self.elementos]
+        self.selecciones = selecciones or {}
+        self.selectores = []
+
+    def _añadir(self, tipo, *datos):
+        self._pila[-1].append((tipo, datos))
+
+    def title(self, texto, **_):
+        self._añadir("title", texto)
+
+    def header(self, texto, **_):
+        self._añadir("header", texto)
+
+    def subheader(self, texto, **_):
+        self._añadir("subheader", texto)
+
+    def caption(self, texto, **_):
+        self._añadir("caption", texto)
+
+    def markdown(self, texto, unsafe_allow_html=False, **_):
+        self._añadir("markdown", texto, unsafe_allow_html)
+
+    def write(self, texto, **_):
+        self._añadir("markdown", str(texto), False)
+
+    def info(self, texto, **_):
+        self._añadir("info", texto)
+
+    def warning(self, texto, **_):
+        self._añadir("warning", texto)
+
+    def metric(self, label, value, delta=None, **_):
+        self._añadir("metric", label, value, delta)
+
+    def dataframe(self, data, **_):
+        self._añadir("dataframe", pd.DataFrame(data))
+
+    def image(self, imagen, **_):
+        self._añadir("image", imagen)
+
+    def pyplot(self, fig, **_):
+        from functions.graficos import figura_a_bytes
+        self._añadir("image", figura_a_bytes(fig))
+
+    def columns(self, spec, **_):
+        columnas = [[] for _ in range(spec if isinstance(spec, int) else len(spec))]
+        self._añadir("columnas", columnas)
+        return [_Columna(self, elementos) for elementos in columnas]
+
+    def selectbox(self, label, options, index=0, **_):
+        opciones = list(options)
+        self.selectores.append((label, opciones, len(self.elementos)))
+        if not opciones:
+            return None
+        return self.selecciones.get(label, opciones[index])
+
+@contextlib.contextmanager
+def sustituir_streamlit(lienzo):
+    """Mientras dura, las secciones de reportes y sus gráficos escriben en `lienzo`
+    (los gráficos como PNG de matplotlib, no como especificación Vega-Lite)"""
+    from functions import reportes, graficos
+    originales = reportes.st, graficos.st
+    reportes.st = graficos.st = lienzo
+    try:
+        with graficos.exportacion_estatica():
+            yield lienzo
+    finally:
+        reportes.st, graficos.st = originales
+
+def renderizar_seccion(nombre, df):
+    """Elementos de una sección del dashboard (se ejecuta en un proceso del pool).
+
+    Si la sección tiene un selectbox (Predicciones) se renderiza una vez por
+    opción y el resultado es un único elemento 'selector'.
+    """
+    from functions.reportes import SECCIONES_REPORTES
+    funcion, _ = SECCIONES_REPORTES[nombre]
+    with sustituir_streamlit(Lienzo()) as lienzo:
+        funcion(df)
+    if not lienzo.selectores:
+        return lienzo.elementos
+
+    # Lo que la sección dibuja antes del selectbox es común a todas las opciones
+    etiqueta, opciones, comunes = lienzo.selectores[0]
+    por_opcion = {}
+    for opcion in opciones:
+        with sustituir_streamlit(Lienzo({etiqueta: opcion})) as lienzo_opcion:
+            funcion(df)
+        por_opcion[opcion] = lienzo_opcion.elementos[comunes:]
+    return lienzo.elementos[:comunes] + [("selector", (etiqueta, por_opcion))]
+
+def renderizar_informe(df, procesos=1):
+    """Renderiza todas las secciones del dashboard, cada una en un proceso"""
+    from functions.reportes import SECCIONES_REPORTES
+    nombres = list(SECCIONES_REPORTES)
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            secciones = list(pool.map(renderizar_seccion, nombres, [df] * len(nombres)))
+    else:
+        secciones = [renderizar_seccion(nombre, df) for nombre in nombres]
+    return {
+        "generado": datetime.now(),
+        "filas": len(df),
+        "clientes": df,
+        "secciones": dict(zip(nombres, secciones)),
+    }
+
+# ------------------- HTML ESTÁTICO -------------------
+
+def _html_elementos(elementos, guardar_imagen):
+    partes = []
+    for tipo, datos in elementos:
+        if tipo == "title":
+            partes.append(f"<h1>{html.escape(str(datos[0]))}</h1>")
+        elif tipo == "header":
+            partes.append(f"<h2>{html.escape(str(datos[0]))}</h2>")
+        elif tipo == "subheader":
+            partes.append(f"<h3>{html.escape(str(datos[0]))}</h3>")
+        elif tipo == "caption":
+            partes.append(f"<p class='caption'>{html.escape(str(datos[0]))}</p>")
+        elif tipo == "markdown":
+            texto, permitir_html = datos
+            texto = texto if permitir_html else html.escape(texto)
+            texto = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", texto)
+            partes.append(f"<p>{texto}</p>")
+        elif tipo in ("info", "warning"):
+            partes.append(f"<p class='{tipo}'>{html.escape(str(datos[0]))}</p>")
+        elif tipo == "metric":
+            label, valor, delta = datos
+            delta = f"<span class='delta'>{html.escape(str(delta))}</span>" if delta is not None else ""
+            partes.append(f"<div class='metric'><span>{html.escape(str(label))}</span>"
+                          f"<strong>{html.escape(str(valor))}</strong>{delta}</div>")
+        elif tipo == "dataframe":
+            partes.append(datos[0].to_html(classes="tabla", float_format=lambda v: f"{v:,.2f}", na_rep=""))
+        elif tipo == "image":
+            partes.append(f"<img src='{guardar_imagen(datos[0])}'>")
+        elif tipo == "columnas":
+            columnas = "".join(f"<div>{_html_elementos(c, guardar_imagen)}</div>" for c in datos[0])
+            partes.append(f"<div class='columnas'>{columnas}</div>")
+        elif tipo == "selector":
+            etiqueta, por_opcion = datos
+            for opcion, hijos in por_opcion.items():
+                partes.append(f"<details><summary>{html.escape(f'{etiqueta}: {opcion}')}</summary>"
+                              f"{_html_elementos(hijos, guardar_imagen)}</details>")
+    return "\n".join(partes)
+
+ESTILO_HTML = """
+body { font-family: sans-serif; max-width: 1200px; margin: auto; padding: 1rem; }
+img { max-width: 100%; }
+.columnas { display: flex; gap: 1rem; } .columnas > div { flex: 1; min-width: 0; }
+.caption { color: #666; font-size: .9em; } .info { background: #e8f0fe; padding: .5rem; }
+.warning { background: #fff4e5; padding: .5rem; }
+.metric span, .metric .delta { display: block; color: #666; } .metric strong { font-size: 1.8em; }
+.tabla { border-collapse: collapse; font-size: .85em; } .tabla td, .tabla th { border: 1px solid #ddd; padding: 2px 6px; }
+nav a { margin-right: 1rem; }
+"""
+
+def escribir_html(informe, directorio):
+    """index.html con todas las secciones y los gráficos como PNG en graficos/"""
+    (directorio / "graficos").mkdir(parents=True, exist_ok=True)
+
+    def guardar_imagen(imagen):
+        nombre = f"graficos/{hashlib.md5(imagen).hexdigest()}.png"
+        (directorio / nombre).write_bytes(imagen)
+        return nombre
+
+    clientes = informe["clientes"]
+    cuerpo = [
+        "<h1>📊 Dashboard de Análisis de Clientes</h1>",
+        f"<p class='caption'>Generado el {informe['generado']:%d/%m/%Y %H:%M} · {informe['filas']} clientes</p>",
+        "<nav>" + "".join(f"<a href='#seccion-{i}'>{html.escape(n)}</a>"
+                          for i, n in enumerate(informe["secciones"])) + "</nav>",
+        "<h3>Datos de Clientes (procesados)</h3>",
+        clientes.head(FILAS_TABLA_HTML).to_html(classes="tabla", na_rep=""),
+        f"<p class='caption'>Primeras {min(FILAS_TABLA_HTML, len(clientes))} de {len(clientes)} filas</p>",
+    ]
+    for i, (nombre, elementos) in enumerate(informe["secciones"].items()):
+        cuerpo.append(f"<section id='seccion-{i}'><h2>{html.escape(nombre)}</h2>"
+                      f"{_html_elementos(elementos, guardar_imagen)}</section>")
+
+    pagina = (f"<!DOCTYPE html><html lang='es'><head><meta charset='utf-8'>"
+              f"<title>Reportes Ubuntu Aventuras</title><style>{ESTILO_HTML}</style></head>"
+              f"<body>{''.join(cuerpo)}</body></html>")
+    (directorio / "index.html").write_text(pagina, encoding="utf-8")
+
+# ------------------- ALMACENAMIENTO -------------------
+
+def guardar_informe(informe, base=DIRECTORIO_INFORMES):
+    """Escribe el informe en un directorio nuevo y actualiza `ultimo` de forma atómica"""
+    nombre = f"informe-{informe['generado']:%Y%m%d-%H%M%S}"
+    directorio = base / nombre
+    if directorio.exists():
+        shutil.rmtree(directorio)
+    directorio.mkdir(parents=True)
+    escribir_html(informe, directorio)
+    with open(directorio / "informe.pkl", "wb") as f:
+        pickle.dump(informe, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    temporal = base / "ultimo.tmp"
+    temporal.write_text(nombre, encoding="utf-8")
+    os.replace(temporal, base / "ultimo")
+
+    # Los más antiguos sobran
+    anteriores = sorted(p for p in base.glob("informe-*") if p.is_dir() and p.name != nombre)
+    for viejo in anteriores[:max(0, len(anteriores) - (INFORMES_CONSERVADOS - 1))]:
+        shutil.rmtree(viejo, ignore_errors=True)
+    return directorio
+
+def ruta_ultimo_informe(base=DIRECTORIO_INFORMES):
+    """Directorio del último informe generado, o None"""
+    try:
+        directorio = base / (base / "ultimo").read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return directorio if (directorio / "informe.pkl").exists() else None
+
+@cache_medida(st.cache_resource(max_entries=1))
+def _leer_informe(ruta):
+    with open(ruta, "rb") as f:
+        return pickle.load(f)
+
+def cargar_ultimo_informe():
+    """Último informe pre-renderizado (se lee de disco una vez por informe nuevo)"""
+    directorio = ruta_ultimo_informe()
+    if directorio is None:
+        return None
+    try:
+        return _leer_informe(str(directorio / "informe.pkl"))
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+# ------------------- REPRODUCCIÓN EN STREAMLIT -------------------
+
+def reproducir(elementos, clave=""):
+    """Dibuja con Streamlit los elementos guardados por un Lienzo"""
+    for i, (tipo, datos) in enumerate(elementos):
+        if tipo == "title":
+            st.title(datos[0])
+        elif tipo == "header":
+            st.header(datos[0])
+        elif tipo == "subheader":
+            st.subheader(datos[0])
+        elif tipo == "caption":
+            st.caption(datos[0])
+        elif tipo == "markdown":
+            st.markdown(datos[0], unsafe_allow_html=datos[1])
+        elif tipo == "info":
+            st.info(datos[0])
+        elif tipo == "warning":
+            st.warning(datos[0])
+        elif tipo == "metric":
+            st.metric(*datos)
+        elif tipo == "dataframe":
+            st.dataframe(datos[0])
+        elif tipo == "image":
+            st.image(datos[0], width="stretch")
+        elif tipo == "columnas":
+            for columna, hijos in zip(st.columns(len(datos[0])), datos[0]):
+                with columna:
+                    reproducir(hijos, f"{clave}_{i}")
+        elif tipo == "selector":
+            etiqueta, por_opcion = datos
+            opcion = st.selectbox(etiqueta, list(por_opcion), key=f"informe_selector{clave}_{i}")
+            if opcion is not None:
+                reproducir(por_opcion[opcion], f"{clave}_{i}")
+
+def mostrar_informe(informe):
+    """Muestra el informe pre-renderizado con la misma estructura que el dashboard en vivo"""
+    st.title("📊 Dashboard de Análisis de Clientes")
+    st.caption(f"Informe generado el {informe['generado']:%d/%m/%Y %H:%M} "
+               f"con {informe['filas']} clientes")
+    st.subheader("Datos de Clientes (procesados)")
+    mostrar_tabla_paginada(informe["clientes"], "reportes_informe_clientes")
+
+    secciones = informe["secciones"]
+    pestañas = st.tabs(list(secciones), key="reportes_informe_seccion", on_change="rerun")
+    for (nombre, elementos), pestaña in zip(secciones.items(), pestañas):
+        if pestaña.open:
+            with pestaña:
+                reproducir(elementos, f"_{nombre}")
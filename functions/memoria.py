@@ -0,0 +1,205 @@
+# functions/memoria.py
+# Contabilidad de memoria por sesión y por caché (solo lectura). Lee el
+# estado interno de Streamlit (Runtime, cachés, gestores de archivos): si
+# una versión lo cambia, los informes salen vacíos en lugar de romper la app.
+# No libera el estado de las sesiones: el session_state propio de cada una
+# ronda los 3 KB; lo grande (las hojas) está en las cachés compartidas.
+
+import io
+import sys
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Clave de session_state con el momento (epoch) de la última ejecución del script
+CLAVE_ACTIVIDAD = "_ultima_actividad"
+# Profundidad máxima al recorrer objetos arbitrarios (atributos de atributos...)
+PROFUNDIDAD_MAXIMA = 8
+
+# ------------------- TAMAÑO DE OBJETOS -------------------
+
+def tamaño(objeto, vistos=None, _profundidad=0):
+    """Bytes aproximados que ocupa `objeto` y lo que cuelga de él.
+
+    Los objetos cuyo id está en `vistos` no se cuentan (y los recorridos se
+    añaden): así, un mismo set sirve para no contar dos veces lo compartido.
+    Los DataFrame y arrays se miden por sus datos, sin recorrer sus elementos.
+    """
+    if vistos is None:
+        vistos = set()
+    if id(objeto) in vistos or _profundidad > PROFUNDIDAD_MAXIMA:
+        return 0
+    vistos.add(id(objeto))
+
+    if isinstance(objeto, (pd.DataFrame, pd.Series, pd.Index)):
+        uso = objeto.memory_usage(deep=True)
+        return int(uso.sum() if isinstance(uso, pd.Series) else uso)
+    if isinstance(objeto, np.ndarray):
+        if objeto.base is None:
+            return objeto.nbytes
+        # Vista: los datos son de la base
+        return sys.getsizeof(objeto) + tamaño(objeto.base, vistos, _profundidad + 1)
+    if isinstance(objeto, (str, bytes, bytearray, int, float, bool, type(None))):
+        return sys.getsizeof(objeto)
+    if isinstance(objeto, memoryview):
+        return objeto.nbytes
+    if isinstance(objeto, io.BytesIO):
+        # getvalue() devuelve el buffer compartido; getbuffer() lo copiaría
+        return sys.getsizeof(objeto) + tamaño(objeto.getvalue(), vistos, _profundidad + 1)
+
+    total = sys.getsizeof(objeto)
+    if isinstance(objeto, dict):
+        for clave, valor in list(objeto.items()):
+            total += tamaño(clave, vistos, _profundidad + 1) + tamaño(valor, vistos, _profundidad + 1)
+    elif isinstance(objeto, (list, tuple, set, frozenset)):
+        for elemento in list(objeto):
+            total += tamaño(elemento, vistos, _profundidad + 1)
+    elif isinstance(objeto, type) or callable(objeto):
+        # Clases y funciones son del código, no de los datos
+        return 0
+    else:
+        atributos = getattr(objeto, "__dict__", None)
+        if atributos is not None:
+            total += tamaño(atributos, vistos, _profundidad + 1)
+        for nombre in getattr(type(objeto), "__slots__", ()):
+            total += tamaño(getattr(objeto, nombre, None), vistos, _profundidad + 1)
+    return total
+
+def _mb(bytes_):
+    return bytes_ / 1024 ** 2
+
+# ------------------- CACHÉS -------------------
+
+def _caches_streamlit():
+    """(tipo, nombre, caché) de cada función decorada con st.cache_resource o st.cache_data"""
+    from streamlit.runtime.caching.cache_resource_api import _resource_caches
+    from streamlit.runtime.caching.cache_data_api import _data_caches
+    for tipo, registro in (("cache_resource", _resource_caches), ("cache_data", _data_caches)):
+        with registro._caches_lock:
+            caches = [cache for por_sesion in registro._function_caches.values() for cache in por_sesion.values()]
+        for cache in caches:
+            yield tipo, cache.display_name, cache
+
+def _valores_resource(cache):
+    with cache._mem_cache_lock:
+        return [resultado.value for resultado in cache._mem_cache.values()]
+
+def objetos_compartidos():
+    """Ids de todo lo que cuelga de las cachés de recursos (lo que comparten las sesiones)"""
+    vistos = set()
+    try:
+        for tipo, _, cache in _caches_streamlit():
+            if tipo == "cache_resource":
+                tamaño(_valores_resource(cache), vistos)
+    except Exception:
+        pass
+    return vistos
+
+def resumen_caches():
+    """Una fila por caché de Streamlit: entradas y MB.
+
+    Las de recursos se miden recorriendo los objetos (lo compartido entre
+    cachés cuenta solo en la primera); las de datos guardan los resultados
+    serializados y se miden por sus bytes: cada llamada entrega además una
+    copia nueva a quien la hace.
+    """
+    filas = []
+    vistos = set()
+    try:
+        for tipo, nombre, cache in _caches_streamlit():
+            if tipo == "cache_resource":
+                valores = _valores_resource(cache)
+                entradas, bytes_ = len(valores), tamaño(valores, vistos)
+            else:
+                estadisticas = [e for lista in cache.get_stats().values() for e in lista]
+                entradas, bytes_ = len(estadisticas), sum(e.byte_length for e in estadisticas)
+            if entradas:
+                filas.append({"Caché": ".".join(nombre.split(".")[-2:]), "Tipo": tipo,
+                              "Entradas": entradas, "MB": _mb(bytes_)})
+    except Exception:
+        pass
+    return pd.DataFrame(filas, columns=["Caché", "Tipo", "Entradas", "MB"]).sort_values(
+        "MB", ascending=False, ignore_index=True)
+
+# ------------------- SESIONES -------------------
+
+def _runtime():
+    try:
+        return Runtime.instance() if Runtime.exists() else None
+    except Exception:
+        return None
+
+def _sesiones():
+    """AppSession de todas las sesiones del proceso (también las desconectadas que aún no han caducado)"""
+    runtime = _runtime()
+    try:
+        return [info.session for info in runtime._session_mgr.list_sessions()]
+    except Exception:
+        return []
+
+def _estado(sesion):
+    """Copia (clave -> valor) del session_state de otra sesión, sin tocar su estado"""
+    estado = sesion.session_state
+    for _ in range(3):
+        try:
+            return {**estado._old_state, **estado._new_session_state}
+        except RuntimeError:
+            # El hilo de esa sesión modificó el dict mientras se copiaba
+            continue
+    return {}
+
+def _subidas(runtime, id_sesion):
+    almacen = getattr(runtime.uploaded_file_mgr, "file_storage", {})
+    return list(almacen.get(id_sesion, {}).values())
+
+def _multimedia(runtime, id_sesion):
+    gestor = runtime.media_file_mgr
+    ids = list(gestor._files_by_session_and_coord.get(id_sesion, {}).values())
+    archivos = getattr(gestor._storage, "_files_by_id", {})
+    return [archivos[i].content for i in ids if i in archivos]
+
+def _actividad(estado):
+    valor = estado.get(CLAVE_ACTIVIDAD)
+    return valor if isinstance(valor, (int, float)) else None
+
+def resumen_sesiones(ahora=None):
+    """Una fila por sesión: usuario, minutos sin actividad y KB propios de su estado,
+    de lo compartido con las cachés que referencia, de archivos subidos y de multimedia"""
+    ahora = ahora or time.time()
+    runtime = _runtime()
+    compartidos = objetos_compartidos()
+    ctx = get_script_run_ctx()
+    actual = ctx.session_id if ctx else None
+    filas = []
+    for sesion in _sesiones():
+        try:
+            estado = _estado(sesion)
+            propio = tamaño(estado, set(compartidos))
+            referencias = sum(tamaño(v) for v in estado.values() if id(v) in compartidos)
+            subidas = sum(len(r.data) for r in _subidas(runtime, sesion.id))
+            multimedia = sum(len(c) for c in _multimedia(runtime, sesion.id))
+        except Exception:
+            continue
+        actividad = _actividad(estado)
+        filas.append({
+            "Sesión": sesion.id[:8] + (" (esta)" if sesion.id == actual else ""),
+            "Usuario": estado.get("current_user", ""),
+            "Inactiva (min)": (ahora - actividad) / 60 if actividad else None,
+            "Claves": len(estado),
+            "Estado (KB)": propio / 1024,
+            "Compartido (KB)": referencias / 1024,
+            "Subidas (KB)": subidas / 1024,
+            "Multimedia (KB)": multimedia / 1024,
+        })
+    columnas = ["Sesión", "Usuario", "Inactiva (min)", "Claves", "Estado (KB)",
+                "Compartido (KB)", "Subidas (KB)", "Multimedia (KB)"]
+    return pd.DataFrame(filas, columns=columnas)
+
+# ------------------- ACTIVIDAD -------------------
+
+def marcar_actividad():
+    """Anota en la sesión actual el momento de esta ejecución del script (columna "Inactiva (min)")"""
+    st.session_state[CLAVE_ACTIVIDAD] = time.time()
@@ -0,0 +1,158 @@
+# functions/predicciones.py
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from functions.rendimiento import cache_medida
+
+# Meses que se predicen tras el último mes con datos
+HORIZONTE_PREDICCION = 3
+
+# Formato con el que guardar_cliente escribe la fecha de registro
+FORMATO_FECHA_REGISTRO = '%d/%m/%Y %H:%M'
+
+# Meses activos mínimos para cada modelo. El estacional necesita al menos dos
+# temporadas para separar la tendencia del efecto de cada mes (el verano
+# concentra casi toda la actividad); con menos historial se usa el lineal.
+MIN_MESES_LINEAL = 2
+MIN_MESES_ESTACIONAL = 24
+
+def fechas_registro(serie):
+    """Convierte las fechas de registro analizando cada valor distinto una sola vez"""
+    codigos, distintas = pd.factorize(serie)
+    convertidas = pd.to_datetime(pd.Series(distintas), format=FORMATO_FECHA_REGISTRO, errors='coerce')
+    # Filas escritas a mano en la hoja con otro formato
+    otras = convertidas.isna()
+    if otras.any():
+        convertidas[otras] = pd.to_datetime(pd.Series(distintas)[otras], dayfirst=True, errors='coerce')
+    fechas = convertidas.to_numpy()[codigos]
+    fechas[codigos < 0] = np.datetime64('NaT')
+    return pd.Series(fechas, index=serie.index)
+
+def matriz_mensual(df, columna_fecha='Fecha Registro', medida='Precio'):
+    """Suma de `medida` por mes x actividad.
+
+    Devuelve (meses, actividades, valores, activos): `valores` es una matriz
+    meses x actividades con ceros en los meses sin reservas y `activos` marca,
+    para cada actividad, los meses desde su primera reserva (antes no existía
+    y no cuenta para el ajuste). Las actividades quedan ordenadas por su
+    primer mes y después por nombre.
+    """
+    fechas = fechas_registro(df[columna_fecha])
+    validas = (fechas.notna() & df['Actividad'].notna()).to_numpy()
+    if not validas.any():
+        return pd.DatetimeIndex([]), pd.Index([]), np.zeros((0, 0)), np.zeros((0, 0), dtype=bool)
+
+    fechas = fechas[validas]
+    mes = (fechas.dt.year * 12 + fechas.dt.month - 1).to_numpy()
+    mes_inicial = mes.min()
+    posicion_mes = mes - mes_inicial
+    n_meses = posicion_mes.max() + 1
+
+    codigos, nombres = pd.factorize(df['Actividad'][validas])
+    primer_mes = np.full(len(nombres), n_meses)
+    np.minimum.at(primer_mes, codigos, posicion_mes)
+    orden = np.lexsort((np.asarray(nombres, dtype=str), primer_mes))
+    nueva_posicion = np.empty_like(orden)
+    nueva_posicion[orden] = np.arange(len(orden))
+
+    valores = np.zeros((n_meses, len(nombres)))
+    importes = pd.to_numeric(df[medida][validas], errors='coerce').fillna(0).to_numpy(dtype=float)
+    np.add.at(valores, (posicion_mes, nueva_posicion[codigos]), importes)
+
+    activos = np.arange(n_meses)[:, None] >= primer_mes[orden][None, :]
+    meses = pd.date_range(
+        pd.Timestamp(year=int(mes_inicial // 12), month=int(mes_inicial % 12) + 1, day=1),
+        periods=n_meses, freq='MS'
+    )
+    return meses, pd.Index(nombres[orden]), valores, activos
+
+def diseño(posiciones, mes_calendario, estacional):
+    """Matriz de diseño: constante + tendencia (+ un indicador por mes salvo enero)"""
+    columnas = [np.ones(len(posiciones)), np.asarray(posiciones, dtype=float)]
+    if estacional:
+        columnas += [(mes_calendario == m).astype(float) for m in range(1, 12)]
+    return np.column_stack(columnas)
+
+def minimos_cuadrados(X, Y, W):
+    """Ajusta a la vez una regresión por columna de Y con pesos W (mismas dimensiones que Y).
+
+    Resuelve las ecuaciones normales de todas las actividades en bloque:
+    coeficientes = (XᵀWX)⁺ XᵀWy, con la pseudoinversa para los casos sin
+    datos suficientes (p. ej. meses del año en que la actividad nunca tuvo reservas).
+    Devuelve una matriz actividades x parámetros.
+    """
+    XtWX = np.einsum('ta,tp,tq->apq', W, X, X)
+    XtWY = np.einsum('ta,tp,ta->ap', W, X, Y)
+    return np.einsum('apq,aq->ap', np.linalg.pinv(XtWX), XtWY)
+
+def ajustar_predicciones(meses, valores, activos, horizonte=HORIZONTE_PREDICCION, estacional=True):
+    """Predicción de los próximos `horizonte` meses para todas las actividades.
+
+    Devuelve (futuro, predicciones, modelo): fechas futuras, matriz horizonte x
+    actividades (NaN si no hay historial suficiente, nunca negativa) y el
+    modelo usado por actividad ('Estacional', 'Lineal' o '').
+    """
+    n_meses, n_actividades = valores.shape
+    futuro = pd.date_range(meses[-1] + pd.DateOffset(months=1), periods=horizonte, freq='MS') \
+        if n_meses else pd.DatetimeIndex([])
+    if not n_meses or not n_actividades:
+        return futuro, np.zeros((horizonte, n_actividades)), np.array([], dtype=object)
+
+    posiciones = np.arange(n_meses + horizonte)
+    mes_calendario = np.concatenate([meses.month, futuro.month])
+    W = activos.astype(float)
+    n_activos = activos.sum(axis=0)
+
+    X = diseño(posiciones, mes_calendario, estacional=False)
+    predicciones = X[n_meses:] @ minimos_cuadrados(X[:n_meses], valores, W).T
+    modelo = np.where(n_activos >= MIN_MESES_LINEAL, 'Lineal', '').astype(object)
+
+    usar_estacional = n_activos >= MIN_MESES_ESTACIONAL
+    if estacional and usar_estacional.any():
+        X = diseño(posiciones, mes_calendario, estacional=True)
+        coeficientes = minimos_cuadrados(X[:n_meses], valores[:, usar_estacional], W[:, usar_estacional])
+        predicciones[:, usar_estacional] = X[n_meses:] @ coeficientes.T
+        modelo[usar_estacional] = 'Estacional'
+
+    predicciones = np.clip(predicciones, 0, None)
+    predicciones[:, n_activos < MIN_MESES_LINEAL] = np.nan
+    return futuro, predicciones, modelo
+
+class PrediccionesMensuales:
+    """Historial mensual y predicciones de ingresos de todas las actividades"""
+
+    def __init__(self, df, horizonte=HORIZONTE_PREDICCION):
+        self.meses, self.actividades, self.valores, self.activos = matriz_mensual(df)
+        self.futuro, self.predicciones, self.modelos = ajustar_predicciones(
+            self.meses, self.valores, self.activos, horizonte
+        )
+
+    @property
+    def vacio(self):
+        return len(self.actividades) == 0
+
+    def historico(self, actividad):
+        """Ingresos mensuales de la actividad desde su primer mes (Serie indexada por mes)"""
+        j = self.actividades.get_loc(actividad)
+        activos = self.activos[:, j]
+        return pd.Series(self.valores[activos, j], index=self.meses[activos], name='Precio')
+
+    def prediccion(self, actividad):
+        """(Serie con los próximos meses, modelo usado); Serie vacía si no hay historial suficiente"""
+        j = self.actividades.get_loc(actividad)
+        if not self.modelos[j]:
+            return pd.Series(dtype=float, name='Precio'), ''
+        return pd.Series(self.predicciones[:, j], index=self.futuro, name='Precio'), self.modelos[j]
+
+# Una entrada por versión y combinación de filtros de Reportes en uso
+@cache_medida(st.cache_resource(max_entries=8))
+def _predicciones_por_version(version, _df):
+    return PrediccionesMensuales(_df)
+
+def obtener_predicciones(df):
+    """Predicciones de todas las actividades, ajustadas una vez por versión de datos"""
+    version = df.attrs.get('version')
+    if version is None:
+        return PrediccionesMensuales(df)
+    return _predicciones_por_version(version, df)
@@ -0,0 +1,225 @@
+# functions/rendimiento.py
+# Medición ligera de tiempos (tramos) y de aciertos de caché, compartida por
+# todas las sesiones del proceso. Se consulta en la página Rendimiento.
+
+import functools
+import json
+import threading
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Duraciones guardadas por tramo para los percentiles (las últimas)
+MUESTRAS_POR_TRAMO = 2000
+
+# Cuantiles exportados (p50 y p95)
+CUANTILES = (0.5, 0.95)
+
+def _activo_por_defecto():
+    try:
+        return bool(st.secrets.get("rendimiento", {}).get("activo", False))
+    except FileNotFoundError:
+        return False
+
+_activo = _activo_por_defecto()
+
+class _Registro:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.muestras = {}
+        self.totales = {}
+        self.caches = {}
+        self.desde = time.time()
+
+    def anotar(self, nombre, segundos):
+        with self.lock:
+            muestras = self.muestras.get(nombre)
+            if muestras is None:
+                muestras = self.muestras[nombre] = deque(maxlen=MUESTRAS_POR_TRAMO)
+                self.totales[nombre] = [0, 0.0]
+            muestras.append(segundos)
+            total = self.totales[nombre]
+            total[0] += 1
+            total[1] += segundos
+
+    def anotar_cache(self, nombre, acierto):
+        with self.lock:
+            contadores = self.caches.setdefault(nombre, [0, 0])
+            contadores[0 if acierto else 1] += 1
+
+    def copia(self):
+        with self.lock:
+            return ({n: np.fromiter(m, dtype=float) for n, m in self.muestras.items()},
+                    {n: tuple(t) for n, t in self.totales.items()},
+                    {n: tuple(c) for n, c in self.caches.items()})
+
+_REGISTRO = _Registro()
+
+def activo():
+    return _activo
+
+def activar(valor=True):
+    """Activa o desactiva la medición en todo el proceso"""
+    global _activo
+    _activo = bool(valor)
+
+def reiniciar():
+    global _REGISTRO
+    _REGISTRO = _Registro()
+
+class _Tramo:
+    __slots__ = ("nombre", "inicio")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _REGISTRO.anotar(self.nombre, time.perf_counter() - self.inicio)
+
+class _TramoNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+_NULO = _TramoNulo()
+
+def tramo(nombre):
+    """Context manager que mide lo que tarda el bloque; sin medición no hace nada"""
+    return _Tramo(nombre) if _activo else _NULO
+
+def _nombre_de(funcion):
+    return f"{funcion.__module__.rsplit('.', 1)[-1]}.{funcion.__name__}"
+
+def medido(nombre=None):
+    """Decorador: mide cada llamada a la función como un tramo (por defecto 'módulo.función')"""
+    def decorar(funcion):
+        etiqueta = nombre or _nombre_de(funcion)
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _activo:
+                return funcion(*args, **kwargs)
+            with _Tramo(etiqueta):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorar
+
+def anotar_cache(nombre, acierto):
+    """Anota un acierto o un fallo de una caché propia (p. ej. la de gráficos)"""
+    if _activo:
+        _REGISTRO.anotar_cache(nombre, acierto)
+
+def cache_medida(cache, nombre=None):
+    """Aplica un decorador de caché de Streamlit contando aciertos y fallos.
+
+    El cuerpo de la función solo se ejecuta en los fallos, así que se anota
+    ahí (y se mide como tramo 'cache.<nombre>'); cada llamada que no lo
+    ejecuta es un acierto. Uso: @cache_medida(st.cache_data(ttl=300))
+    """
+    def decorar(funcion):
+        etiqueta = nombre or _nombre_de(funcion)
+        local = threading.local()
+
+        @functools.wraps(funcion)
+        def calcular(*args, **kwargs):
+            local.fallo = True
+            if not _activo:
+                return funcion(*args, **kwargs)
+            with _Tramo(f"cache.{etiqueta}"):
+                return funcion(*args, **kwargs)
+
+        cacheada = cache(calcular)
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _activo:
+                return cacheada(*args, **kwargs)
+            local.fallo = False
+            resultado = cacheada(*args, **kwargs)
+            _REGISTRO.anotar_cache(etiqueta, not local.fallo)
+            return resultado
+        envoltura.clear = cacheada.clear
+        return envoltura
+    return decorar
+
+# ------------------- RESÚMENES Y EXPORTACIÓN -------------------
+
+def resumen_tramos():
+    """Una fila por tramo: llamadas, p50, p95, media y máximo (ms) y tiempo total (s)"""
+    muestras, totales, _ = _REGISTRO.copia()
+    filas = []
+    for nombre, valores in muestras.items():
+        if not len(valores):
+            continue
+        p50, p95 = np.quantile(valores, CUANTILES) * 1000
+        llamadas, total = totales[nombre]
+        filas.append({"Tramo": nombre, "Llamadas": llamadas, "p50 (ms)": p50, "p95 (ms)": p95,
+                      "Media (ms)": total / llamadas * 1000, "Máx (ms)": valores.max() * 1000,
+                      "Total (s)": total})
+    columnas = ["Tramo", "Llamadas", "p50 (ms)", "p95 (ms)", "Media (ms)", "Máx (ms)", "Total (s)"]
+    return pd.DataFrame(filas, columns=columnas).sort_values("Total (s)", ascending=False, ignore_index=True)
+
+def resumen_caches():
+    """Una fila por caché: aciertos, fallos y tasa de aciertos"""
+    _, _, caches = _REGISTRO.copia()
+    filas = [{"Caché": nombre, "Aciertos": aciertos, "Fallos": fallos,
+              "Aciertos (%)": 100 * aciertos / (aciertos + fallos)}
+             for nombre, (aciertos, fallos) in caches.items() if aciertos + fallos]
+    return pd.DataFrame(filas, columns=["Caché", "Aciertos", "Fallos", "Aciertos (%)"]).sort_values(
+        "Caché", ignore_index=True)
+
+def exportar_jsonl():
+    """Resumen como JSON lines: un objeto por tramo y otro por caché"""
+    lineas = []
+    for fila in resumen_tramos().to_dict("records"):
+        lineas.append({"tipo": "tramo", "nombre": fila["Tramo"], "llamadas": int(fila["Llamadas"]),
+                       "p50_ms": round(fila["p50 (ms)"], 3), "p95_ms": round(fila["p95 (ms)"], 3),
+                       "media_ms": round(fila["Media (ms)"], 3), "max_ms": round(fila["Máx (ms)"], 3),
+                       "total_s": round(fila["Total (s)"], 6)})
+    for fila in resumen_caches().to_dict("records"):
+        lineas.append({"tipo": "cache", "nombre": fila["Caché"], "aciertos": int(fila["Aciertos"]),
+                       "fallos": int(fila["Fallos"])})
+    return "".join(json.dumps(linea, ensure_ascii=False) + "\n" for linea in lineas)
+
+def _etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def exportar_prometheus():
+    """Resumen en el formato de texto de Prometheus (summary por tramo y contadores de caché)"""
+    muestras, totales, caches = _REGISTRO.copia()
+    lineas = [
+        "# HELP ubuntu_tramo_segundos Duración de los tramos medidos.",
+        "# TYPE ubuntu_tramo_segundos summary",
+    ]
+    for nombre, valores in sorted(muestras.items()):
+        if not len(valores):
+            continue
+        etiqueta = _etiqueta(nombre)
+        for cuantil, valor in zip(CUANTILES, np.quantile(valores, CUANTILES)):
+            lineas.append(f'ubuntu_tramo_segundos{{tramo="{etiqueta}",quantile="{cuantil}"}} {valor:.6f}')
+        llamadas, total = totales[nombre]
+        lineas.append(f'ubuntu_tramo_segundos_sum{{tramo="{etiqueta}"}} {total:.6f}')
+        lineas.append(f'ubuntu_tramo_segundos_count{{tramo="{etiqueta}"}} {llamadas}')
+    lineas += [
+        "# HELP ubuntu_cache_total Consultas a cada caché por resultado.",
+        "# TYPE ubuntu_cache_total counter",
+    ]
+    for nombre, (aciertos, fallos) in sorted(caches.items()):
+        etiqueta = _etiqueta(nombre)
+        lineas.append(f'ubuntu_cache_total{{cache="{etiqueta}",resultado="acierto"}} {aciertos}')
+        lineas.append(f'ubuntu_cache_total{{cache="{etiqueta}",resultado="fallo"}} {fallos}')
+    return "\n".join(lineas) + "\n"
+
+def inicio_medicion():
+    """Momento (epoch) desde el que se acumulan las métricas actuales"""
+    return _REGISTRO.desde
@@ -4,9 +4,20 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import threading
+import time
 from datetime import datetime
-from functions.data_utils import cargar_clientes
-from sklearn.linear_model import LinearRegression
+from functions.data_utils import cargar_clientes, suscribir_cliente_guardado
+from functions.graficos import (
+    mostrar_grafico, barras, lineas, mapa_calor, circular, cajas, estadisticos_cajas, combinar,
+)
+from functions.cubo import obtener_cubo, validar_origen, incorporar_clientes, huella_fila
+from functions.predicciones import obtener_predicciones
+from functions.informe_estatico import cargar_ultimo_informe, mostrar_informe
+from functions.tabla_paginada import mostrar_tabla_paginada
+from functions.filtros import barra_filtros, filtrar_clientes
+from functions.rendimiento import medido, cache_medida
+from functions.enlace import obtener_dataset_enlazado, acotar_a_clientes
 
 # ------------------- CONSTANTES Y CONFIG -------------------
 EDAD_BINS   = [0, 18, 30, 45, 60, 120]
@@ -18,6 +29,7 @@ DOW_ORDER   = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday
 #  PRE‑PROCESAMIENTO
 # ===========================================================
 
+@medido()
 def procesar_datos_clientes(df: pd.DataFrame) -> pd.DataFrame:
     """Limpia, tipa y enriquece el dataframe de clientes para los reportes.
 
@@ -69,10 +81,64 @@ def procesar_datos_clientes(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+@st.cache_resource
+def _almacen_clientes_procesados():
+    """Dataframe de clientes procesado, compartido (solo lectura) entre sesiones"""
+    return {"version": None, "df": None, "lock": threading.Lock()}
+
+
+def obtener_clientes_procesados(clientes_raw: pd.DataFrame) -> pd.DataFrame:
+    """Devuelve los clientes procesados, recalculando solo si cambia la versión de los datos.
+
+    El resultado se comparte entre sesiones: no debe modificarse in situ. Su
+    índice es la posición de cada cliente en la hoja y attrs lleva cuántas
+    filas de la hoja cubre y la huella de la última (para el cubo incremental).
+    """
+    almacen = _almacen_clientes_procesados()
+    version = clientes_raw.attrs.get('version')
+    with almacen["lock"]:
+        if almacen["df"] is None or almacen["version"] != version:
+            validar_origen(clientes_raw)
+            df = procesar_datos_clientes(clientes_raw)
+            df.attrs['version'] = version
+            df.attrs['filas_origen'] = len(clientes_raw)
+            df.attrs['huella'] = huella_fila(clientes_raw.iloc[-1]) if len(clientes_raw) else None
+            almacen["df"] = df
+            almacen["version"] = version
+        return almacen["df"]
+
+
+@suscribir_cliente_guardado
+def anadir_cliente_procesado(registro: dict) -> None:
+    """Incorpora un cliente recién guardado al dataframe procesado y al cubo sin reprocesar el resto."""
+    nuevo = procesar_datos_clientes(pd.DataFrame([registro]))
+    huella = huella_fila(registro)
+    incorporar_clientes(nuevo, 1, huella)
+
+    almacen = _almacen_clientes_procesados()
+    with almacen["lock"]:
+        if almacen["df"] is None:
+            return
+        filas_origen = almacen["df"].attrs.get('filas_origen', len(almacen["df"]))
+        nuevo.index = pd.RangeIndex(filas_origen, filas_origen + len(nuevo))
+        if nuevo.empty:
+            df = almacen["df"].copy(deep=False)
+        elif almacen["df"].empty:
+            df = nuevo
+        else:
+            df = pd.concat([almacen["df"], nuevo])
+        # Nueva versión del procesado para invalidar las secciones cacheadas
+        df.attrs['version'] = time.time_ns()
+        df.attrs['filas_origen'] = filas_origen + 1
+        df.attrs['huella'] = huella
+        almacen["df"] = df
+
+
 # ===========================================================
 #  NUEVOS ANÁLISIS SOLICITADOS
 # ===========================================================
 
+@medido()
 def analizar_actividades_por_procedencia_edad(df: pd.DataFrame) -> None:
     """Analiza qué actividades se realizan más por procedencia y edad."""
     if df.empty:
@@ -80,66 +146,77 @@ def analizar_actividades_por_procedencia_edad(df: pd.DataFrame) -> None:
         return
 
     st.header("🌍 Actividades por Procedencia y Edad")
+    cubo = obtener_cubo(df)
     
     # Análisis por procedencia (ciudad)
     st.subheader("Actividades más populares por Ciudad")
-    actividades_ciudad = df.groupby(['Ciudad', 'Actividad']).size().reset_index(name='Cantidad')
+    actividades_ciudad = cubo.agregar(['Ciudad', 'Actividad'])['Filas'].reset_index(name='Cantidad')
     
     # Top 5 ciudades por volumen de actividades
-    top_ciudades = df['Ciudad'].value_counts().head(5).index
+    top_ciudades = cubo.conteo('Ciudad').head(5).index
+    top_por_ciudad = {
+        ciudad: actividades_ciudad[actividades_ciudad['Ciudad'] == ciudad].nlargest(5, 'Cantidad')
+        for ciudad in top_ciudades
+    }
+
+    # Heatmap general
+    pivot_ciudad = cubo.tabla('Ciudad', 'Actividad')
+    top_actividades = cubo.conteo('Actividad').head(10).index
+    pivot_ciudad_top = pivot_ciudad[top_actividades].head(10)
     
-    fig, axes = plt.subplots(2, 3, figsize=(18, 12))
-    axes = axes.flatten()
+    def dibujar():
+        fig, axes = plt.subplots(2, 3, figsize=(18, 12))
+        axes = axes.flatten()
     
-    for i, ciudad in enumerate(top_ciudades):
-        if i < 5:
-            ciudad_data = actividades_ciudad[actividades_ciudad['Ciudad'] == ciudad].nlargest(5, 'Cantidad')
+        for i, (ciudad, ciudad_data) in enumerate(top_por_ciudad.items()):
             if not ciudad_data.empty:
                 axes[i].bar(ciudad_data['Actividad'], ciudad_data['Cantidad'])
                 axes[i].set_title(f'Top Actividades en {ciudad}')
                 axes[i].tick_params(axis='x', rotation=45)
     
-    # Heatmap general
-    pivot_ciudad = df.groupby(['Ciudad', 'Actividad']).size().unstack(fill_value=0)
-    top_actividades = df['Actividad'].value_counts().head(10).index
-    pivot_ciudad_top = pivot_ciudad[top_actividades].head(10)
-    
-    axes[5].imshow(pivot_ciudad_top.values, cmap='YlOrRd', aspect='auto')
-    axes[5].set_title('Heatmap: Ciudades vs Actividades')
-    axes[5].set_xticks(range(len(top_actividades)))
-    axes[5].set_xticklabels(top_actividades, rotation=45)
-    axes[5].set_yticks(range(len(pivot_ciudad_top.index)))
-    axes[5].set_yticklabels(pivot_ciudad_top.index)
+        axes[5].imshow(pivot_ciudad_top.values, cmap='YlOrRd', aspect='auto')
+        axes[5].set_title('Heatmap: Ciudades vs Actividades')
+        axes[5].set_xticks(range(len(top_actividades)))
+        axes[5].set_xticklabels(top_actividades, rotation=45)
+        axes[5].set_yticks(range(len(pivot_ciudad_top.index)))
+        axes[5].set_yticklabels(pivot_ciudad_top.index)
     
-    plt.tight_layout()
-    st.pyplot(fig)
+        plt.tight_layout()
+        return fig
+    vega = combinar(
+        barras(pd.concat(top_por_ciudad.values()), 'Actividad', 'Cantidad', facetas='Ciudad',
+               titulo='Top Actividades por Ciudad'),
+        mapa_calor(pivot_ciudad_top, 'Heatmap: Ciudades vs Actividades', esquema='yelloworangered', anotar=False),
+    )
+    mostrar_grafico("procedencia_top_ciudades", df, dibujar, vega=vega)
     
     # Análisis por grupo de edad
     st.subheader("Actividades más populares por Grupo de Edad")
-    actividades_edad = df.groupby(['Grupo Edad', 'Actividad']).size().reset_index(name='Cantidad')
     
-    fig, ax = plt.subplots(figsize=(12, 8))
-    pivot_edad = df.groupby(['Grupo Edad', 'Actividad']).size().unstack(fill_value=0)
-    top_actividades_edad = df['Actividad'].value_counts().head(8).index
+    pivot_edad = cubo.tabla('Grupo Edad', 'Actividad')
+    top_actividades_edad = cubo.conteo('Actividad').head(8).index
     pivot_edad_top = pivot_edad[top_actividades_edad]
-    
-    sns.heatmap(pivot_edad_top, annot=True, fmt='d', cmap='Blues', ax=ax)
-    ax.set_title('Heatmap: Actividades por Grupo de Edad')
-    ax.set_xlabel('Actividad')
-    ax.set_ylabel('Grupo de Edad')
-    st.pyplot(fig)
+
+    def dibujar():
+        fig, ax = plt.subplots(figsize=(12, 8))
+        sns.heatmap(pivot_edad_top, annot=True, fmt='d', cmap='Blues', ax=ax)
+        ax.set_title('Heatmap: Actividades por Grupo de Edad')
+        ax.set_xlabel('Actividad')
+        ax.set_ylabel('Grupo de Edad')
+        return fig
+    vega = mapa_calor(pivot_edad_top, 'Heatmap: Actividades por Grupo de Edad',
+                      eje_x='Actividad', eje_y='Grupo de Edad', esquema='blues')
+    mostrar_grafico("procedencia_heatmap_edad", df, dibujar, vega=vega)
     
     # Tabla resumen
     st.subheader("Resumen por Procedencia y Edad")
-    resumen = df.groupby(['Ciudad', 'Grupo Edad', 'Actividad']).agg({
-        'ID': 'count',
-        'Precio': 'sum'
-    }).rename(columns={'ID': 'Reservas', 'Precio': 'Ingresos'}).reset_index()
+    resumen = cubo.agregar(['Ciudad', 'Grupo Edad', 'Actividad'], ['Reservas', 'Ingresos']).reset_index()
     
     resumen_top = resumen.nlargest(20, 'Reservas')
     st.dataframe(resumen_top)
 
 
+@medido()
 def analizar_dias_semana_actividades(df: pd.DataFrame) -> None:
     """Analiza qué día de la semana se realizan más actividades."""
     if df.empty:
@@ -147,61 +224,77 @@ def analizar_dias_semana_actividades(df: pd.DataFrame) -> None:
         return
 
     st.header("📅 Análisis de Días de la Semana")
+    cubo = obtener_cubo(df)
+    por_dia = cubo.agregar(['Día de la Semana']).reindex(DOW_ORDER)
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Actividades por Día de la Semana")
-        actividades_dow = df.groupby('Día de la Semana').size().reindex(DOW_ORDER)
+        actividades_dow = por_dia['Filas']
+        max_idx = actividades_dow.values.argmax()
         
-        fig, ax = plt.subplots(figsize=(10, 6))
-        bars = ax.bar(actividades_dow.index, actividades_dow.values, color='skyblue')
-        ax.set_title('Número de Actividades por Día de la Semana')
-        ax.set_xlabel('Día de la Semana')
-        ax.set_ylabel('Número de Actividades')
+        def dibujar():
+            fig, ax = plt.subplots(figsize=(10, 6))
+            bars = ax.bar(actividades_dow.index, actividades_dow.values, color='skyblue')
+            ax.set_title('Número de Actividades por Día de la Semana')
+            ax.set_xlabel('Día de la Semana')
+            ax.set_ylabel('Número de Actividades')
         
-        # Destacar el día con más actividades
-        max_idx = actividades_dow.values.argmax()
-        bars[max_idx].set_color('orange')
+            # Destacar el día con más actividades
+            bars[max_idx].set_color('orange')
         
-        plt.xticks(rotation=45)
-        st.pyplot(fig)
+            plt.xticks(rotation=45)
+            return fig
+        dia_mas_activo = actividades_dow.index[max_idx]
+        vega = barras(actividades_dow.rename('Actividades').reset_index(), 'Día de la Semana', 'Actividades',
+                      'Número de Actividades por Día de la Semana', eje_y='Número de Actividades',
+                      orden=DOW_ORDER, color_fijo='skyblue', destacar=dia_mas_activo, color_destacado='orange')
+        mostrar_grafico("dias_actividades", df, dibujar, vega=vega)
         
         # Mostrar estadísticas
-        dia_mas_activo = actividades_dow.index[max_idx]
         st.metric("Día más activo", dia_mas_activo, f"{actividades_dow.values[max_idx]} actividades")
     
     with col2:
         st.subheader("Ingresos por Día de la Semana")
-        ingresos_dow = df.groupby('Día de la Semana')['Precio'].sum().reindex(DOW_ORDER)
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        bars = ax.bar(ingresos_dow.index, ingresos_dow.values, color='lightgreen')
-        ax.set_title('Ingresos por Día de la Semana')
-        ax.set_xlabel('Día de la Semana')
-        ax.set_ylabel('Ingresos (€)')
-        
-        # Destacar el día con más ingresos
+        ingresos_dow = por_dia['Ingresos']
         max_idx = ingresos_dow.values.argmax()
-        bars[max_idx].set_color('darkgreen')
         
-        plt.xticks(rotation=45)
-        st.pyplot(fig)
+        def dibujar():
+            fig, ax = plt.subplots(figsize=(10, 6))
+            bars = ax.bar(ingresos_dow.index, ingresos_dow.values, color='lightgreen')
+            ax.set_title('Ingresos por Día de la Semana')
+            ax.set_xlabel('Día de la Semana')
+            ax.set_ylabel('Ingresos (€)')
+        
+            # Destacar el día con más ingresos
+            bars[max_idx].set_color('darkgreen')
         
+            plt.xticks(rotation=45)
+            return fig
         dia_mas_rentable = ingresos_dow.index[max_idx]
+        vega = barras(ingresos_dow.reset_index(), 'Día de la Semana', 'Ingresos',
+                      'Ingresos por Día de la Semana', eje_y='Ingresos (€)', orden=DOW_ORDER,
+                      color_fijo='lightgreen', destacar=dia_mas_rentable, color_destacado='darkgreen')
+        mostrar_grafico("dias_ingresos", df, dibujar, vega=vega)
+        
         st.metric("Día más rentable", dia_mas_rentable, f"{ingresos_dow.values[max_idx]:.2f} €")
     
     # Análisis detallado por actividad y día
     st.subheader("Actividades Específicas por Día")
-    actividad_dia = df.groupby(['Actividad', 'Día de la Semana']).size().unstack(fill_value=0)
-    actividad_dia_top = actividad_dia.loc[df['Actividad'].value_counts().head(5).index]
+    actividad_dia = cubo.tabla('Actividad', 'Día de la Semana')
+    actividad_dia_top = actividad_dia.loc[cubo.conteo('Actividad').head(5).index]
     
-    fig, ax = plt.subplots(figsize=(12, 6))
-    sns.heatmap(actividad_dia_top, annot=True, fmt='d', cmap='YlOrRd', ax=ax)
-    ax.set_title('Heatmap: Actividades por Día de la Semana')
-    st.pyplot(fig)
+    def dibujar():
+        fig, ax = plt.subplots(figsize=(12, 6))
+        sns.heatmap(actividad_dia_top, annot=True, fmt='d', cmap='YlOrRd', ax=ax)
+        ax.set_title('Heatmap: Actividades por Día de la Semana')
+        return fig
+    vega = mapa_calor(actividad_dia_top, 'Heatmap: Actividades por Día de la Semana', esquema='yelloworangered')
+    mostrar_grafico("dias_heatmap_actividades", df, dibujar, vega=vega)
 
 
+@medido()
 def analizar_ingresos_mensuales_comparativa(df: pd.DataFrame) -> None:
     """Analiza ingresos por mes y comparativa con otros años."""
     if df.empty:
@@ -210,11 +303,14 @@ def analizar_ingresos_mensuales_comparativa(df: pd.DataFrame) -> None:
 
     st.header("💰 Ingresos Mensuales y Comparativa Anual")
     
+    cubo = obtener_cubo(df)
+    
     # Preparar datos mensuales
-    ingresos_mensuales = df.groupby(['Año', 'Mes']).agg({
-        'Precio': 'sum',
-        'ID': 'count'
-    }).rename(columns={'ID': 'Reservas'}).reset_index()
+    ingresos_mensuales = (
+        cubo.agregar(['Año', 'Mes'], ['Ingresos', 'Reservas'])
+            .rename(columns={'Ingresos': 'Precio'})
+            .reset_index()
+    )
     
     # Crear columna de fecha para facilitar visualización
     ingresos_mensuales['Fecha'] = pd.to_datetime(
@@ -226,37 +322,45 @@ def analizar_ingresos_mensuales_comparativa(df: pd.DataFrame) -> None:
     
     with col1:
         st.subheader("Evolución de Ingresos Mensuales")
-        fig, ax = plt.subplots(figsize=(12, 6))
+        def dibujar():
+            fig, ax = plt.subplots(figsize=(12, 6))
         
-        # Línea por año
-        años = sorted(ingresos_mensuales['Año'].unique())
-        for año in años:
-            data_año = ingresos_mensuales[ingresos_mensuales['Año'] == año]
-            ax.plot(data_año['Mes'], data_año['Precio'], marker='o', label=f'{año}')
+            # Línea por año
+            años = sorted(ingresos_mensuales['Año'].unique())
+            for año in años:
+                data_año = ingresos_mensuales[ingresos_mensuales['Año'] == año]
+                ax.plot(data_año['Mes'], data_año['Precio'], marker='o', label=f'{año}')
         
-        ax.set_title('Ingresos Mensuales por Año')
-        ax.set_xlabel('Mes')
-        ax.set_ylabel('Ingresos (€)')
-        ax.legend()
-        ax.grid(True, alpha=0.3)
-        st.pyplot(fig)
+            ax.set_title('Ingresos Mensuales por Año')
+            ax.set_xlabel('Mes')
+            ax.set_ylabel('Ingresos (€)')
+            ax.legend()
+            ax.grid(True, alpha=0.3)
+            return fig
+        vega = lineas(ingresos_mensuales, 'Mes', 'Precio', 'Ingresos Mensuales por Año',
+                      eje_y='Ingresos (€)', color='Año', tipo_x='ordinal')
+        mostrar_grafico("mensual_evolucion", df, dibujar, vega=vega)
     
     with col2:
         st.subheader("Comparativa Anual")
-        ingresos_anuales = df.groupby('Año')['Precio'].sum()
-        
-        fig, ax = plt.subplots(figsize=(8, 6))
-        bars = ax.bar(ingresos_anuales.index, ingresos_anuales.values, color='lightblue')
-        ax.set_title('Ingresos Totales por Año')
-        ax.set_xlabel('Año')
-        ax.set_ylabel('Ingresos (€)')
+        ingresos_anuales = cubo.agregar(['Año'], ['Ingresos'])['Ingresos']
         
-        # Destacar el mejor año
-        if len(ingresos_anuales) > 1:
-            max_idx = ingresos_anuales.values.argmax()
-            bars[max_idx].set_color('gold')
+        def dibujar():
+            fig, ax = plt.subplots(figsize=(8, 6))
+            bars = ax.bar(ingresos_anuales.index, ingresos_anuales.values, color='lightblue')
+            ax.set_title('Ingresos Totales por Año')
+            ax.set_xlabel('Año')
+            ax.set_ylabel('Ingresos (€)')
         
-        st.pyplot(fig)
+            # Destacar el mejor año
+            if len(ingresos_anuales) > 1:
+                max_idx = ingresos_anuales.values.argmax()
+                bars[max_idx].set_color('gold')
+            return fig
+        mejor_año = ingresos_anuales.idxmax() if len(ingresos_anuales) > 1 else None
+        vega = barras(ingresos_anuales.reset_index(), 'Año', 'Ingresos', 'Ingresos Totales por Año',
+                      eje_y='Ingresos (€)', color_fijo='lightblue', destacar=mejor_año, color_destacado='gold')
+        mostrar_grafico("mensual_anual", df, dibujar, vega=vega)
         
         # Mostrar crecimiento año a año
         if len(ingresos_anuales) > 1:
@@ -269,29 +373,38 @@ def analizar_ingresos_mensuales_comparativa(df: pd.DataFrame) -> None:
     
     # Análisis estacional
     st.subheader("Análisis Estacional")
-    estacional = df.groupby('Mes').agg({
-        'Precio': ['sum', 'mean'],
-        'ID': 'count'
+    por_mes = cubo.agregar(['Mes'])
+    estacional = pd.DataFrame({
+        'Ingresos Totales': por_mes['Ingresos'],
+        'Ingresos Promedio': por_mes['Ingresos'] / por_mes['N Precio'],
+        'Reservas': por_mes['Reservas']
     }).round(2)
     
-    estacional.columns = ['Ingresos Totales', 'Ingresos Promedio', 'Reservas']
-    
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+    def dibujar():
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
     
-    # Ingresos por mes (promedio entre años)
-    ax1.bar(estacional.index, estacional['Ingresos Totales'], color='lightcoral')
-    ax1.set_title('Ingresos Totales por Mes (Todos los Años)')
-    ax1.set_xlabel('Mes')
-    ax1.set_ylabel('Ingresos (€)')
+        # Ingresos por mes (promedio entre años)
+        ax1.bar(estacional.index, estacional['Ingresos Totales'], color='lightcoral')
+        ax1.set_title('Ingresos Totales por Mes (Todos los Años)')
+        ax1.set_xlabel('Mes')
+        ax1.set_ylabel('Ingresos (€)')
     
-    # Reservas por mes
-    ax2.bar(estacional.index, estacional['Reservas'], color='lightsteelblue')
-    ax2.set_title('Número de Reservas por Mes')
-    ax2.set_xlabel('Mes')
-    ax2.set_ylabel('Reservas')
+        # Reservas por mes
+        ax2.bar(estacional.index, estacional['Reservas'], color='lightsteelblue')
+        ax2.set_title('Número de Reservas por Mes')
+        ax2.set_xlabel('Mes')
+        ax2.set_ylabel('Reservas')
     
-    plt.tight_layout()
-    st.pyplot(fig)
+        plt.tight_layout()
+        return fig
+    por_mes_datos = estacional.rename_axis('Mes').reset_index()
+    vega = combinar(
+        barras(por_mes_datos, 'Mes', 'Ingresos Totales', 'Ingresos Totales por Mes (Todos los Años)',
+               eje_y='Ingresos (€)', color_fijo='lightcoral'),
+        barras(por_mes_datos, 'Mes', 'Reservas', 'Número de Reservas por Mes', color_fijo='lightsteelblue'),
+        columnas=2,
+    )
+    mostrar_grafico("mensual_estacional", df, dibujar, vega=vega)
     
     # Tabla resumen
     st.subheader("Resumen Mensual")
@@ -301,6 +414,7 @@ def analizar_ingresos_mensuales_comparativa(df: pd.DataFrame) -> None:
     st.dataframe(estacional[['Mes', 'Ingresos Totales', 'Ingresos Promedio', 'Reservas']])
 
 
+@medido()
 def analizar_actividades_por_sexo(df: pd.DataFrame) -> None:
     """Analiza actividades por sexo."""
     if df.empty:
@@ -308,196 +422,251 @@ def analizar_actividades_por_sexo(df: pd.DataFrame) -> None:
         return
 
     st.header("⚧ Actividades por Sexo")
+    cubo = obtener_cubo(df)
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Distribución General por Sexo")
-        sexo_counts = df['Sexo'].value_counts()
+        sexo_counts = cubo.conteo('Sexo')
         
-        fig, ax = plt.subplots(figsize=(8, 6))
-        colors = ['lightpink', 'lightblue', 'lightgreen']
-        wedges, texts, autotexts = ax.pie(sexo_counts.values, labels=sexo_counts.index, 
-                                         autopct='%1.1f%%', colors=colors[:len(sexo_counts)])
-        ax.set_title('Distribución de Clientes por Sexo')
-        st.pyplot(fig)
+        def dibujar():
+            fig, ax = plt.subplots(figsize=(8, 6))
+            colors = ['lightpink', 'lightblue', 'lightgreen']
+            wedges, texts, autotexts = ax.pie(sexo_counts.values, labels=sexo_counts.index, 
+                                             autopct='%1.1f%%', colors=colors[:len(sexo_counts)])
+            ax.set_title('Distribución de Clientes por Sexo')
+            return fig
+        vega = circular(sexo_counts, 'Distribución de Clientes por Sexo',
+                        colores=['lightpink', 'lightblue', 'lightgreen'][:len(sexo_counts)])
+        mostrar_grafico("sexo_distribucion", df, dibujar, vega=vega)
         
         # Estadísticas por sexo
         st.subheader("Estadísticas por Sexo")
-        stats_sexo = df.groupby('Sexo').agg({
-            'Precio': ['sum', 'mean'],
-            'ID': 'count',
-            'Edad': 'mean'
+        por_sexo = cubo.agregar(['Sexo'])
+        stats_sexo = pd.DataFrame({
+            'Ingresos Totales': por_sexo['Ingresos'],
+            'Gasto Promedio': por_sexo['Ingresos'] / por_sexo['N Precio'],
+            'Reservas': por_sexo['Reservas'],
+            'Edad Promedio': por_sexo['Suma Edad'] / por_sexo['Filas']
         }).round(2)
-        
-        stats_sexo.columns = ['Ingresos Totales', 'Gasto Promedio', 'Reservas', 'Edad Promedio']
         st.dataframe(stats_sexo)
     
     with col2:
         st.subheader("Actividades Favoritas por Sexo")
         
         # Top 3 actividades por cada sexo
-        sexos = df['Sexo'].unique()
-        fig, axes = plt.subplots(len(sexos), 1, figsize=(10, 4*len(sexos)))
-        if len(sexos) == 1:
-            axes = [axes]
+        sexos = cubo.valores('Sexo')
+        actividades_por_sexo = cubo.tabla('Sexo', 'Actividad')
+        top_por_sexo = {
+            sexo: actividades_por_sexo.loc[sexo].sort_values(ascending=False, kind='stable').head(5)
+            for sexo in sexos
+        }
+        def dibujar():
+            fig, axes = plt.subplots(len(sexos), 1, figsize=(10, 4*len(sexos)))
+            if len(sexos) == 1:
+                axes = [axes]
         
-        for i, sexo in enumerate(sexos):
-            sexo_data = df[df['Sexo'] == sexo]
-            top_actividades = sexo_data['Actividad'].value_counts().head(5)
-            
-            axes[i].bar(top_actividades.index, top_actividades.values, 
-                       color='lightpink' if sexo == 'Femenino' else 'lightblue')
-            axes[i].set_title(f'Top Actividades - {sexo}')
-            axes[i].tick_params(axis='x', rotation=45)
+            for i, (sexo, top_actividades) in enumerate(top_por_sexo.items()):
+                axes[i].bar(top_actividades.index, top_actividades.values, 
+                           color='lightpink' if sexo == 'Femenino' else 'lightblue')
+                axes[i].set_title(f'Top Actividades - {sexo}')
+                axes[i].tick_params(axis='x', rotation=45)
         
-        plt.tight_layout()
-        st.pyplot(fig)
+            plt.tight_layout()
+            return fig
+        top_sexo_datos = pd.concat(
+            [top.rename('Reservas').rename_axis('Actividad').reset_index().assign(Sexo=sexo)
+             for sexo, top in top_por_sexo.items()]
+        ) if top_por_sexo else pd.DataFrame(columns=['Actividad', 'Reservas', 'Sexo'])
+        vega = barras(top_sexo_datos, 'Actividad', 'Reservas', 'Top Actividades por Sexo',
+                      facetas='Sexo', columnas=1, color='Sexo')
+        mostrar_grafico("sexo_top_actividades", df, dibujar, vega=vega)
     
     # Análisis cruzado: Actividades por sexo y edad
     st.subheader("Actividades por Sexo y Grupo de Edad")
     
     # Heatmap de actividades por sexo
-    actividades_sexo = df.groupby(['Sexo', 'Actividad']).size().unstack(fill_value=0)
-    top_actividades_sexo = df['Actividad'].value_counts().head(8).index
+    actividades_sexo = cubo.tabla('Sexo', 'Actividad')
+    top_actividades_sexo = cubo.conteo('Actividad').head(8).index
     actividades_sexo_top = actividades_sexo[top_actividades_sexo]
     
-    fig, ax = plt.subplots(figsize=(12, 6))
-    sns.heatmap(actividades_sexo_top, annot=True, fmt='d', cmap='RdYlBu', ax=ax)
-    ax.set_title('Heatmap: Actividades por Sexo')
-    st.pyplot(fig)
+    def dibujar():
+        fig, ax = plt.subplots(figsize=(12, 6))
+        sns.heatmap(actividades_sexo_top, annot=True, fmt='d', cmap='RdYlBu', ax=ax)
+        ax.set_title('Heatmap: Actividades por Sexo')
+        return fig
+    vega = mapa_calor(actividades_sexo_top, 'Heatmap: Actividades por Sexo', esquema='redyellowblue')
+    mostrar_grafico("sexo_heatmap", df, dibujar, vega=vega)
     
     # Análisis por sexo y edad
     st.subheader("Preferencias por Sexo y Edad")
-    sexo_edad_actividad = df.groupby(['Sexo', 'Grupo Edad', 'Actividad']).size().reset_index(name='Cantidad')
-    
-    # Crear gráfico de barras agrupadas
-    fig, ax = plt.subplots(figsize=(14, 8))
+    sexo_edad_actividad = cubo.agregar(['Sexo', 'Grupo Edad', 'Actividad'])['Filas'].reset_index(name='Cantidad')
     
     # Usar solo las top 5 actividades para claridad
-    top_5_actividades = df['Actividad'].value_counts().head(5).index
+    top_5_actividades = cubo.conteo('Actividad').head(5).index
     data_filtered = sexo_edad_actividad[sexo_edad_actividad['Actividad'].isin(top_5_actividades)]
+
+    # Crear gráfico de barras agrupadas
+    def dibujar():
+        fig, ax = plt.subplots(figsize=(14, 8))
+    
+        pivot_data = data_filtered.pivot_table(
+            index=['Sexo', 'Grupo Edad'], 
+            columns='Actividad', 
+            values='Cantidad', 
+            fill_value=0
+        )
     
-    pivot_data = data_filtered.pivot_table(
-        index=['Sexo', 'Grupo Edad'], 
-        columns='Actividad', 
-        values='Cantidad', 
-        fill_value=0
+        pivot_data.plot(kind='bar', ax=ax, width=0.8)
+        ax.set_title('Actividades por Sexo y Grupo de Edad (Top 5)')
+        ax.set_xlabel('Sexo - Grupo de Edad')
+        ax.set_ylabel('Cantidad de Reservas')
+        ax.legend(title='Actividad', bbox_to_anchor=(1.05, 1), loc='upper left')
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+        return fig
+    barras_datos = data_filtered.assign(
+        Grupo=data_filtered['Sexo'].astype(str) + ' - ' + data_filtered['Grupo Edad'].astype(str)
     )
-    
-    pivot_data.plot(kind='bar', ax=ax, width=0.8)
-    ax.set_title('Actividades por Sexo y Grupo de Edad (Top 5)')
-    ax.set_xlabel('Sexo - Grupo de Edad')
-    ax.set_ylabel('Cantidad de Reservas')
-    ax.legend(title='Actividad', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    st.pyplot(fig)
+    vega = barras(barras_datos, 'Grupo', 'Cantidad', 'Actividades por Sexo y Grupo de Edad (Top 5)',
+                  eje_x='Sexo - Grupo de Edad', eje_y='Cantidad de Reservas',
+                  orden=sorted(barras_datos['Grupo'].unique()), color='Actividad', agrupar=True)
+    mostrar_grafico("sexo_edad_barras", df, dibujar, vega=vega)
 
 
 # ===========================================================
 #  VISUALIZACIONES TEMPORALES (ORIGINAL)
 # ===========================================================
 
+@medido()
 def generar_graficos_temporales(df: pd.DataFrame) -> None:
     if df.empty:
         st.warning("No hay datos para generar gráficos temporales")
         return
 
+    cubo = obtener_cubo(df)
     col1, col2 = st.columns(2)
 
     # ---------- Reservas por mes ----------
     with col1:
         st.subheader("Reservas por Mes")
-        reservas_por_mes = (
-            df.groupby(['Año', 'Mes'])
-              .size()
-              .reset_index(name='Reservas')
-        )
+        reservas_por_mes = cubo.agregar(['Año', 'Mes'])['Filas'].reset_index(name='Reservas')
         reservas_por_mes['Fecha'] = pd.to_datetime(
             reservas_por_mes['Año'].astype(str) + '-' + reservas_por_mes['Mes'].astype(str) + '-01'
         )
-        fig, ax = plt.subplots()
-        sns.lineplot(data=reservas_por_mes, x='Fecha', y='Reservas', ax=ax)
-        ax.set(title='Reservas por Mes', xlabel='Fecha', ylabel='Número de Reservas')
-        plt.xticks(rotation=45)
-        st.pyplot(fig)
+        def dibujar():
+            fig, ax = plt.subplots()
+            sns.lineplot(data=reservas_por_mes, x='Fecha', y='Reservas', ax=ax)
+            ax.set(title='Reservas por Mes', xlabel='Fecha', ylabel='Número de Reservas')
+            plt.xticks(rotation=45)
+            return fig
+        vega = lineas(reservas_por_mes, 'Fecha', 'Reservas', 'Reservas por Mes',
+                      eje_y='Número de Reservas', puntos=False)
+        mostrar_grafico("temporal_reservas_mes", df, dibujar, vega=vega)
 
         # ---------- Ingresos por día del mes ----------
         st.subheader("Ingresos por Día del Mes")
-        ingresos_dia_mes = df.groupby('Día del Mes')['Precio'].sum()
-        fig, ax = plt.subplots()
-        ingresos_dia_mes.plot(kind='bar', ax=ax)
-        ax.set(title='Ingresos Totales por Día del Mes', xlabel='Día del Mes', ylabel='Ingresos (€)')
-        st.pyplot(fig)
+        ingresos_dia_mes = cubo.agregar(['Día del Mes'], ['Ingresos'])['Ingresos']
+        def dibujar():
+            fig, ax = plt.subplots()
+            ingresos_dia_mes.plot(kind='bar', ax=ax)
+            ax.set(title='Ingresos Totales por Día del Mes', xlabel='Día del Mes', ylabel='Ingresos (€)')
+            return fig
+        vega = barras(ingresos_dia_mes.reset_index(), 'Día del Mes', 'Ingresos',
+                      'Ingresos Totales por Día del Mes', eje_y='Ingresos (€)')
+        mostrar_grafico("temporal_ingresos_dia_mes", df, dibujar, vega=vega)
 
     # ---------- Ingresos por día de la semana / reservas por hora ----------
     with col2:
         st.subheader("Ingresos por Día de la Semana")
-        ingresos_dow = df.groupby('Día de la Semana')['Precio'].sum().reindex(DOW_ORDER)
-        fig, ax = plt.subplots()
-        ingresos_dow.plot(kind='bar', ax=ax)
-        ax.set(title='Ingresos Totales por Día de la Semana', xlabel='Día', ylabel='Ingresos (€)')
-        st.pyplot(fig)
+        ingresos_dow = cubo.agregar(['Día de la Semana'], ['Ingresos'])['Ingresos'].reindex(DOW_ORDER)
+        def dibujar():
+            fig, ax = plt.subplots()
+            ingresos_dow.plot(kind='bar', ax=ax)
+            ax.set(title='Ingresos Totales por Día de la Semana', xlabel='Día', ylabel='Ingresos (€)')
+            return fig
+        vega = barras(ingresos_dow.reset_index(), 'Día de la Semana', 'Ingresos',
+                      'Ingresos Totales por Día de la Semana', eje_x='Día', eje_y='Ingresos (€)', orden=DOW_ORDER)
+        mostrar_grafico("temporal_ingresos_dia_semana", df, dibujar, vega=vega)
 
         st.subheader("Reservas por Hora del Día")
-        reservas_hora = df['Hora Inicio'].value_counts().sort_index()
-        fig, ax = plt.subplots()
-        reservas_hora.plot(kind='bar', ax=ax)
-        ax.set(title='Reservas por Hora del Día', xlabel='Hora', ylabel='Número de Reservas')
-        st.pyplot(fig)
+        reservas_hora = cubo.conteo('Hora Inicio').sort_index()
+        def dibujar():
+            fig, ax = plt.subplots()
+            reservas_hora.plot(kind='bar', ax=ax)
+            ax.set(title='Reservas por Hora del Día', xlabel='Hora', ylabel='Número de Reservas')
+            return fig
+        vega = barras(reservas_hora.rename('Reservas').rename_axis('Hora').reset_index(), 'Hora', 'Reservas',
+                      'Reservas por Hora del Día', eje_y='Número de Reservas')
+        mostrar_grafico("temporal_reservas_hora", df, dibujar, vega=vega)
 
 
 # ===========================================================
 #  VISUALIZACIONES DEMOGRÁFICAS (ORIGINAL)
 # ===========================================================
 
+@medido()
 def generar_graficos_demograficos(df: pd.DataFrame) -> None:
     if df.empty:
         st.warning("No hay datos para generar gráficos demográficos")
         return
 
     st.header("👥 Análisis Demográfico y de Actividades")
+    cubo = obtener_cubo(df)
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("Distribución por Sexo")
-        sexo_count = df['Sexo'].value_counts()
-        fig, ax = plt.subplots()
-        ax.pie(sexo_count, labels=sexo_count.index, autopct='%1.1f%%')
-        ax.set_title('Distribución por Sexo')
-        st.pyplot(fig)
+        sexo_count = cubo.conteo('Sexo')
+        def dibujar():
+            fig, ax = plt.subplots()
+            ax.pie(sexo_count, labels=sexo_count.index, autopct='%1.1f%%')
+            ax.set_title('Distribución por Sexo')
+            return fig
+        mostrar_grafico("demografico_sexo", df, dibujar, vega=circular(sexo_count, 'Distribución por Sexo'))
 
         st.subheader("Edad vs Precio")
-        fig, ax = plt.subplots()
-        sns.scatterplot(data=df, x='Edad', y='Precio', hue='Sexo', ax=ax)
-        ax.set_title('Relación Edad vs Precio Pagado')
-        st.pyplot(fig)
+        def dibujar():
+            fig, ax = plt.subplots()
+            sns.scatterplot(data=df, x='Edad', y='Precio', hue='Sexo', ax=ax)
+            ax.set_title('Relación Edad vs Precio Pagado')
+            return fig
+        mostrar_grafico("demografico_edad_precio", df, dibujar)
 
     with col2:
         st.subheader("Actividades Populares")
-        actividad_count = df['Actividad'].value_counts().head(10)
-        fig, ax = plt.subplots()
-        actividad_count.plot(kind='bar', ax=ax)
-        ax.set_title('Actividades Más Populares')
-        ax.set_ylabel('Número de Reservas')
-        plt.xticks(rotation=45)
-        st.pyplot(fig)
+        actividad_count = cubo.conteo('Actividad').head(10)
+        def dibujar():
+            fig, ax = plt.subplots()
+            actividad_count.plot(kind='bar', ax=ax)
+            ax.set_title('Actividades Más Populares')
+            ax.set_ylabel('Número de Reservas')
+            plt.xticks(rotation=45)
+            return fig
+        vega = barras(actividad_count.rename('Reservas').reset_index(), 'Actividad', 'Reservas',
+                      'Actividades Más Populares', eje_y='Número de Reservas')
+        mostrar_grafico("demografico_actividades", df, dibujar, vega=vega)
 
         st.subheader("Ingresos por Ciudad")
-        ingresos_ciudad = df.groupby('Ciudad')['Precio'].sum().nlargest(10)
-        fig, ax = plt.subplots()
-        ingresos_ciudad.plot(kind='bar', ax=ax)
-        ax.set_title('Top 10 Ciudades por Ingresos')
-        ax.set_ylabel('Ingresos (€)')
-        plt.xticks(rotation=45)
-        st.pyplot(fig)
+        ingresos_ciudad = cubo.agregar(['Ciudad'], ['Ingresos'])['Ingresos'].nlargest(10)
+        def dibujar():
+            fig, ax = plt.subplots()
+            ingresos_ciudad.plot(kind='bar', ax=ax)
+            ax.set_title('Top 10 Ciudades por Ingresos')
+            ax.set_ylabel('Ingresos (€)')
+            plt.xticks(rotation=45)
+            return fig
+        vega = barras(ingresos_ciudad.reset_index(), 'Ciudad', 'Ingresos', 'Top 10 Ciudades por Ingresos',
+                      eje_y='Ingresos (€)')
+        mostrar_grafico("demografico_ciudades", df, dibujar, vega=vega)
 
 
 # ===========================================================
 #  PREDICCIONES (ORIGINAL)
 # ===========================================================
 
+@medido()
 def generar_predicciones(df: pd.DataFrame) -> None:
     if df.empty:
         st.warning("No hay datos para generar predicciones")
@@ -506,50 +675,41 @@ def generar_predicciones(df: pd.DataFrame) -> None:
     st.header("🔮 Predicciones Futuras")
     st.subheader("Predicción de Actividad por Mes")
 
-    # -------- Preparar datos --------
-    df = df.copy()
-    df['Fecha Registro'] = pd.to_datetime(df['Fecha Registro'], dayfirst=True, errors='coerce')
-    df['Mes Registro'] = df['Fecha Registro'].dt.to_period('M')
+    # -------- Modelos ajustados para todas las actividades (una vez por versión) --------
+    predicciones = obtener_predicciones(df)
 
-    pred_df = (
-        df.groupby(['Mes Registro', 'Actividad'])
-          .agg(Precio=('Precio', 'sum'), Personas=('Personas', 'sum'), Reservas=('ID', 'count'))
-          .reset_index()
-    )
-    pred_df['Mes Registro'] = pred_df['Mes Registro'].dt.to_timestamp()
-
-    if pred_df.empty:
+    if predicciones.vacio:
         st.warning("No hay suficientes datos para generar predicciones")
         return
 
-    actividad = st.selectbox("Seleccionar actividad", pred_df['Actividad'].unique())
-    act_df = pred_df[pred_df['Actividad'] == actividad].sort_values('Mes Registro')
+    actividad = st.selectbox("Seleccionar actividad", predicciones.actividades)
+    historico = predicciones.historico(actividad)
+    prediccion, modelo = predicciones.prediccion(actividad)
 
-    if len(act_df) < 2:
+    if prediccion.empty:
         st.warning("Se necesitan más datos para predecir esta actividad")
         return
 
-    # -------- Modelo lineal simple --------
-    X = np.arange(len(act_df)).reshape(-1, 1)
-    y = act_df['Precio'].values
-    model = LinearRegression().fit(X, y)
-
-    # Predecir próximos 3 meses
-    X_future = np.arange(len(act_df), len(act_df) + 3).reshape(-1, 1)
-    y_future = model.predict(X_future)
-    fechas_future = pd.date_range(start=act_df['Mes Registro'].max() + pd.DateOffset(months=1), periods=3, freq='MS')
+    if modelo == 'Estacional':
+        st.caption("Modelo estacional: tendencia + efecto de cada mes del año")
+    else:
+        st.caption("Modelo lineal: aún no hay dos temporadas completas de historial")
 
     # -------- Unir histórico + predicción --------
-    hist = pd.DataFrame({'Fecha': act_df['Mes Registro'], 'Precio': act_df['Precio'], 'Tipo': 'Histórico'})
-    futu = pd.DataFrame({'Fecha': fechas_future,           'Precio': y_future,       'Tipo': 'Predicción'})
+    hist = pd.DataFrame({'Fecha': historico.index,   'Precio': historico.values,  'Tipo': 'Histórico'})
+    futu = pd.DataFrame({'Fecha': prediccion.index,  'Precio': prediccion.values, 'Tipo': 'Predicción'})
     full = pd.concat([hist, futu])
 
-    fig, ax = plt.subplots(figsize=(8, 4))
-    sns.lineplot(data=full, x='Fecha', y='Precio', hue='Tipo', style='Tipo', markers=True, dashes=False, ax=ax)
-    ax.set_title(f'Ingresos de {actividad}: histórico + próximos 3 meses')
-    ax.set_ylabel('Ingresos (€)')
-    plt.xticks(rotation=45)
-    st.pyplot(fig)
+    def dibujar():
+        fig, ax = plt.subplots(figsize=(8, 4))
+        sns.lineplot(data=full, x='Fecha', y='Precio', hue='Tipo', style='Tipo', markers=True, dashes=False, ax=ax)
+        ax.set_title(f'Ingresos de {actividad}: histórico + próximos {len(futu)} meses')
+        ax.set_ylabel('Ingresos (€)')
+        plt.xticks(rotation=45)
+        return fig
+    vega = lineas(full, 'Fecha', 'Precio', f'Ingresos de {actividad}: histórico + próximos {len(futu)} meses',
+                  eje_y='Ingresos (€)', color='Tipo')
+    mostrar_grafico("prediccion_ingresos", df, dibujar, (actividad,), vega=vega)
 
     st.subheader("Tabla de Predicciones")
     futu_out = futu.copy()
@@ -561,66 +721,153 @@ def generar_predicciones(df: pd.DataFrame) -> None:
 #  TENDENCIAS POR EDAD (ORIGINAL)
 # ===========================================================
 
+@medido()
 def generar_tendencias_edad(df: pd.DataFrame) -> None:
     if df.empty:
         st.warning("No hay datos para generar tendencias por edad")
         return
 
     st.subheader("Tendencias por Edad")
-    fig, ax = plt.subplots()
-    sns.boxplot(data=df, x='Grupo Edad', y='Ingresos por Persona', hue='Sexo', ax=ax)
-    ax.set(title='Ingresos por Persona según Grupo de Edad y Sexo', xlabel='Grupo de Edad', ylabel='Ingresos por Persona (€)')
-    st.pyplot(fig)
+    def dibujar():
+        fig, ax = plt.subplots()
+        sns.boxplot(data=df, x='Grupo Edad', y='Ingresos por Persona', hue='Sexo', ax=ax)
+        ax.set(title='Ingresos por Persona según Grupo de Edad y Sexo', xlabel='Grupo de Edad', ylabel='Ingresos por Persona (€)')
+        return fig
+    vega = cajas(estadisticos_cajas(df, 'Grupo Edad', 'Ingresos por Persona', 'Sexo'), 'Grupo Edad',
+                 'Ingresos por Persona según Grupo de Edad y Sexo', eje_x='Grupo de Edad',
+                 eje_y='Ingresos por Persona (€)', color='Sexo', orden=EDAD_LABELS)
+    mostrar_grafico("tendencias_edad", df, dibujar, vega=vega)
+
+
+# ===========================================================
+#  RESERVAS ↔ CLIENTES
+# ===========================================================
+
+@medido()
+def analizar_reservas_clientes(df: pd.DataFrame) -> None:
+    st.header("🔗 Reservas y Clientes")
+    st.caption("Cada reserva se enlaza con la ficha de cliente de la misma actividad, día y hora de inicio "
+               "(primero las que además coinciden en personas)")
+
+    completo = obtener_dataset_enlazado()
+    enlazado = acotar_a_clientes(completo, df)
+    if enlazado is not completo:
+        st.caption("Con filtros, las reservas sin ficha (sin ciudad ni sexo) se acotan solo por actividad y fechas")
+    if enlazado.empty:
+        st.warning("No hay reservas ni fichas de cliente para enlazar")
+        return
+
+    origen = enlazado['Origen'].value_counts().reindex(['Enlazada', 'Solo reserva', 'Solo cliente'], fill_value=0)
+    reservas = origen['Enlazada'] + origen['Solo reserva']
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Reservas con ficha", f"{origen['Enlazada'] / reservas:.1%}" if reservas else "—")
+    col2.metric("Reservas sin ficha", int(origen['Solo reserva']))
+    col3.metric("Fichas sin reserva", int(origen['Solo cliente']))
+    col4.metric("Discrepancias", int(enlazado['Discrepancia'].sum()),
+                help="Enlazadas con distinto número de personas o precio en cada hoja")
+
+    st.subheader("Enlace por Actividad")
+    por_actividad = (enlazado.groupby(['Actividad', 'Origen'], observed=True).size()
+                     .rename('Filas').reset_index())
+    def dibujar():
+        fig, ax = plt.subplots(figsize=(8, 4))
+        por_actividad.pivot(index='Actividad', columns='Origen', values='Filas').plot(kind='bar', ax=ax)
+        ax.set_title('Reservas y fichas por actividad')
+        ax.set_ylabel('Filas')
+        plt.xticks(rotation=45)
+        return fig
+    vega = barras(por_actividad, 'Actividad', 'Filas', 'Reservas y fichas por actividad',
+                  color='Origen', agrupar=True)
+    mostrar_grafico("enlace_actividades", enlazado, dibujar, vega=vega)
+
+    st.subheader("Discrepancias entre Reservas y Clientes")
+    discrepancias = enlazado[enlazado['Discrepancia']]
+    if discrepancias.empty:
+        st.info("Las reservas enlazadas coinciden con sus fichas")
+    else:
+        st.caption(f"Mostrando las {min(len(discrepancias), 100)} más recientes de {len(discrepancias)}")
+        st.dataframe(discrepancias.sort_values('Inicio', ascending=False).head(100)[
+            ['Inicio', 'Actividad', 'Nombre', 'ID', 'Personas', 'Precio', 'Fila Reserva', 'Fila Cliente']
+        ])
+
+
+# ===========================================================
+#  REGISTRO DE SECCIONES
+# ===========================================================
+
+@medido()
+def mostrar_analisis_temporal(df: pd.DataFrame) -> None:
+    st.header("📅 Análisis Temporal por Fecha de Actividad")
+    generar_graficos_temporales(df)
+    generar_graficos_demograficos(df)
+    generar_tendencias_edad(df)
+
+
+# Pestaña -> (función que la dibuja, si su salida se puede cachear).
+# Las secciones con widgets (Predicciones) no se cachean enteras, ni las que
+# dependen también de la hoja de reservas (su versión no es la de `df`).
+SECCIONES_REPORTES = {
+    "📅 Análisis Temporal":    (mostrar_analisis_temporal, True),
+    "🌍 Procedencia y Edad":    (analizar_actividades_por_procedencia_edad, True),
+    "📆 Días de la Semana":     (analizar_dias_semana_actividades, True),
+    "💰 Ingresos Mensuales":    (analizar_ingresos_mensuales_comparativa, True),
+    "⚧ Actividades por Sexo":   (analizar_actividades_por_sexo, True),
+    "🔮 Predicciones":          (generar_predicciones, False),
+    "🔗 Reservas y Clientes":   (analizar_reservas_clientes, False),
+}
+
+
+@cache_medida(st.cache_data(max_entries=12))
+def _mostrar_seccion_cacheada(nombre: str, version, _df: pd.DataFrame) -> None:
+    """Dibuja una sección; en las siguientes visitas Streamlit repite sus elementos sin recalcular."""
+    funcion, _ = SECCIONES_REPORTES[nombre]
+    funcion(_df)
 
 
 # ===========================================================
 #  ORQUESTADOR PRINCIPAL
 # ===========================================================
 
+@medido()
 def generar_reportes() -> None:
+    # Informe pre-renderizado (herramientas/prerender_reportes): se muestra sin
+    # leer la hoja ni recalcular, salvo que se pida el cálculo en vivo
+    informe = cargar_ultimo_informe()
+    if informe is not None:
+        en_vivo = st.toggle("Recalcular en vivo", key="reportes_en_vivo",
+                            help="Lee la hoja y recalcula el dashboard con los datos actuales")
+        if not en_vivo:
+            mostrar_informe(informe)
+            return
+
     clientes_raw = cargar_clientes()
 
     if clientes_raw.empty:
         st.info("No hay datos de clientes disponibles. Ingrese datos en la pestaña 'Ingresar Datos de Clientes'.")
         return
 
-    df = procesar_datos_clientes(clientes_raw)
+    df = obtener_clientes_procesados(clientes_raw)
 
     st.title("📊 Dashboard de Análisis de Clientes")
+
+    # Los filtros se aplican sobre el índice del procesado, antes de cualquier agregación
+    filtros = barra_filtros(df)
+    if filtros:
+        total = len(df)
+        df = filtrar_clientes(df, filtros)
+        st.caption(f"Analizando {len(df)} de {total} clientes")
+        if df.empty:
+            st.info("Ningún cliente cumple los filtros seleccionados")
+            return
     st.subheader("Datos de Clientes (procesados)")
-    st.dataframe(df)
-
-    # Crear pestañas para organizar los análisis
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-        "📅 Análisis Temporal", 
-        "🌍 Procedencia y Edad",
-        "📆 Días de la Semana", 
-        "💰 Ingresos Mensuales",
-        "⚧ Actividades por Sexo",
-        "🔮 Predicciones"
-    ])
-    
-    with tab1:
-        st.header("📅 Análisis Temporal por Fecha de Actividad")
-        generar_graficos_temporales(df)
-        generar_graficos_demograficos(df)
-        generar_tendencias_edad(df)
-    
-    with tab2:
-        # NUEVA FUNCIONALIDAD: Actividades por procedencia y edad
-        analizar_actividades_por_procedencia_edad(df)
-    
-    with tab3:
-        # NUEVA FUNCIONALIDAD: Días de la semana más activos
-        analizar_dias_semana_actividades(df)
-    
-    with tab4:
-        # NUEVA FUNCIONALIDAD: Ingresos mensuales y comparativa anual
-        analizar_ingresos_mensuales_comparativa(df)
-    
-    with tab5:
-        # NUEVA FUNCIONALIDAD: Actividades por sexo
-        analizar_actividades_por_sexo(df)
-    
-    with tab6:
-        generar_predicciones(df)
\ No newline at end of file
+    mostrar_tabla_paginada(df, "reportes_clientes")
+
+    # Solo se calcula y dibuja la pestaña abierta
+    pestañas = st.tabs(list(SECCIONES_REPORTES), key="reportes_seccion", on_change="rerun")
+    for (nombre, (funcion, cacheable)), pestaña in zip(SECCIONES_REPORTES.items(), pestañas):
+        if pestaña.open:
+            with pestaña:
+                if cacheable:
+                    _mostrar_seccion_cacheada(nombre, df.attrs.get('version'), df)
+                else:
+                    funcion(df)
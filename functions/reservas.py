@@ -1,8 +1,15 @@
 # functions/reservas.py
 import streamlit as st
+import pandas as pd
 from datetime import datetime, time
-from functions.gspread_client import get_gsheet_client
-from functions.data_utils import SHEET_NAME, SPREADSHEET_ID, cargar_datos, ACTIVIDADES_MANUALES
+from functions.data_utils import (SHEET_NAME, cargar_datos, refrescar_datos, ACTIVIDADES_MANUALES,
+                                  obtener_diario, filas_pendientes, eliminar_fila_reserva)
+from functions.diario import nueva_clave
+from functions.columnas import ENCABEZADOS_RESERVAS
+from functions.duraciones import resolver_duracion, dias_iniciados
+from functions.busqueda import obtener_indice_busqueda
+from functions.identidades import ficha_cliente
+from functions.rendimiento import tramo
 
 # Funciones movidas a este archivo
 def calcular_precio(actividad, duracion, personas, precio_unitario=0, adultos=0, niños=0):
@@ -11,7 +18,7 @@ def calcular_precio(actividad, duracion, personas, precio_unitario=0, adultos=0,
     if "Ferrata" in actividad and actividad != "Alquiler equipos ferrata":
         return 49 * personas
     if actividad == "Alquiler equipos ferrata":
-        dias = int(duracion.split()[0])
+        dias = dias_iniciados(duracion)
         return 15 * dias * personas
 
     tarifas = {
@@ -29,6 +36,12 @@ def calcular_precio(actividad, duracion, personas, precio_unitario=0, adultos=0,
     else:
         return tarifas.get(actividad, {}).get(duracion, 0) * personas
 
+def opciones_duracion(actividad):
+    """Duraciones que se ofrecen en los formularios (el alquiler de ferrata se cobra por días)"""
+    if actividad == "Alquiler equipos ferrata":
+        return ["1 día", "2 días", "3 días"]
+    return ["1 hora", "2 horas", "Medio día", "Todo el día"]
+
 def validar_campos_obligatorios():
     campos_requeridos = {
         "nombre": "Nombre completo",
@@ -44,6 +57,22 @@ def validar_campos_obligatorios():
         return False
     return True
 
+def mostrar_cliente_habitual(nombre, contacto):
+    """Si el cliente ya ha reservado antes: cuántas veces, cuánto ha gastado y su última visita"""
+    if not nombre.strip() and not contacto.strip():
+        return
+    try:
+        ficha = ficha_cliente(nombre, contacto)
+        if ficha is None:
+            st.caption("🆕 Cliente nuevo")
+            return
+        ultima = ficha['Última visita']
+        ultima = ultima.strftime('%d/%m/%Y') if pd.notna(ultima) else "sin fecha"
+        st.caption(f"🔁 Cliente habitual: {ficha['Reservas']} reservas, {ficha['Gasto']:.2f}€ en total, "
+                   f"última visita el {ultima}")
+    except Exception as e:
+        st.error(f"Error al buscar el cliente: {str(e)}")
+
 def mostrar_formulario():
     st.header("📝 Nueva Reserva")
     
@@ -113,10 +142,7 @@ def mostrar_formulario():
         )
 
     # Selector de duración
-    if st.session_state["actividad"] == "Alquiler equipos ferrata":
-        duracion_opciones = ["1 día", "2 días", "3 días"]
-    else:
-        duracion_opciones = ["1 hora", "2 horas", "Medio día", "Todo el día"]
+    duracion_opciones = opciones_duracion(st.session_state["actividad"])
 
     st.session_state["duracion"] = st.selectbox(
         "Duración*", 
@@ -128,6 +154,7 @@ def mostrar_formulario():
     st.session_state["hora_inicio"] = st.time_input("Hora de inicio*", value=st.session_state["hora_inicio"], step=300)
     st.session_state["contacto"] = st.selectbox("Medio de contacto*", ["WhatsApp", "Teléfono", "Email"])
     st.session_state["contacto_dato"] = st.text_input("Email o número de contacto*", st.session_state["contacto_dato"])
+    mostrar_cliente_habitual(st.session_state["nombre"], st.session_state["contacto_dato"])
     st.session_state["notas"] = st.text_area("Notas adicionales", st.session_state["notas"])
 
     # Cálculo de precio
@@ -160,6 +187,8 @@ def mostrar_formulario():
         if validar_campos_obligatorios():
             st.session_state.mostrar_resumen = True
             st.session_state.reserva_guardada = False
+            # Clave de idempotencia: confirmar dos veces el mismo resumen no duplica la reserva
+            st.session_state.clave_reserva = nueva_clave()
 
     if st.session_state.mostrar_resumen and not st.session_state.reserva_guardada:
         st.subheader("✅ Revisa tu reserva")
@@ -193,15 +222,12 @@ def mostrar_formulario():
 
 def guardar_reserva(precio_final, total_personas):
     try:
-        gc = get_gsheet_client()
-        spreadsheet = gc.open_by_key(SPREADSHEET_ID)
-        worksheet = spreadsheet.worksheet(SHEET_NAME)
-
         actividad_actual = st.session_state["actividad"]
         precio_final_val = precio_final
 
         if actividad_actual == "Hidropedales":
-            duracion_horas = int(st.session_state["duracion"].split()[0])
+            # Precio por hora ("Medio día" y "Todo el día" también se resuelven a horas)
+            duracion_horas = resolver_duracion(st.session_state["duracion"]).total_seconds() / 3600
             precio_unitario = precio_final_val / duracion_horas if duracion_horas > 0 else 0
         elif actividad_actual in ACTIVIDADES_MANUALES:
             precio_unitario = st.session_state.get("precio_unitario", 0.0)
@@ -223,10 +249,11 @@ def guardar_reserva(precio_final, total_personas):
             round(precio_unitario, 2)
         ]
 
-        worksheet.append_row(nueva_fila)
+        # Confirmada al anotarla en el diario local; el hilo de envío la escribe en la hoja
+        with tramo("diario.guardar_reserva"):
+            obtener_diario().anotar(SHEET_NAME, nueva_fila, st.session_state.get("clave_reserva"))
         st.session_state.reserva_guardada = True
         st.session_state.mostrar_resumen = False
-        st.cache_data.clear()
         st.success("Reserva guardada con éxito!")
         st.balloons()
         st.rerun()
@@ -234,16 +261,48 @@ def guardar_reserva(precio_final, total_personas):
     except Exception as e:
         st.error(f"Error al guardar: {str(e)}")
 
+def buscar_reservas():
+    """Buscador de reservas por nombre, teléfono o email y notas (sin distinguir mayúsculas ni acentos)"""
+    st.subheader("🔎 Buscar reserva")
+    col_consulta, col_archivo = st.columns([3, 1])
+    with col_consulta:
+        consulta = st.text_input("Nombre, teléfono, email o notas", key="busqueda_reservas",
+                                 placeholder="p. ej. garcia, 600123456...")
+    with col_archivo:
+        historico = st.checkbox("Incluir temporadas archivadas", key="busqueda_historico")
+    if not consulta.strip():
+        return
+
+    try:
+        indice, datos = obtener_indice_busqueda(historico)
+        with tramo("busqueda.reservas"):
+            etiquetas, similitud = indice.buscar(consulta)
+        if not len(etiquetas):
+            st.info("No hay reservas que coincidan")
+            return
+        encontradas = datos.loc[etiquetas, ['Nombre', 'Actividad', 'Fecha Actividad', 'Hora inicio Actividad',
+                                            'Personas', 'Precio', 'Email o Teléfono', 'Notas']]
+        encontradas = encontradas.assign(**{
+            'Fecha Actividad': encontradas['Fecha Actividad'].dt.strftime('%d/%m/%Y'),
+            'Coincidencia': (similitud * 100).round().astype(int).astype(str) + ' %',
+        })
+        st.dataframe(encontradas, hide_index=True)
+    except Exception as e:
+        st.error(f"Error al buscar: {str(e)}")
+
 def ultimas_reservas():
     st.subheader("📅 Últimas 5 reservas registradas")
     
     try:
+        mostrar_reservas_pendientes()
         datos = cargar_datos()
         if not datos.empty:
-            datos['Fecha Actividad'] = datos['Fecha Actividad'].dt.strftime('%d/%m/%Y')
-            datos['Fecha Reserva'] = datos['Fecha Reserva'].dt.strftime('%d/%m/%Y %H:%M')
+            # cargar_datos es compartido: se formatean solo las 5 filas mostradas, en una copia
+            recientes = datos.head(5).assign(
+                **{'Fecha Actividad': lambda d: d['Fecha Actividad'].dt.strftime('%d/%m/%Y'),
+                   'Fecha Reserva': lambda d: d['Fecha Reserva'].dt.strftime('%d/%m/%Y %H:%M')})
             
-            for index, row in datos.head(5).iterrows():
+            for index, row in recientes.iterrows():
                 cols = st.columns([5,1])
                 with cols[0]:
                     st.markdown(f"""
@@ -255,6 +314,7 @@ def ultimas_reservas():
                 with cols[1]:
                     if st.button("🗑️", key=f"delete_{index}_{row['Nombre']}"):
                         st.session_state['delete_index'] = index
+                        st.session_state['delete_reserva'] = row.to_dict()
                         st.session_state['show_delete_confirm'] = True
 
             if st.session_state.get('show_delete_confirm', False):
@@ -264,7 +324,7 @@ def ultimas_reservas():
                     col_confirm, col_cancel, col_modify = st.columns(3)
                     with col_confirm:
                         if st.button("✅ Confirmar", key=f"confirm_delete_{index}"):
-                            eliminar_reserva(index)
+                            eliminar_reserva(index, st.session_state.get('delete_reserva', {}))
                     with col_cancel:
                         if st.button("❌ Cancelar", key=f"cancel_delete_{index}"):
                             st.session_state.show_delete_confirm = False
@@ -277,21 +337,31 @@ def ultimas_reservas():
             st.info("📭 Aún no hay reservas registradas")
             
         if st.button("🔄 Actualizar reservas", key="refresh_reservations"):
-            st.cache_data.clear()
+            refrescar_datos()
             st.rerun()
             
     except Exception as e:
         st.error(f"Error al cargar datos: {str(e)}")
 
-def eliminar_reserva(index):
+def mostrar_reservas_pendientes():
+    """Reservas guardadas en el diario local que aún no están en la hoja"""
+    for pendiente in reversed(filas_pendientes(SHEET_NAME)):
+        reserva = dict(zip(ENCABEZADOS_RESERVAS, pendiente["fila"]))
+        aviso = "⏳ pendiente de sincronizar"
+        if pendiente["error"]:
+            aviso += f" (reintentando: {pendiente['error'][:80]})"
+        st.markdown(f"""
+        **{reserva['Nombre']}** - {reserva['Actividad']} · *{aviso}*<br>
+        📅 {reserva['Fecha Actividad']} ⏰ {reserva['Hora inicio Actividad']}<br>
+        👥 {reserva['Personas']} personas | 💶 {reserva['Precio']}€
+        """, unsafe_allow_html=True)
+
+def eliminar_reserva(index, reserva):
     try:
-        gc = get_gsheet_client()
-        spreadsheet = gc.open_by_key(SPREADSHEET_ID)
-        worksheet = spreadsheet.worksheet(SHEET_NAME)
-        worksheet.delete_rows(index + 2)
+        eliminar_fila_reserva(index, reserva)
         st.session_state.show_delete_confirm = False
         st.session_state.delete_index = None
-        st.cache_data.clear()
+        refrescar_datos()
         st.success("✅ Reserva eliminada correctamente")
         st.rerun()
     except Exception as e:
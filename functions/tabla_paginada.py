@@ -0,0 +1,149 @@
+# functions/tabla_paginada.py
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from functions.rendimiento import cache_medida
+
+# Filas por página que se pueden elegir; solo la página visible se envía al navegador
+TAMAÑOS_PAGINA = (25, 50, 100)
+
+# Columnas que se pueden filtrar por valor: las que tienen como mucho estos valores distintos
+MAX_VALORES_FILTRO = 50
+
+SIN_ORDEN = "(orden de la hoja)"
+
+class VistaTabla:
+    """Búsqueda, filtros y orden de una tabla sin copiarla.
+
+    El texto de búsqueda y las permutaciones de orden se calculan la primera
+    vez que se piden y se reutilizan mientras no cambie la versión de los
+    datos. Todo trabaja con posiciones; solo se materializa la página visible.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._texto = None
+        self._ordenes = {}
+        self._valores = {}
+        self._filtrables = None
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def texto(self):
+        """Todas las columnas de cada fila en minúsculas, separadas por un carácter que no se teclea"""
+        if self._texto is None:
+            texto = np.full(len(self.df), '', dtype=object)
+            for columna in self.df.columns:
+                # Cada valor distinto se convierte a texto una sola vez; los vacíos (-1) quedan en ''
+                codigos, distintos = pd.factorize(self.df[columna])
+                textos = np.array([str(v).lower() for v in distintos] + [''], dtype=object)
+                texto = texto + '\x1f' + textos[codigos]
+            self._texto = pd.Series(texto)
+        return self._texto
+
+    @property
+    def filtrables(self):
+        """Columnas con pocos valores distintos (Actividad, Ciudad, Sexo...)"""
+        if self._filtrables is None:
+            self._filtrables = [c for c in self.df.columns
+                                if self.df[c].nunique(dropna=True) <= MAX_VALORES_FILTRO]
+        return self._filtrables
+
+    def valores(self, columna):
+        """Valores distintos de la columna, ordenados (sin vacíos)"""
+        if columna not in self._valores:
+            distintos = self.df[columna].dropna().unique()
+            try:
+                distintos = sorted(distintos)
+            except TypeError:
+                # Tipos mezclados en la hoja: se ordenan como texto
+                distintos = sorted(distintos, key=str)
+            self._valores[columna] = list(distintos)
+        return self._valores[columna]
+
+    def orden(self, columna=None, descendente=False):
+        """Posiciones de las filas ordenadas por `columna` (vacíos al final)"""
+        if columna is None:
+            return np.arange(len(self.df))
+        clave = (columna, descendente)
+        if clave not in self._ordenes:
+            serie = self.df[columna].reset_index(drop=True)
+            self._ordenes[clave] = serie.sort_values(
+                ascending=not descendente, kind='stable', na_position='last'
+            ).index.to_numpy()
+        return self._ordenes[clave]
+
+    def posiciones(self, busqueda='', filtros=None, columna=None, descendente=False):
+        """Posiciones de las filas que cumplen la búsqueda y los filtros, en el orden pedido"""
+        coinciden = np.ones(len(self.df), dtype=bool)
+        busqueda = busqueda.strip().lower()
+        if busqueda:
+            coinciden &= self.texto.str.contains(busqueda, regex=False).to_numpy()
+        for columna_filtro, seleccion in (filtros or {}).items():
+            if seleccion:
+                coinciden &= self.df[columna_filtro].isin(seleccion).to_numpy()
+        orden = self.orden(columna, descendente)
+        return orden[coinciden[orden]]
+
+    def pagina(self, posiciones, numero, filas):
+        """Filas de la página `numero` (desde 1)"""
+        inicio = (numero - 1) * filas
+        return self.df.iloc[posiciones[inicio:inicio + filas]]
+
+@cache_medida(st.cache_resource(max_entries=4))
+def _vista_por_version(version, _df):
+    return VistaTabla(_df)
+
+def obtener_vista(df):
+    """Vista compartida entre sesiones mientras no cambie la versión de los datos"""
+    version = df.attrs.get('version')
+    if version is None:
+        return VistaTabla(df)
+    return _vista_por_version(version, df)
+
+def mostrar_tabla_paginada(df, clave):
+    """Tabla con búsqueda, filtros, orden y paginación calculados en el servidor.
+
+    Al navegador solo llega la página visible, así que el tamaño de cada
+    envío no crece con el número de clientes.
+    """
+    if df.empty:
+        st.info("No hay filas que mostrar")
+        return
+    vista = obtener_vista(df)
+
+    col_busqueda, col_orden, col_sentido = st.columns([3, 2, 1], vertical_alignment="bottom")
+    busqueda = col_busqueda.text_input("🔍 Buscar", key=f"{clave}_buscar",
+                                       placeholder="Texto en cualquier columna")
+    columna = col_orden.selectbox("Ordenar por", [SIN_ORDEN] + list(df.columns), key=f"{clave}_orden")
+    descendente = col_sentido.toggle("Descendente", key=f"{clave}_descendente")
+
+    filtros = {}
+    columnas_filtro = st.multiselect("Filtrar por", vista.filtrables, key=f"{clave}_filtrar")
+    if columnas_filtro:
+        for col, columna_filtro in zip(st.columns(len(columnas_filtro)), columnas_filtro):
+            filtros[columna_filtro] = col.multiselect(
+                columna_filtro, vista.valores(columna_filtro), key=f"{clave}_filtro_{columna_filtro}"
+            )
+
+    posiciones = vista.posiciones(busqueda, filtros, None if columna == SIN_ORDEN else columna, descendente)
+    total = len(posiciones)
+    if total == 0:
+        st.info("Ninguna fila coincide con la búsqueda y los filtros")
+        return
+
+    col_tamaño, col_paginas = st.columns([1, 5], vertical_alignment="bottom")
+    filas = col_tamaño.selectbox("Filas por página", TAMAÑOS_PAGINA, index=1, key=f"{clave}_filas")
+    paginas = (total + filas - 1) // filas
+    with col_paginas:
+        # La clave incluye el número de páginas: al cambiar los filtros se vuelve a la primera
+        numero = st.pagination(paginas, key=f"{clave}_pagina_{paginas}") if paginas > 1 else 1
+
+    inicio = (numero - 1) * filas
+    st.dataframe(vista.pagina(posiciones, numero, filas))
+    filtradas = f" (filtradas de {len(vista)})" if total < len(vista) else ""
+    st.caption(f"Filas {inicio + 1}–{min(inicio + filas, total)} de {total}{filtradas} · "
+               f"página {numero} de {paginas}")
@@ -0,0 +1,202 @@
+# herramientas/archivar_temporadas.py
+"""Archiva en Parquet las reservas de temporadas pasadas y las quita de la hoja activa.
+
+Uso (desde la raíz del repositorio):
+    python -m herramientas.archivar_temporadas [--hasta 2025-01-01] [--ejecutar]
+    python -m herramientas.archivar_temporadas --prueba 30000 [--dias 600] [--latencia 0.5] [--por-celda 0.00002]
+
+Sin --ejecutar solo informa de lo que archivaría (filas por mes y filas a
+borrar). Con --ejecutar, para las reservas con actividad anterior a --hasta
+(por defecto, el inicio de la temporada en curso):
+  1. escribe las particiones (anio=AAAA/mes=MM) en el directorio del archivo,
+     saltándose las filas ya archivadas: repetirlo no duplica nada;
+  2. comprueba que todas están en el archivo y actualiza el manifiesto, con
+     lo que la app deja de mostrarlas desde la hoja;
+  3. vuelve a leer la hoja y, si esas filas siguen en el mismo sitio, las
+     borra de abajo arriba con batch_update: un deleteDimension por bloque de
+     filas seguidas, hasta BLOQUES_POR_LLAMADA bloques por llamada.
+Si algo falla a medias se puede volver a lanzar. Las apps en marcha siguen
+hasta 5 minutos con la lectura anterior, con las posiciones de antes del
+borrado: antes de borrar una reserva comprueban que la fila sigue siendo
+esa (data_utils.eliminar_fila_reserva) y, si no, recargan sin borrar nada.
+Un borrado desde la app entre el paso 3 y el final movería las filas que
+borra la herramienta (el paso 3 solo detecta los cambios hechos antes).
+
+Con --prueba no toca Google Sheets: archiva en un directorio temporal una
+hoja falsa (herramientas.hoja_falsa) con N reservas repartidas en --dias días
+antes y después de hoy, y mide la lectura de la hoja activa antes y después
+y la de un mes archivado.
+"""
+
+import argparse
+import io
+import sys
+import tempfile
+import time
+from datetime import date
+import pandas as pd
+from gspread.exceptions import APIError
+from functions.archivo import (
+    archivar, actualizar_manifiesto, filas_anteriores, huellas, huellas_archivadas, inicio_temporada,
+    particiones, leer_particion, COLUMNA_FECHA,
+)
+from functions.importacion import LIMITE_ESCRITURAS, LimiteEscrituras, REINTENTOS_CUOTA
+
+# Bloques de filas borrados en cada batch_update (cada uno es una petición de escritura)
+BLOQUES_POR_LLAMADA = 500
+
+def leer_hoja(worksheet):
+    """Valores de la hoja como texto; el índice es el número de fila en la hoja (la 1 son los encabezados)"""
+    valores = worksheet.get_all_values()
+    if not valores:
+        return pd.DataFrame()
+    encabezados = valores[0]
+    hoja = pd.DataFrame(valores[1:], columns=encabezados, index=range(2, len(valores) + 1))
+    # Columnas sin encabezado (celdas sueltas a la derecha) no son datos
+    return hoja.loc[:, [bool(e) for e in encabezados]]
+
+def bloques(filas):
+    """Bloques [inicio, fin] de números de fila seguidos, del último al primero"""
+    filas = sorted(filas)
+    resultado = []
+    for fila in filas:
+        if resultado and fila == resultado[-1][1] + 1:
+            resultado[-1][1] = fila
+        else:
+            resultado.append([fila, fila])
+    return [tuple(b) for b in reversed(resultado)]
+
+def borrar_filas(worksheet, filas, limite=LIMITE_ESCRITURAS, esperar=time.sleep):
+    """Borra las filas indicadas de abajo arriba (las de arriba no se mueven); devuelve las llamadas hechas"""
+    peticiones = [{"deleteDimension": {"range": {"sheetId": worksheet.id, "dimension": "ROWS",
+                                                 "startIndex": inicio - 1, "endIndex": fin}}}
+                  for inicio, fin in bloques(filas)]
+    llamadas = 0
+    for primera in range(0, len(peticiones), BLOQUES_POR_LLAMADA):
+        cuerpo = {"requests": peticiones[primera:primera + BLOQUES_POR_LLAMADA]}
+        for intento in range(REINTENTOS_CUOTA):
+            limite.reservar()
+            try:
+                worksheet.spreadsheet.batch_update(cuerpo)
+                break
+            except APIError as e:
+                if getattr(e, "code", None) != 429 or intento == REINTENTOS_CUOTA - 1:
+                    raise
+                esperar(min(2 ** intento, 32))
+        llamadas += 1
+    return llamadas
+
+def resumen_por_mes(antiguas):
+    fechas = pd.to_datetime(antiguas[COLUMNA_FECHA], format="%d/%m/%Y", errors="coerce")
+    return fechas.dt.to_period("M").value_counts().sort_index()
+
+def archivar_hoja(worksheet, directorio, hasta, ejecutar=True, limite=LIMITE_ESCRITURAS,
+                  esperar=time.sleep, salida=sys.stdout):
+    """Los tres pasos sobre una worksheet; devuelve un dict con lo hecho"""
+    hoja = leer_hoja(worksheet)
+    if hoja.empty or COLUMNA_FECHA not in hoja.columns:
+        print("La hoja está vacía o no tiene la columna de fecha de actividad", file=salida)
+        return {"archivables": 0}
+    antiguas = filas_anteriores(hoja, hasta)
+    resultado = {"filas_hoja": len(hoja), "archivables": len(antiguas)}
+    print(f"{len(antiguas)} de {len(hoja)} filas tienen actividad anterior al {hasta:%d/%m/%Y}", file=salida)
+    if antiguas.empty:
+        return resultado
+    por_mes = resumen_por_mes(antiguas)
+    print(por_mes.rename("filas").to_string(), file=salida)
+    if not ejecutar:
+        print(f"Se borrarían {len(bloques(antiguas.index))} bloques de filas. Añade --ejecutar para archivar.",
+              file=salida)
+        return resultado
+
+    # 1. Particiones
+    nuevas, ya_archivadas, esperadas = archivar(directorio, hoja, hasta)
+    resultado.update(nuevas=nuevas, ya_archivadas=ya_archivadas)
+    print(f"Archivadas {nuevas} filas nuevas ({ya_archivadas} ya lo estaban) en {directorio}", file=salida)
+
+    # 2. Verificación y manifiesto
+    meses = {(p.year, p.month) for p in por_mes.index}
+    faltan = ~esperadas.isin(huellas_archivadas(directorio, meses))
+    if faltan.any():
+        raise RuntimeError(f"{int(faltan.sum())} filas no aparecen en el archivo; no se borra nada de la hoja")
+    manifiesto = actualizar_manifiesto(directorio, hasta)
+    print(f"Manifiesto: archivo hasta el {manifiesto['hasta']} ({manifiesto['filas']} filas)", file=salida)
+
+    # 3. Borrado de la hoja, solo si esas filas siguen donde estaban
+    releida = leer_hoja(worksheet)
+    actuales = releida.reindex(index=antiguas.index, columns=antiguas.columns).fillna("")
+    if len(releida) < len(hoja) or not huellas(actuales).equals(huellas(antiguas)):
+        raise RuntimeError("La hoja ha cambiado mientras se archivaba; vuelve a lanzar la herramienta")
+    resultado["llamadas_borrado"] = borrar_filas(worksheet, antiguas.index, limite, esperar)
+    print(f"Borradas {len(antiguas)} filas de la hoja en {resultado['llamadas_borrado']} llamadas", file=salida)
+    return resultado
+
+def prueba(args):
+    """Archiva una hoja falsa y mide la lectura de la hoja activa antes y después"""
+    from functions.columnas import ENCABEZADOS_RESERVAS
+    from herramientas.datos_sinteticos import generar_reservas
+    from herramientas.hoja_falsa import LibroFalso, RelojSimulado
+
+    reservas = generar_reservas(args.prueba, dias=args.dias, semilla=1)
+    # En orden de reserva, como la hoja real (las de temporadas pasadas quedan casi todas arriba)
+    reservas = reservas.iloc[pd.to_datetime(reservas["Fecha Reserva"], format="%d/%m/%Y %H:%M").argsort(kind="stable")]
+    reloj = RelojSimulado()
+    libro = LibroFalso({"Reservas": [ENCABEZADOS_RESERVAS] + reservas.astype(str).values.tolist()},
+                       reloj=reloj, latencia=args.latencia, segundos_por_celda=args.por_celda,
+                       escrituras_por_minuto=None, lecturas_por_minuto=None)
+    hoja = libro.hojas["Reservas"]
+    limite = LimiteEscrituras(reloj=reloj.ahora, esperar=reloj.esperar)
+
+    def lectura():
+        antes = reloj.ahora()
+        inicio = time.perf_counter()
+        filas = pd.DataFrame(hoja.get_all_records())
+        return len(filas), reloj.ahora() - antes + time.perf_counter() - inicio
+
+    filas_antes, t_antes = lectura()
+    with tempfile.TemporaryDirectory() as directorio:
+        inicio = time.perf_counter()
+        api = reloj.ahora()
+        resultado = archivar_hoja(hoja, directorio, args.hasta, limite=limite, esperar=reloj.esperar)
+        t_archivar = time.perf_counter() - inicio + reloj.ahora() - api
+        repetido = archivar_hoja(hoja, directorio, args.hasta, limite=limite, esperar=reloj.esperar,
+                                 salida=io.StringIO())
+        filas_despues, t_despues = lectura()
+
+        # Un mes de la temporada pasada (el último archivado) leído del archivo
+        anio, mes, ruta = particiones(directorio)[-1]
+        inicio = time.perf_counter()
+        mes_archivado = leer_particion(ruta)
+        t_mes = time.perf_counter() - inicio
+
+    print()
+    print(f"Hoja activa: {filas_antes} → {filas_despues} filas; lectura (API simulada + CPU) "
+          f"{t_antes:.2f} s → {t_despues:.2f} s")
+    print(f"Archivar: {t_archivar:.2f} s; relanzarlo archiva {repetido.get('nuevas', 0)} filas nuevas")
+    print(f"Leer {mes:02d}/{anio} del archivo ({len(mes_archivado)} filas): {t_mes * 1000:.1f} ms")
+    print(f"Llamadas a la API: {dict(libro.llamadas)}")
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hasta", type=date.fromisoformat, default=inicio_temporada(),
+                        help="archiva las reservas con actividad anterior a esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--ejecutar", action="store_true", help="archiva y borra (sin esto, solo informa)")
+    parser.add_argument("--prueba", type=int, metavar="N", help="hoja falsa con N reservas, sin Google Sheets")
+    parser.add_argument("--dias", type=int, default=600, help="días de histórico de la hoja de prueba")
+    parser.add_argument("--latencia", type=float, default=0.5)
+    parser.add_argument("--por-celda", type=float, default=0.00002)
+    args = parser.parse_args()
+
+    if args.prueba:
+        prueba(args)
+        return
+
+    # La configuración (hoja, credenciales, directorio) es la de la app
+    from functions.data_utils import DIRECTORIO_ARCHIVO, SPREADSHEET_ID, SHEET_NAME
+    from functions.gspread_client import get_gsheet_client
+    worksheet = get_gsheet_client().open_by_key(SPREADSHEET_ID).worksheet(SHEET_NAME)
+    archivar_hoja(worksheet, DIRECTORIO_ARCHIVO, args.hasta, ejecutar=args.ejecutar)
+
+if __name__ == "__main__":
+    main()
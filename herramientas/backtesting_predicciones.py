@@ -0,0 +1,237 @@
+# herramientas/backtesting_predicciones.py
+"""Backtesting de los modelos de predicción de ingresos mensuales por actividad.
+
+Uso (desde la raíz del repositorio):
+    python -m herramientas.backtesting_predicciones [--datos clientes.csv] [--procesos 4]
+        [--horizonte 3] [--inicio 24] [--por-actividad]
+
+Sin --datos usa clientes sintéticos (--filas, --años, --actividades); con
+--datos lee una exportación de la hoja Clientes en CSV o XLSX.
+
+Recorre el historial con orígenes móviles: en cada origen ajusta cada modelo
+con los meses anteriores y predice los `horizonte` siguientes. Las
+actividades se reparten entre procesos. Los errores se comparan sobre las
+predicciones que todos los modelos pueden hacer; el MAPE solo cuenta los
+meses con ingresos (en invierno muchas actividades tienen cero). Los tiempos
+de ajuste y predicción suman los de todos los grupos de actividades, así que
+con más procesos incluyen más veces el coste fijo de cada llamada.
+"""
+
+import argparse
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from functions.predicciones import (
+    matriz_mensual, diseño, minimos_cuadrados, MIN_MESES_LINEAL, MIN_MESES_ESTACIONAL,
+)
+
+# Parámetros del suavizado exponencial (Holt-Winters aditivo)
+ALFA, BETA, GAMMA = 0.2, 0.05, 0.3
+
+# ------------------- MODELOS -------------------
+# Cada modelo es (ajustar, predecir):
+#   ajustar(meses, valores, activos) -> estado
+#   predecir(estado, futuro) -> matriz horizonte x actividades (NaN si no puede predecir)
+
+def _ajustar_regresion(estacional, minimo):
+    def ajustar(meses, valores, activos):
+        X = diseño(np.arange(len(meses)), meses.month, estacional)
+        return minimos_cuadrados(X, valores, activos.astype(float)), len(meses), activos.sum(axis=0) >= minimo
+    return ajustar
+
+def _predecir_regresion(estacional):
+    def predecir(estado, futuro):
+        coeficientes, n_meses, validas = estado
+        X = diseño(np.arange(n_meses, n_meses + len(futuro)), futuro.month, estacional)
+        prediccion = np.clip(X @ coeficientes.T, 0, None)
+        prediccion[:, ~validas] = np.nan
+        return prediccion
+    return predecir
+
+def _ajustar_app(meses, valores, activos):
+    """Lo que hace la app: estacional con dos temporadas de historial, si no lineal"""
+    return (
+        _ajustar_regresion(False, MIN_MESES_LINEAL)(meses, valores, activos),
+        _ajustar_regresion(True, MIN_MESES_ESTACIONAL)(meses, valores, activos),
+    )
+
+def _predecir_app(estado, futuro):
+    lineal, estacional = estado
+    prediccion = _predecir_regresion(False)(lineal, futuro)
+    usar_estacional = estacional[2]
+    prediccion[:, usar_estacional] = _predecir_regresion(True)(estacional, futuro)[:, usar_estacional]
+    return prediccion
+
+def _ajustar_ingenuo(meses, valores, activos):
+    """Último valor de cada mes del año dentro del último año activo"""
+    ultimo = np.full((12, valores.shape[1]), np.nan)
+    for t in range(max(0, len(meses) - 12), len(meses)):
+        ultimo[meses.month[t] - 1] = np.where(activos[t], valores[t], np.nan)
+    return ultimo
+
+def _predecir_ingenuo(ultimo, futuro):
+    return ultimo[futuro.month - 1]
+
+def holt_winters(serie, mes):
+    """Nivel, tendencia y estacionalidad (por mes del año) de una serie mensual de al menos dos años"""
+    nivel = serie[:12].mean()
+    tendencia = (serie[12:24].mean() - nivel) / 12
+    estacion = np.zeros(12)
+    estacion[mes[:12] - 1] = serie[:12] - nivel
+    for valor, m in zip(serie[12:], mes[12:]):
+        s = estacion[m - 1]
+        nuevo = ALFA * (valor - s) + (1 - ALFA) * (nivel + tendencia)
+        tendencia = BETA * (nuevo - nivel) + (1 - BETA) * tendencia
+        estacion[m - 1] = GAMMA * (valor - nuevo) + (1 - GAMMA) * s
+        nivel = nuevo
+    return nivel, tendencia, estacion
+
+def _ajustar_suavizado(meses, valores, activos):
+    estados = []
+    for j in range(valores.shape[1]):
+        activos_j = activos[:, j]
+        if activos_j.sum() < 24:
+            estados.append(None)
+        else:
+            estados.append(holt_winters(valores[activos_j, j], meses.month[activos_j].to_numpy()))
+    return estados
+
+def _predecir_suavizado(estados, futuro):
+    prediccion = np.full((len(futuro), len(estados)), np.nan)
+    pasos = np.arange(1, len(futuro) + 1)
+    for j, estado in enumerate(estados):
+        if estado is not None:
+            nivel, tendencia, estacion = estado
+            prediccion[:, j] = nivel + pasos * tendencia + estacion[futuro.month - 1]
+    return np.clip(prediccion, 0, None)
+
+MODELOS = {
+    "App (estacional/lineal)": (_ajustar_app, _predecir_app),
+    "Lineal": (_ajustar_regresion(False, MIN_MESES_LINEAL), _predecir_regresion(False)),
+    "Estacional ingenuo": (_ajustar_ingenuo, _predecir_ingenuo),
+    "Suavizado exponencial": (_ajustar_suavizado, _predecir_suavizado),
+}
+
+# ------------------- BACKTESTING -------------------
+
+def evaluar_actividades(meses, valores, activos, origenes, horizonte):
+    """Orígenes móviles para un grupo de actividades (se ejecuta en un proceso del pool).
+
+    Devuelve (reales, predicciones, tiempos): reales es orígenes x horizonte x
+    actividades, predicciones un dict modelo -> array igual y tiempos un dict
+    modelo -> (segundos de ajuste, segundos de predicción).
+    """
+    reales = np.stack([valores[o:o + horizonte] for o in origenes])
+    predicciones = {nombre: np.empty_like(reales) for nombre in MODELOS}
+    tiempos = {nombre: [0.0, 0.0] for nombre in MODELOS}
+    for i, origen in enumerate(origenes):
+        meses_ajuste = meses[:origen]
+        futuro = meses[origen:origen + horizonte]
+        for nombre, (ajustar, predecir) in MODELOS.items():
+            inicio = time.perf_counter()
+            estado = ajustar(meses_ajuste, valores[:origen], activos[:origen])
+            medio = time.perf_counter()
+            predicciones[nombre][i] = predecir(estado, futuro)
+            tiempos[nombre][0] += medio - inicio
+            tiempos[nombre][1] += time.perf_counter() - medio
+    # Solo cuentan los meses en que la actividad ya existía
+    reales[~np.stack([activos[o:o + horizonte] for o in origenes])] = np.nan
+    return reales, predicciones, tiempos
+
+def backtesting(meses, valores, activos, horizonte=3, inicio=24, procesos=1):
+    """Evalúa todos los modelos; reparte las actividades entre `procesos` procesos"""
+    origenes = list(range(inicio, len(meses) - horizonte + 1))
+    if not origenes:
+        raise ValueError(f"Hacen falta al menos {inicio + horizonte} meses de historial")
+
+    grupos = [g for g in np.array_split(np.arange(valores.shape[1]), procesos * 4) if len(g)]
+    tareas = [(meses, valores[:, g], activos[:, g], origenes, horizonte) for g in grupos]
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = list(pool.map(evaluar_actividades, *zip(*tareas)))
+    else:
+        resultados = [evaluar_actividades(*tarea) for tarea in tareas]
+
+    reales = np.concatenate([r[0] for r in resultados], axis=2)
+    predicciones = {
+        nombre: np.concatenate([r[1][nombre] for r in resultados], axis=2) for nombre in MODELOS
+    }
+    tiempos = {
+        nombre: tuple(sum(r[2][nombre][k] for r in resultados) for k in range(2)) for nombre in MODELOS
+    }
+    return origenes, reales, predicciones, tiempos
+
+def errores(reales, predicciones, actividades):
+    """MAE y MAPE por modelo (y por actividad) sobre las predicciones comunes a todos los modelos"""
+    comunes = ~np.isnan(reales)
+    for prediccion in predicciones.values():
+        comunes &= ~np.isnan(prediccion)
+
+    resumen, por_actividad = {}, {}
+    for nombre, prediccion in predicciones.items():
+        error = np.where(comunes, np.abs(prediccion - reales), np.nan)
+        con_ingresos = comunes & (reales > 0)
+        porcentual = np.where(con_ingresos, error / np.where(con_ingresos, reales, 1), np.nan)
+        resumen[nombre] = {
+            "MAE (€)": np.nanmean(error) if comunes.any() else np.nan,
+            "MAPE (%)": 100 * np.nanmean(porcentual) if con_ingresos.any() else np.nan,
+        }
+        with warnings.catch_warnings():
+            # Actividades sin predicciones comunes: media de un corte vacío -> NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            por_actividad[nombre] = pd.Series(np.nanmean(error, axis=(0, 1)), index=actividades)
+    return pd.DataFrame(resumen).T, pd.DataFrame(por_actividad), int(comunes.sum())
+
+def leer_exportacion(ruta):
+    """Lee una exportación de la hoja Clientes (CSV o XLSX)"""
+    if str(ruta).lower().endswith((".xlsx", ".xls")):
+        return pd.read_excel(ruta)
+    return pd.read_csv(ruta)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--datos", help="exportación de la hoja Clientes (CSV o XLSX)")
+    parser.add_argument("--filas", type=int, default=20_000)
+    parser.add_argument("--años", type=int, default=6)
+    parser.add_argument("--actividades", type=int, default=20)
+    parser.add_argument("--horizonte", type=int, default=3)
+    parser.add_argument("--inicio", type=int, default=24, help="meses del primer origen")
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--por-actividad", action="store_true")
+    args = parser.parse_args()
+
+    if args.datos:
+        df = leer_exportacion(args.datos)
+        origen = args.datos
+    else:
+        from herramientas.datos_sinteticos import generar_clientes
+        nombres = [f"Actividad {i:02d}" for i in range(args.actividades)]
+        df = generar_clientes(args.filas, años=args.años, semilla=0, actividades=nombres)
+        origen = f"sintéticos ({args.filas} clientes)"
+
+    meses, actividades, valores, activos = matriz_mensual(df)
+    inicio = time.perf_counter()
+    origenes, reales, predicciones, tiempos = backtesting(
+        meses, valores, activos, args.horizonte, args.inicio, args.procesos
+    )
+    total = time.perf_counter() - inicio
+
+    resumen, por_actividad, n = errores(reales, predicciones, actividades)
+    resumen["Ajuste (ms/origen)"] = [1000 * tiempos[m][0] / len(origenes) for m in resumen.index]
+    resumen["Predicción (ms/origen)"] = [1000 * tiempos[m][1] / len(origenes) for m in resumen.index]
+
+    print(f"Datos: {origen}; {len(actividades)} actividades x {len(meses)} meses")
+    print(f"{len(origenes)} orígenes, horizonte {args.horizonte}, {n} predicciones comparadas, "
+          f"{args.procesos} procesos, {total:.2f} s")
+    print(resumen.round(2).to_string())
+    if args.por_actividad:
+        print()
+        print("MAE (€) por actividad")
+        print(por_actividad.round(1).to_string())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+# herramientas/carga_sesiones.py
+"""Prueba de carga: sesiones concurrentes de la app contra un Google Sheets falso.
+
+Uso (desde la raíz del repositorio):
+    python -m herramientas.carga_sesiones [--sesiones 1 2 4 8 12] [--ciclos 2] [--latencia 0.3]
+        [--reservas 1500] [--clientes 3000] [--jsonl resultados.jsonl]
+
+Cada sesión es un AppTest de app.py. Todas corren en este proceso, cada
+una en su hilo, como en el servidor de Streamlit: las cachés son comunes y
+hay un hilo por sesión. Cada sesión inicia sesión y repite --ciclos veces
+el recorrido de un operador:
+  - abre un día de la Agenda
+  - ve el Calendario
+  - crea una reserva (va al diario local) y borra otra
+  - abre una sección de Reportes
+
+Las hojas son un LibroFalso (herramientas.hoja_falsa) con latencia real
+por llamada y las cuotas de lectura y escritura de la API. Se informa, por
+nivel de concurrencia, de:
+  - pasos por segundo
+  - latencia de cada paso (p50/p95/máx)
+  - errores
+  - llamadas a Sheets (incluidas las del hilo que vacía el diario) y respuestas 429
+  - memoria residente del proceso
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock
+import numpy as np
+import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.secrets import Secrets
+from streamlit.testing.v1 import AppTest
+from herramientas.datos_sinteticos import generar_clientes, generar_reservas
+from herramientas.hoja_falsa import LibroFalso, ClienteFalso, RelojReal
+from herramientas.memoria_reportes import memoria_mb
+
+RAIZ = Path(__file__).resolve().parent.parent
+USUARIO, CLAVE = "operador", "carga"
+PASOS = ["login", "agenda", "calendario", "crear reserva", "borrar reserva", "reportes"]
+
+def _permitir_apptest_concurrente(secretos):
+    """AppTest está pensado para una prueba cada vez: en cada run() sustituye st.secrets,
+    la configuración y el Runtime globales y al terminar los deja a None, y vuelve a
+    compilar el script (compilar a la vez en varios hilos rompe CPython 3.11). Aquí se
+    fijan una sola vez para todo el proceso, de modo que varias sesiones puedan ejecutarse a la vez.
+    """
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test
+    from streamlit import config
+
+    secrets = Secrets()
+    secrets._secrets = secretos
+    st.secrets = secrets
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    config.set_option("global.appTest", True)
+    app_test.patch_config_options = lambda opciones: contextlib.nullcontext()
+
+    compilar = ScriptCache.get_bytecode
+    compilados = {}
+    lock = threading.Lock()
+    def get_bytecode(self, ruta):
+        with lock:
+            if ruta not in compilados:
+                compilados[ruta] = compilar(self, ruta)
+            return compilados[ruta]
+    ScriptCache.get_bytecode = get_bytecode
+
+def preparar_libro(args):
+    """Libro falso con Reservas, Clientes y un usuario operador; la app lo usa en lugar de gspread"""
+    reservas = generar_reservas(args.reservas, semilla=1)
+    clientes = generar_clientes(args.clientes, semilla=1)
+    usuarios = [["nombre", "apellidos", "email", "usuario", "password", "fecha_registro"],
+                ["Operador", "Carga", "operador@example.com", USUARIO,
+                 hashlib.sha256(CLAVE.encode()).hexdigest(), "01/01/2025 10:00"]]
+    libro = LibroFalso({
+        "Reservas": [list(reservas.columns)] + reservas.values.tolist(),
+        "Clientes": [list(clientes.columns)] + clientes.values.tolist(),
+        "Usuarios": usuarios,
+    }, reloj=RelojReal(), latencia=args.latencia, escrituras_por_minuto=args.cuota,
+        lecturas_por_minuto=args.cuota)
+
+    from functions import gspread_client, data_utils, reservas as mod_reservas, calendario
+    cliente = ClienteFalso(libro)
+    for modulo in (gspread_client, data_utils, mod_reservas, calendario):
+        modulo.get_gsheet_client = lambda: cliente
+    return libro
+
+# ------------------- RECORRIDO DE UN OPERADOR -------------------
+
+class Operador:
+    def __init__(self, numero, timeout):
+        self.numero = numero
+        self.at = AppTest.from_file(str(RAIZ / "app.py"), default_timeout=timeout)
+        self.tiempos = []
+        self.errores = Counter()
+
+    def _boton(self, etiqueta):
+        for boton in self.at.button:
+            if boton.label == etiqueta:
+                return boton
+        raise LookupError(f"no aparece el botón {etiqueta}")
+
+    def _ir_a(self, pagina):
+        self.at.sidebar.radio[0].set_value(pagina).run()
+
+    def _paso(self, nombre, accion):
+        """Ejecuta un paso y anota su duración; devuelve False si falló"""
+        inicio = time.perf_counter()
+        try:
+            accion()
+            fallo = (self.at.exception[0].value if self.at.exception
+                     else self.at.error[0].value if self.at.error else None)
+        except Exception as e:
+            fallo = f"{type(e).__name__}: {e}"
+        self.tiempos.append((nombre, time.perf_counter() - inicio))
+        if fallo:
+            self.errores[f"{nombre}: {str(fallo).splitlines()[0][:120]}"] += 1
+        return not fallo
+
+    def login(self):
+        self.at.run()
+        self.at.text_input[0].input(USUARIO)
+        self.at.text_input[1].input(CLAVE)
+        self.at.button[0].click().run()
+        if not self.at.session_state["logged_in"]:
+            raise RuntimeError("no se pudo iniciar sesión")
+
+    def agenda(self):
+        self._ir_a("Agenda")
+        if self.at.expander:
+            fecha = datetime.strptime(self.at.expander[0].label.split()[2], "%d/%m/%Y").date()
+            self.at.session_state[f"agenda_dia_{fecha.isoformat()}"] = True
+            self.at.run()
+
+    def calendario(self):
+        self._ir_a("Calendario")
+
+    def crear_reserva(self, ciclo):
+        self._ir_a("Reservas")
+        self.at.text_input[0].input(f"Carga {self.numero}-{ciclo}")
+        self.at.text_input[1].input("600000000")
+        self._boton("🧾 Revisar y confirmar").click().run()
+        self._boton("💾 Confirmar reserva").click().run()
+
+    def borrar_reserva(self):
+        self._boton("🗑️").click().run()
+        self._boton("✅ Confirmar").click().run()
+
+    def reportes(self, ciclo):
+        from functions.reportes import SECCIONES_REPORTES
+        secciones = list(SECCIONES_REPORTES)
+        self._ir_a("Reportes")
+        self.at.session_state["reportes_principal"] = "📈 Gráficos y Predicciones"
+        self.at.session_state["reportes_seccion"] = secciones[(self.numero + ciclo) % len(secciones)]
+        self.at.run()
+
+    def recorrer(self, ciclos):
+        if not self._paso("login", self.login):
+            return
+        for ciclo in range(ciclos):
+            self._paso("agenda", self.agenda)
+            self._paso("calendario", self.calendario)
+            self._paso("crear reserva", lambda: self.crear_reserva(ciclo))
+            self._paso("borrar reserva", self.borrar_reserva)
+            self._paso("reportes", lambda: self.reportes(ciclo))
+
+# ------------------- NIVELES DE CONCURRENCIA -------------------
+
+class _Muestreo:
+    """Pico de memoria residente mientras dura el bloque"""
+
+    def __enter__(self):
+        self.pico = memoria_mb()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._medir, daemon=True)
+        self._hilo.start()
+        return self
+
+    def _medir(self):
+        while not self._parar.wait(0.2):
+            self.pico = max(self.pico, memoria_mb())
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+
+def ejecutar_nivel(sesiones, libro, args):
+    operadores = [Operador(i, args.timeout) for i in range(sesiones)]
+    # Cada nivel empieza con la cuota entera (como tras un minuto sin uso) y las
+    # cachés vacías: así los niveles son comparables y no arrastran lecturas fallidas
+    libro.reiniciar_cuotas()
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    llamadas_antes = Counter(libro.llamadas)
+    with _Muestreo() as muestreo:
+        inicio = time.perf_counter()
+        hilos = [threading.Thread(target=o.recorrer, args=(args.ciclos,)) for o in operadores]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+        # Las reservas creadas se escriben en segundo plano: se espera a que lleguen a la hoja
+        from functions.data_utils import obtener_diario
+        pendientes = obtener_diario().esperar_vacio(args.timeout)
+        sincronizacion = time.perf_counter() - inicio - duracion
+
+    llamadas = libro.llamadas - llamadas_antes
+    tiempos = [t for o in operadores for t in o.tiempos]
+    errores = sum((o.errores for o in operadores), Counter())
+    segundos = np.array([s for _, s in tiempos])
+    por_paso = {paso: np.array([s for p, s in tiempos if p == paso]) for paso in PASOS}
+    return {
+        "sesiones": sesiones,
+        "pasos": len(tiempos),
+        "duracion_s": round(duracion, 2),
+        "pasos_por_s": round(len(tiempos) / duracion, 3),
+        "p50_s": round(float(np.quantile(segundos, 0.5)), 3),
+        "p95_s": round(float(np.quantile(segundos, 0.95)), 3),
+        "max_s": round(float(segundos.max()), 3),
+        "por_paso": {paso: {"p50_s": round(float(np.quantile(s, 0.5)), 3),
+                            "p95_s": round(float(np.quantile(s, 0.95)), 3)}
+                     for paso, s in por_paso.items() if len(s)},
+        "errores": sum(errores.values()),
+        "detalle_errores": dict(errores.most_common(5)),
+        "lecturas_sheets": sum(n for op, n in llamadas.items()
+                               if op in ("get_all_records", "row_values", "col_values", "metadatos")),
+        "escrituras_sheets": sum(n for op, n in llamadas.items()
+                                 if op in ("append_rows", "delete_rows", "update_cell", "add_cols")),
+        "respuestas_429": sum(n for op, n in llamadas.items() if op.endswith("(429)")),
+        "sincronizacion_s": round(sincronizacion, 2),
+        "pendientes_al_final": pendientes,
+        "memoria_pico_mb": round(muestreo.pico, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sesiones", type=int, nargs="+", default=[1, 2, 4, 8, 12])
+    parser.add_argument("--ciclos", type=int, default=2, help="recorridos completos por sesión")
+    parser.add_argument("--latencia", type=float, default=0.3, help="segundos por llamada a la API")
+    parser.add_argument("--cuota", type=int, default=60, help="lecturas y escrituras por minuto (cada una)")
+    parser.add_argument("--reservas", type=int, default=1500)
+    parser.add_argument("--clientes", type=int, default=3000)
+    parser.add_argument("--timeout", type=float, default=300, help="segundos máximos por ejecución del script")
+    parser.add_argument("--jsonl", help="guarda un resultado por nivel en este archivo")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="carga_sesiones_")
+    _permitir_apptest_concurrente({
+        "google_sheets": {"spreadsheet_id": "offline", "sheet_name": "Reservas"},
+        "almacenamiento": {"directorio": directorio},
+    })
+    libro = preparar_libro(args)
+
+    print(f"{args.reservas} reservas, {args.clientes} clientes; latencia {args.latencia} s por llamada, "
+          f"cuota {args.cuota}/min; {args.ciclos} recorridos por sesión")
+    print(f"{'sesiones':>8} {'pasos/s':>8} {'p50 s':>7} {'p95 s':>7} {'máx s':>7} {'errores':>7} "
+          f"{'lecturas':>8} {'escrit.':>7} {'429':>5} {'sinc s':>7} {'mem MB':>7}")
+    resultados = []
+    for sesiones in args.sesiones:
+        r = ejecutar_nivel(sesiones, libro, args)
+        resultados.append(r)
+        print(f"{r['sesiones']:>8} {r['pasos_por_s']:>8.2f} {r['p50_s']:>7.2f} {r['p95_s']:>7.2f} "
+              f"{r['max_s']:>7.2f} {r['errores']:>7} {r['lecturas_sheets']:>8} {r['escrituras_sheets']:>7} "
+              f"{r['respuestas_429']:>5} {r['sincronizacion_s']:>7.2f} {r['memoria_pico_mb']:>7.0f}")
+        if r["pendientes_al_final"]:
+            print(f"{'':>10}{r['pendientes_al_final']} filas del diario sin enviar al terminar")
+        for error, veces in r["detalle_errores"].items():
+            print(f"{'':>10}{veces} × {error}")
+
+    ultimo = resultados[-1]
+    print(f"\nLatencia por paso con {ultimo['sesiones']} sesiones (p50 / p95, s):")
+    for paso, valores in ultimo["por_paso"].items():
+        print(f"  {paso:<16} {valores['p50_s']:7.2f} {valores['p95_s']:7.2f}")
+
+    if args.jsonl:
+        with open(args.jsonl, "w", encoding="utf-8") as f:
+            for r in resultados:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
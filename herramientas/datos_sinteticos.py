@@ -0,0 +1,77 @@
+# herramientas/datos_sinteticos.py
+
+import numpy as np
+import pandas as pd
+from functions.columnas import ENCABEZADOS_CLIENTES, ENCABEZADOS_RESERVAS
+
+ACTIVIDADES = [
+    "Kayak", "Paddle surf", "Hidropedales", "Ruta Bisontes",
+    "Ebikes", "Alquiler equipos ferrata", "Grupos", "Senderismo"
+]
+CIUDADES = ["León", "Madrid", "Oviedo", "Bilbao", "Valladolid", "Burgos", "Gijón", "Santander"]
+DURACIONES = ["1 hora", "2 horas", "Medio día", "Todo el día"]
+HORAS = ["09:00", "10:30", "12:00", "16:00", "17:30"]
+
+def generar_clientes(n_filas=1000, años=3, semilla=0, version=None, actividades=ACTIVIDADES):
+    """Genera una hoja de Clientes sintética con el mismo formato que devuelve Google Sheets.
+
+    Las fechas de actividad se concentran en verano, como en la temporada real.
+    """
+    rng = np.random.default_rng(semilla)
+    año_final = pd.Timestamp.now().year - 1
+
+    # Mes con peso estacional (junio-septiembre concentran la mayoría)
+    pesos_mes = np.array([1, 1, 2, 3, 5, 10, 16, 16, 8, 3, 1, 1], dtype=float)
+    meses = rng.choice(np.arange(1, 13), n_filas, p=pesos_mes / pesos_mes.sum())
+    años_act = rng.integers(año_final - años + 1, año_final + 1, n_filas)
+    dias = rng.integers(1, 29, n_filas)
+    fecha_actividad = pd.to_datetime(pd.DataFrame({"year": años_act, "month": meses, "day": dias}))
+    fecha_registro = fecha_actividad - pd.to_timedelta(rng.integers(0, 30, n_filas), unit="D")
+    fecha_nacimiento = pd.Timestamp("1945-01-01") + pd.Series(pd.to_timedelta(rng.integers(0, 25000, n_filas), unit="D"))
+
+    personas = rng.integers(1, 8, n_filas)
+    precio = (personas * rng.integers(10, 60, n_filas)).astype(float)
+
+    df = pd.DataFrame({
+        "ID": np.arange(1, n_filas + 1),
+        "Sexo": rng.choice(["Masculino", "Femenino"], n_filas),
+        "Fecha Nacimiento": fecha_nacimiento.dt.strftime("%d/%m/%Y"),
+        "Ciudad": rng.choice(CIUDADES, n_filas),
+        "Pais": "España",
+        "Actividad": rng.choice(actividades, n_filas),
+        "Fecha Actividad": fecha_actividad.dt.strftime("%d/%m/%Y"),
+        "Hora Inicio": rng.choice(HORAS, n_filas),
+        "Duracion": rng.choice(DURACIONES, n_filas),
+        "Personas": personas,
+        "Precio": precio,
+        "Fecha Registro": fecha_registro.dt.strftime("%d/%m/%Y 10:00"),
+        "Edad": 0,
+        "Ingresos por Persona": precio / personas,
+        "Notas": "",
+    })[ENCABEZADOS_CLIENTES]
+    df.attrs['version'] = semilla if version is None else version
+    return df
+
+def generar_reservas(n_filas=500, dias=60, semilla=0):
+    """Genera una hoja de Reservas sintética (formato de Google Sheets) con actividades
+    repartidas entre `dias` días antes y después de hoy"""
+    rng = np.random.default_rng(semilla)
+    hoy = pd.Timestamp.now().normalize()
+    fecha_actividad = hoy + pd.to_timedelta(rng.integers(-dias, dias + 1, n_filas), unit="D")
+    fecha_reserva = fecha_actividad - pd.to_timedelta(rng.integers(1, 30, n_filas), unit="D")
+    personas = rng.integers(1, 8, n_filas)
+    precio = personas * rng.integers(10, 60, n_filas)
+    return pd.DataFrame({
+        "Nombre": [f"Cliente {i}" for i in range(1, n_filas + 1)],
+        "Actividad": rng.choice(ACTIVIDADES, n_filas),
+        "Fecha Actividad": fecha_actividad.strftime("%d/%m/%Y"),
+        "Hora inicio Actividad": rng.choice(HORAS, n_filas) + ":00",
+        "Duración": rng.choice(DURACIONES, n_filas),
+        "Personas": personas,
+        "Contacto": "WhatsApp",
+        "Email o Teléfono": "600000000",
+        "Precio": precio,
+        "Notas": "",
+        "Fecha Reserva": fecha_reserva.strftime("%d/%m/%Y 10:00"),
+        "Precio Unitario": np.round(precio / personas, 2),
+    })[ENCABEZADOS_RESERVAS]
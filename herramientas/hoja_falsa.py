@@ -0,0 +1,255 @@
+# herramientas/hoja_falsa.py
+"""Hojas de Google Sheets en memoria para benchmarks y pruebas sin red.
+
+Implementa la parte de la interfaz de gspread que usa la app: el cliente
+(open_by_key), el libro (worksheet, add_worksheet, batch_update con
+deleteDimension) y la hoja (append_row,
+append_rows, delete_rows, get_all_records, get_all_values, row_values,
+col_values, update_cell, add_cols), con una latencia por llamada y
+por celda y las cuotas por minuto de la API: al superarlas responde con un
+APIError 429, como la real. Con RelojSimulado el tiempo avanza sin dormir;
+con RelojReal las llamadas bloquean de verdad (pruebas de carga).
+"""
+
+import collections
+import threading
+import time
+from gspread.exceptions import APIError, WorksheetNotFound
+from functions.columnas import ENCABEZADOS_CLIENTES
+
+class RelojSimulado:
+    """Reloj que solo avanza cuando alguien espera"""
+
+    def __init__(self):
+        self.segundos = 0.0
+
+    def ahora(self):
+        return self.segundos
+
+    def esperar(self, segundos):
+        self.segundos += max(segundos, 0)
+
+class RelojReal:
+    """Reloj del sistema: las esperas duermen el hilo que llama"""
+
+    def ahora(self):
+        return time.monotonic()
+
+    def esperar(self, segundos):
+        if segundos > 0:
+            time.sleep(segundos)
+
+class _RespuestaFalsa:
+    """Lo mínimo de requests.Response que necesita APIError"""
+
+    def __init__(self, codigo, mensaje):
+        self.status_code = codigo
+        self.text = mensaje
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self.text, "status": "RESOURCE_EXHAUSTED"}}
+
+class _Cuota:
+    """Peticiones por minuto (ventana deslizante); None = sin límite. La comparten varias hojas"""
+
+    def __init__(self, por_minuto, tipo):
+        self.por_minuto = por_minuto
+        self.tipo = tipo
+        self._peticiones = collections.deque()
+        self._lock = threading.Lock()
+
+    def consumir(self, ahora):
+        if self.por_minuto is None:
+            return
+        with self._lock:
+            while self._peticiones and ahora - self._peticiones[0] >= 60:
+                self._peticiones.popleft()
+            if len(self._peticiones) >= self.por_minuto:
+                raise APIError(_RespuestaFalsa(429, f"Quota exceeded for quota metric '{self.tipo} requests'"))
+            self._peticiones.append(ahora)
+
+    def reiniciar(self):
+        with self._lock:
+            self._peticiones.clear()
+
+class HojaFalsa:
+    def __init__(self, encabezados=ENCABEZADOS_CLIENTES, reloj=None, latencia=0.5,
+                 segundos_por_celda=0.0, cuota_por_minuto=60, titulo="Clientes", libro=None):
+        self.titulo = titulo
+        self.libro = libro
+        self.id = 0
+        self.reloj = reloj or RelojSimulado()
+        self.latencia = latencia
+        self.segundos_por_celda = segundos_por_celda
+        self.cuota_por_minuto = cuota_por_minuto
+        self.filas = [list(encabezados)] if encabezados else []
+        self.col_count = max(26, len(self.filas[0]) if self.filas else 0)
+        self.llamadas = 0
+        self.lecturas = 0
+        self.rechazadas = 0
+        self._lock = threading.Lock()
+        self._cuota_escritura = libro.cuota_escritura if libro else _Cuota(cuota_por_minuto, "Write")
+        self._cuota_lectura = libro.cuota_lectura if libro else _Cuota(None, "Read")
+
+    def _peticion(self, operacion, cuota, celdas, cambiar=None):
+        """Aplica la cuota, anota la llamada, modifica las filas y espera la latencia (fuera del lock)"""
+        with self._lock:
+            try:
+                cuota.consumir(self.reloj.ahora())
+            except APIError:
+                self.rechazadas += 1
+                if self.libro:
+                    self.libro.anotar(f"{operacion} (429)")
+                raise
+            if cuota is self._cuota_escritura:
+                self.llamadas += 1
+            else:
+                self.lecturas += 1
+            if self.libro:
+                self.libro.anotar(operacion)
+            resultado = cambiar() if cambiar else None
+        self.reloj.esperar(self.latencia + self.segundos_por_celda * celdas)
+        return resultado
+
+    def append_row(self, fila, **kwargs):
+        return self.append_rows([fila], **kwargs)
+
+    def append_rows(self, filas, **kwargs):
+        filas = [list(f) for f in filas]
+        self._peticion("append_rows", self._cuota_escritura, sum(len(f) for f in filas),
+                       lambda: self.filas.extend(filas))
+
+    @property
+    def spreadsheet(self):
+        return self.libro
+
+    def delete_rows(self, inicio, fin=None):
+        """Borra las filas [inicio, fin] (numeradas desde 1, la 1 es la de encabezados)"""
+        fin = fin or inicio
+        def borrar():
+            del self.filas[inicio - 1:fin]
+        self._peticion("delete_rows", self._cuota_escritura, 0, borrar)
+
+    def _borrar_dimension(self, rango):
+        """Un deleteDimension de batch_update (índices desde 0, fin excluido); solo filas"""
+        del self.filas[rango["startIndex"]:rango["endIndex"]]
+
+    def update_cell(self, fila, columna, valor):
+        def cambiar():
+            while len(self.filas) < fila:
+                self.filas.append([])
+            celdas = self.filas[fila - 1]
+            celdas.extend([""] * (columna - len(celdas)))
+            celdas[columna - 1] = valor
+        self._peticion("update_cell", self._cuota_escritura, 1, cambiar)
+
+    def add_cols(self, columnas):
+        def cambiar():
+            self.col_count += columnas
+        self._peticion("add_cols", self._cuota_escritura, 0, cambiar)
+
+    def row_values(self, fila):
+        def leer():
+            return list(self.filas[fila - 1]) if fila <= len(self.filas) else []
+        return self._peticion("row_values", self._cuota_lectura, len(self.filas[0]) if self.filas else 0, leer)
+
+    def col_values(self, columna):
+        def leer():
+            valores = [f[columna - 1] if len(f) >= columna else "" for f in self.filas]
+            while valores and valores[-1] == "":
+                valores.pop()
+            return valores
+        return self._peticion("col_values", self._cuota_lectura, len(self.filas), leer)
+
+    def get_all_values(self):
+        """Todas las filas como texto, rellenas hasta el mismo ancho (como gspread)"""
+        def leer():
+            ancho = max((len(f) for f in self.filas), default=0)
+            return [[str(v) for v in f] + [""] * (ancho - len(f)) for f in self.filas]
+        celdas = sum(len(f) for f in self.filas)
+        return self._peticion("get_all_values", self._cuota_lectura, celdas, leer)
+
+    def get_all_records(self):
+        def leer():
+            if not self.filas:
+                return []
+            encabezados = self.filas[0]
+            return [dict(zip(encabezados, fila)) for fila in self.filas[1:]]
+        celdas = sum(len(f) for f in self.filas)
+        return self._peticion("get_all_records", self._cuota_lectura, celdas, leer)
+
+class LibroFalso:
+    """Libro con varias HojaFalsa que comparten reloj, latencia y cuotas (son por usuario, no por hoja).
+
+    `llamadas` cuenta las peticiones por operación, incluidas las de
+    metadatos (abrir el libro, buscar una hoja) que gspread hace en cada acceso.
+    """
+
+    def __init__(self, hojas=None, reloj=None, latencia=0.5, segundos_por_celda=0.0,
+                 escrituras_por_minuto=60, lecturas_por_minuto=60):
+        self.reloj = reloj or RelojSimulado()
+        self.latencia = latencia
+        self.segundos_por_celda = segundos_por_celda
+        self.cuota_escritura = _Cuota(escrituras_por_minuto, "Write")
+        self.cuota_lectura = _Cuota(lecturas_por_minuto, "Read")
+        self.llamadas = collections.Counter()
+        self._lock = threading.Lock()
+        self.hojas = {}
+        for titulo, filas in (hojas or {}).items():
+            self.add_worksheet(titulo, 0, 0, filas=filas)
+
+    def reiniciar_cuotas(self):
+        """Como si hubiera pasado un minuto sin peticiones"""
+        self.cuota_escritura.reiniciar()
+        self.cuota_lectura.reiniciar()
+
+    def anotar(self, operacion):
+        with self._lock:
+            self.llamadas[operacion] += 1
+
+    def _metadatos(self):
+        try:
+            self.cuota_lectura.consumir(self.reloj.ahora())
+        except APIError:
+            self.anotar("metadatos (429)")
+            raise
+        self.anotar("metadatos")
+        self.reloj.esperar(self.latencia)
+
+    def worksheet(self, titulo):
+        self._metadatos()
+        if titulo not in self.hojas:
+            raise WorksheetNotFound(titulo)
+        return self.hojas[titulo]
+
+    def add_worksheet(self, title, rows, cols, filas=None):
+        """Crea una hoja; `filas` (lista de listas, la primera con los encabezados) es solo para preparar datos"""
+        filas = list(filas or [])
+        hoja = HojaFalsa(filas[0] if filas else None, reloj=self.reloj, latencia=self.latencia,
+                         segundos_por_celda=self.segundos_por_celda, titulo=title, libro=self)
+        hoja.filas.extend(list(f) for f in filas[1:])
+        hoja.id = len(self.hojas)
+        self.hojas[title] = hoja
+        return hoja
+
+    def batch_update(self, cuerpo):
+        """Aplica en orden los deleteDimension de `cuerpo` (una sola petición de escritura)"""
+        por_id = {h.id: h for h in self.hojas.values()}
+        rangos = [p["deleteDimension"]["range"] for p in cuerpo["requests"]]
+        hoja = por_id[rangos[0]["sheetId"]] if rangos else None
+        def cambiar():
+            for rango in rangos:
+                por_id[rango["sheetId"]]._borrar_dimension(rango)
+        if hoja is not None:
+            hoja._peticion("batch_update", self.cuota_escritura, 0, cambiar)
+        return {"replies": [{} for _ in rangos]}
+
+class ClienteFalso:
+    """Sustituye al cliente de gspread.authorize(): todas las claves abren el mismo libro"""
+
+    def __init__(self, libro):
+        self.libro = libro
+
+    def open_by_key(self, clave):
+        self.libro._metadatos()
+        return self.libro
@@ -0,0 +1,102 @@
+# herramientas/importacion_clientes.py
+"""Benchmark de la importación masiva de clientes contra una hoja falsa.
+
+Uso (desde la raíz del repositorio):
+    python -m herramientas.importacion_clientes [--filas 50000] [--existentes 20000] [--solapados 5000]
+        [--latencia 0.5] [--por-celda 0.00002]
+
+La hoja falsa (herramientas.hoja_falsa) empieza con --existentes clientes;
+el archivo importado trae --filas clientes, de los que --solapados ya están
+en la hoja. Se mide el tiempo de CPU de preparar las filas (validación,
+columnas calculadas, índice de IDs) y el tiempo de API simulado (latencia y
+esperas por cuota), y se compara con guardar cliente a cliente con
+append_row, como hace el formulario.
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+import pandas as pd
+from functions.importacion import (
+    preparar_importacion, escribir_por_lotes, normalizar_ids, LimiteEscrituras, FILAS_POR_LOTE,
+)
+from herramientas.datos_sinteticos import generar_clientes
+from herramientas.hoja_falsa import HojaFalsa, RelojSimulado
+
+def hoja_con_clientes(n, reloj, args):
+    hoja = HojaFalsa(reloj=reloj, latencia=args.latencia, segundos_por_celda=args.por_celda)
+    hoja.filas.extend(generar_clientes(n, semilla=1).values.tolist())
+    return hoja
+
+def importar_en_bloque(archivo, hoja, reloj, filas_por_lote):
+    inicio = time.perf_counter()
+    ids = set(normalizar_ids(pd.DataFrame(hoja.get_all_records())['ID']))
+    t_indice = time.perf_counter() - inicio
+    filas, ids_nuevos, duplicados, rechazados = preparar_importacion(archivo, ids)
+    t_preparar = time.perf_counter() - inicio - t_indice
+    api_inicio = reloj.ahora()
+    inicio = time.perf_counter()
+    escritas = escribir_por_lotes(hoja, filas, filas_por_lote,
+                                  LimiteEscrituras(reloj=reloj.ahora, esperar=reloj.esperar),
+                                  esperar=reloj.esperar)
+    t_escribir = time.perf_counter() - inicio
+    return escritas, len(duplicados), len(rechazados), t_indice, t_preparar, t_escribir, reloj.ahora() - api_inicio
+
+def importar_fila_a_fila(archivo, hoja, reloj):
+    """Lo que costaría el formulario: cálculo por fila y un append_row por cliente (sin comprobar IDs)"""
+    limite = LimiteEscrituras(reloj=reloj.ahora, esperar=reloj.esperar)
+    inicio = time.perf_counter()
+    api_inicio = reloj.ahora()
+    for cliente in archivo.to_dict('records'):
+        fecha_nac = datetime.strptime(cliente['Fecha Nacimiento'], '%d/%m/%Y')
+        edad = (datetime.now() - fecha_nac).days // 365
+        ingresos_pp = cliente['Precio'] / cliente['Personas'] if cliente['Personas'] > 0 else 0
+        fila = list(cliente.values())
+        fila[12], fila[13] = edad, ingresos_pp
+        limite.reservar()
+        hoja.append_row(fila)
+    return time.perf_counter() - inicio, reloj.ahora() - api_inicio
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=50_000)
+    parser.add_argument("--existentes", type=int, default=20_000)
+    parser.add_argument("--solapados", type=int, default=5_000)
+    parser.add_argument("--lote", type=int, default=FILAS_POR_LOTE)
+    parser.add_argument("--latencia", type=float, default=0.5, help="segundos por llamada a la API")
+    parser.add_argument("--por-celda", type=float, default=0.00002, help="segundos por celda escrita")
+    args = parser.parse_args()
+
+    archivo = generar_clientes(args.filas, semilla=2)
+    archivo['ID'] += args.existentes - args.solapados
+    archivo = archivo.drop(columns=['Edad', 'Ingresos por Persona'])
+
+    reloj = RelojSimulado()
+    hoja = hoja_con_clientes(args.existentes, reloj, args)
+    escritas, duplicados, rechazados, t_indice, t_preparar, t_escribir, t_api = \
+        importar_en_bloque(archivo, hoja, reloj, args.lote)
+    ids_hoja = normalizar_ids(pd.DataFrame(hoja.get_all_records())['ID'])
+
+    print(f"Importación de {args.filas} clientes sobre una hoja con {args.existentes} "
+          f"(lotes de {args.lote}, latencia {args.latencia} s + {args.por_celda * 1e6:.0f} µs/celda)")
+    print(f"  escritos {escritas}, duplicados {duplicados}, rechazados {rechazados}; "
+          f"hoja final {len(ids_hoja)} filas, IDs repetidos: {ids_hoja.duplicated().sum()}")
+    print(f"  índice de IDs:        {t_indice * 1000:9.1f} ms")
+    print(f"  preparar filas:       {t_preparar * 1000:9.1f} ms")
+    print(f"  escribir (CPU):       {t_escribir * 1000:9.1f} ms")
+    print(f"  API simulada:         {t_api:9.1f} s  ({hoja.llamadas} llamadas, {hoja.rechazadas} 429)")
+
+    reloj = RelojSimulado()
+    hoja = hoja_con_clientes(args.existentes, reloj, args)
+    nuevos = archivo.iloc[args.solapados:].assign(**{'Edad': 0, 'Ingresos por Persona': 0.0})
+    nuevos = nuevos[list(hoja.filas[0])]
+    t_cpu, t_api = importar_fila_a_fila(nuevos, hoja, reloj)
+    print(f"Fila a fila ({len(nuevos)} append_row, como el formulario):")
+    print(f"  CPU:                  {t_cpu * 1000:9.1f} ms")
+    print(f"  API simulada:         {t_api:9.1f} s  ({t_api / 3600:.1f} h por la cuota de "
+          f"{hoja.cuota_por_minuto} escrituras/min)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# herramientas/latencia_predicciones.py
+"""Mide la latencia del motor de predicciones con muchas actividades y años de historial.
+
+Uso (desde la raíz del repositorio):
+    python -m herramientas.latencia_predicciones [--actividades 50] [--años 10] [--filas 100000]
+
+Compara el ajuste en bloque de functions.predicciones (todas las actividades
+a la vez, una vez por versión de datos) con el esquema anterior: agrupar por
+mes y ajustar una regresión para la actividad elegida en cada cambio del selectbox.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import numpy as np
+import pandas as pd
+from herramientas.datos_sinteticos import generar_clientes
+from functions.predicciones import matriz_mensual, ajustar_predicciones, PrediccionesMensuales
+
+def cronometrar(funcion, repeticiones):
+    """Mediana en ms de varias ejecuciones"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+def ajuste_por_actividad(df, actividad):
+    """Esquema anterior: groupby por mes de registro y regresión lineal de una actividad"""
+    datos = df.copy()
+    datos['Mes Registro'] = pd.to_datetime(datos['Fecha Registro'], dayfirst=True, errors='coerce').dt.to_period('M')
+    pred_df = datos.groupby(['Mes Registro', 'Actividad']).agg(Precio=('Precio', 'sum')).reset_index()
+    act_df = pred_df[pred_df['Actividad'] == actividad].sort_values('Mes Registro')
+    X = np.column_stack([np.ones(len(act_df)), np.arange(len(act_df))])
+    coeficientes = np.linalg.lstsq(X, act_df['Precio'].to_numpy(dtype=float), rcond=None)[0]
+    return np.column_stack([np.ones(3), np.arange(len(act_df), len(act_df) + 3)]) @ coeficientes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--actividades", type=int, default=50)
+    parser.add_argument("--años", type=int, default=10)
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    actividades = [f"Actividad {i:02d}" for i in range(args.actividades)]
+    df = generar_clientes(args.filas, años=args.años, semilla=0, actividades=actividades)
+    meses, nombres, valores, activos = matriz_mensual(df)
+    predicciones = PrediccionesMensuales(df)
+
+    t_matriz = cronometrar(lambda: matriz_mensual(df), args.repeticiones)
+    t_ajuste = cronometrar(lambda: ajustar_predicciones(meses, valores, activos), args.repeticiones)
+    t_consulta = cronometrar(
+        lambda: [(predicciones.historico(a), predicciones.prediccion(a)) for a in nombres],
+        args.repeticiones
+    ) / len(nombres)
+    t_anterior = cronometrar(lambda: ajuste_por_actividad(df, nombres[0]), args.repeticiones)
+
+    print(f"{args.filas} clientes, {len(nombres)} actividades x {len(meses)} meses")
+    print(f"  matriz mes x actividad:               {t_matriz:9.2f} ms  (una vez por versión)")
+    print(f"  ajuste de todas las actividades:      {t_ajuste:9.2f} ms  (una vez por versión)")
+    print(f"  consulta en el selectbox:             {t_consulta:9.3f} ms  por actividad")
+    print(f"  anterior (groupby + ajuste):          {t_anterior:9.2f} ms  por cambio del selectbox")
+    modelos = pd.Series(predicciones.modelos).value_counts()
+    print("  modelos: " + ", ".join(f"{m or 'sin datos'}={n}" for m, n in modelos.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
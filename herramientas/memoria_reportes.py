@@ -0,0 +1,92 @@
+# herramientas/memoria_reportes.py
+"""Comprueba que renderizar el dashboard de Reportes repetidamente no hace crecer la memoria.
+
+Uso (desde la raíz del repositorio):
+    python -m herramientas.memoria_reportes [--renders 100] [--filas 2000] [--umbral-mb 60]
+
+Cada render usa una versión de datos nueva para forzar el dibujado de los
+gráficos y rota por las secciones del dashboard, siempre recalculando en
+vivo (sin el informe pregenerado) y con los datos derivados (cubo...) en un
+directorio temporal, no en el de la app. Falla (código 1) si quedan
+figuras abiertas en pyplot o si la memoria sigue creciendo tras el calentamiento.
+"""
+
+import argparse
+import gc
+import resource
+import sys
+import tempfile
+import matplotlib.pyplot as plt
+from streamlit.testing.v1 import AppTest
+
+SECRETOS_PRUEBA = {
+    "google_sheets": {"spreadsheet_id": "offline", "sheet_name": "Reservas"},
+}
+
+def _script(n_filas):
+    import streamlit as st
+    from herramientas.datos_sinteticos import generar_clientes
+    from functions import reportes
+
+    version = st.session_state.get("version_datos", 0)
+    secciones = list(reportes.SECCIONES_REPORTES)
+    st.session_state["reportes_seccion"] = secciones[version % len(secciones)]
+    reportes.cargar_clientes = lambda: generar_clientes(n_filas, version=version)
+    reportes.generar_reportes()
+
+def memoria_mb():
+    """Memoria residente actual del proceso en MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _medir(args, directorio):
+    """Renderiza el dashboard una y otra vez; devuelve el código de salida"""
+    at = AppTest.from_function(_script, args=(args.filas,), default_timeout=120)
+    for clave, valor in SECRETOS_PRUEBA.items():
+        at.secrets[clave] = valor
+    at.secrets["almacenamiento"] = {"directorio": directorio}
+    # Sin esto, si hay un informe pregenerado se mostraría ese y no se dibujaría nada
+    at.session_state["reportes_en_vivo"] = True
+
+    base = None
+    for i in range(args.renders):
+        at.session_state["version_datos"] = i
+        at.run()
+        if at.exception:
+            print(f"Error en el render {i}: {at.exception[0].value}")
+            return 1
+
+        abiertas = len(plt.get_fignums())
+        if abiertas:
+            print(f"Render {i}: {abiertas} figuras de pyplot sin cerrar")
+            return 1
+
+        if i + 1 == args.calentamiento:
+            gc.collect()
+            base = memoria_mb()
+
+    gc.collect()
+    final = memoria_mb()
+    crecimiento = final - base if base is not None else 0.0
+    print(f"{args.renders} renders, memoria tras calentamiento {base or 0:.1f} MB, "
+          f"final {final:.1f} MB, crecimiento {crecimiento:.1f} MB")
+    if crecimiento > args.umbral_mb:
+        print(f"La memoria crece más de {args.umbral_mb} MB")
+        return 1
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--renders", type=int, default=100)
+    parser.add_argument("--filas", type=int, default=2000)
+    parser.add_argument("--calentamiento", type=int, default=20)
+    parser.add_argument("--umbral-mb", type=float, default=60.0)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directorio:
+        return _medir(args, directorio)
+
+if __name__ == "__main__":
+    sys.exit(main())
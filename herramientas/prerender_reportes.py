@@ -0,0 +1,64 @@
+# herramientas/prerender_reportes.py
+"""Pre-renderiza el dashboard de Reportes a un informe estático (HTML + PNG).
+
+Uso (desde la raíz del repositorio, con los mismos secrets que la app):
+    python -m herramientas.prerender_reportes [--procesos N] [--cada 60] [--datos clientes.csv]
+
+Lee la hoja Clientes (o una exportación CSV/XLSX con --datos), procesa los
+datos una vez y renderiza cada sección en un proceso aparte. El informe se
+guarda en .datos/informes/ (index.html, graficos/*.png e informe.pkl, que
+es lo que sirve la página de Reportes). Con --cada N se repite cada N
+minutos; sin él se ejecuta una vez (p. ej. desde cron).
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+from functions.data_utils import cargar_clientes
+from functions.reportes import obtener_clientes_procesados
+from functions.informe_estatico import renderizar_informe, guardar_informe, DIRECTORIO_INFORMES
+
+def leer_clientes(ruta):
+    if ruta is None:
+        cargar_clientes.clear()
+        return cargar_clientes()
+    clientes = pd.read_excel(ruta) if ruta.lower().endswith((".xlsx", ".xls")) else pd.read_csv(ruta)
+    clientes.attrs['version'] = time.time_ns()
+    return clientes
+
+def generar(args):
+    inicio = time.perf_counter()
+    clientes = leer_clientes(args.datos)
+    if clientes.empty:
+        print("No hay datos de clientes")
+        return 1
+    df = obtener_clientes_procesados(clientes)
+    informe = renderizar_informe(df, args.procesos)
+    directorio = guardar_informe(informe, Path(args.salida))
+    print(f"{informe['generado']:%d/%m/%Y %H:%M:%S} informe de {len(df)} clientes en "
+          f"{directorio} ({time.perf_counter() - inicio:.1f} s)")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--datos", help="exportación de la hoja Clientes (CSV o XLSX)")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cada", type=float, help="minutos entre informes (por defecto, solo uno)")
+    parser.add_argument("--salida", default=str(DIRECTORIO_INFORMES))
+    args = parser.parse_args()
+
+    if args.cada is None:
+        return generar(args)
+    while True:
+        try:
+            generar(args)
+        except Exception as e:
+            # Un fallo puntual (red, cuota de Sheets) no detiene la programación
+            print(f"Error al generar el informe: {e}")
+        time.sleep(args.cada * 60)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# pages/5_⏱️_Rendimiento.py
+
+import streamlit as st
+from datetime import datetime
+from functions.auth import check_auth, es_administrador
+from functions import rendimiento, memoria
+
+def mostrar():
+    if not check_auth():
+        st.stop()
+    if not es_administrador():
+        st.error("Esta página solo está disponible para administradores")
+        st.stop()
+
+    st.title("⏱️ Rendimiento")
+    activo = st.toggle("Medir tiempos", value=rendimiento.activo(),
+                       help="Mide los tramos instrumentados en todas las sesiones; desactivado apenas cuesta nada")
+    if activo != rendimiento.activo():
+        rendimiento.activar(activo)
+
+    desde = datetime.fromtimestamp(rendimiento.inicio_medicion()).strftime('%d/%m/%Y %H:%M')
+    st.caption(f"Métricas acumuladas en este proceso desde el {desde}. Los percentiles usan las últimas "
+               f"{rendimiento.MUESTRAS_POR_TRAMO} llamadas de cada tramo.")
+
+    tramos = rendimiento.resumen_tramos()
+    caches = rendimiento.resumen_caches()
+    if tramos.empty and caches.empty:
+        st.info("Aún no hay mediciones" if activo else "Activa la medición y navega por la app para ver tiempos")
+    else:
+        mostrar_tiempos(tramos, caches)
+    mostrar_memoria()
+
+def mostrar_tiempos(tramos, caches):
+    st.subheader("Tramos")
+    st.caption("sheets.* = llamadas a Google Sheets · cache.* = cálculo tras un fallo de caché · "
+               "graficos.* = gráficos de matplotlib · el resto, funciones de la app")
+    st.dataframe(tramos, hide_index=True, column_config={
+        columna: st.column_config.NumberColumn(format="%.1f")
+        for columna in ["p50 (ms)", "p95 (ms)", "Media (ms)", "Máx (ms)", "Total (s)"]
+    })
+
+    st.subheader("Cachés")
+    st.dataframe(caches, hide_index=True, column_config={
+        "Aciertos (%)": st.column_config.ProgressColumn(format="%.0f%%", min_value=0, max_value=100),
+    })
+
+    col1, col2, col3 = st.columns(3)
+    col1.download_button("⬇️ JSON lines", rendimiento.exportar_jsonl(), file_name="rendimiento.jsonl",
+                         mime="application/jsonl")
+    col2.download_button("⬇️ Prometheus", rendimiento.exportar_prometheus(), file_name="rendimiento.prom",
+                         mime="text/plain")
+    if col3.button("🗑️ Reiniciar métricas"):
+        rendimiento.reiniciar()
+        st.rerun()
+
+def mostrar_memoria():
+    # Medir recorre todas las cachés y sesiones: solo con la sección abierta
+    seccion = st.expander("🧠 Memoria por sesión y por caché", key="rendimiento_memoria", on_change="rerun")
+    if not seccion.open:
+        return
+    with seccion:
+        sesiones = memoria.resumen_sesiones()
+        caches = memoria.resumen_caches()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Sesiones", len(sesiones))
+        col2.metric("Cachés (MB)", f"{caches['MB'].sum():.1f}")
+        col3.metric("Estado de sesiones (MB)", f"{sesiones['Estado (KB)'].sum() / 1024:.1f}")
+
+        st.caption("Estado = session_state propio de cada sesión (sin lo compartido con las cachés).")
+        st.dataframe(sesiones, hide_index=True, column_config={
+            columna: st.column_config.NumberColumn(format="%.1f")
+            for columna in ["Inactiva (min)", "Estado (KB)", "Compartido (KB)", "Subidas (KB)", "Multimedia (KB)"]
+        })
+        st.dataframe(caches, hide_index=True, column_config={"MB": st.column_config.NumberColumn(format="%.2f")})
@@ -13,11 +13,14 @@ def mostrar():
     # ELIMINAR st.set_page_config() DE AQUÍ
     st.title("📊 Reportes Avanzados y Gestión de Clientes")
 
-    # Tabs principales
-    tab1, tab2 = st.tabs(["📝 Ingresar Datos de Clientes", "📈 Gráficos y Predicciones"])
+    # Tabs principales (solo se ejecuta la pestaña abierta)
+    tab1, tab2 = st.tabs(["📝 Ingresar Datos de Clientes", "📈 Gráficos y Predicciones"],
+                         key="reportes_principal", on_change="rerun")
 
-    with tab1:
-        mostrar_formulario_cliente()
+    if tab1.open:
+        with tab1:
+            mostrar_formulario_cliente()
 
-    with tab2:
-        generar_reportes()
\ No newline at end of file
+    if tab2.open:
+        with tab2:
+            generar_reportes()
\ No newline at end of file
@@ -1,9 +1,10 @@
 # pages/1_📝_Reservas.py
 
 import streamlit as st
-from functions.reservas import mostrar_formulario, ultimas_reservas
+from functions.reservas import mostrar_formulario, buscar_reservas, ultimas_reservas
 
 def mostrar():
     st.title("📝 Nueva Reserva")
     mostrar_formulario()
+    buscar_reservas()
     ultimas_reservas()
\ No newline at end of file